@@ -1,5 +1,17 @@
-import grpc
-from . import audio_pb2, audio_pb2_grpc
+import hashlib
+import itertools
+
+from . import audio_pb2
+from . import compression, config, resilience
+from .singleflight import SingleFlight
+
+
+# Identical concurrent clips (same content hash) share one outstanding RPC
+inflight = SingleFlight()
+
+
+def audio_key(audio_bytes):
+    return (len(audio_bytes), hashlib.blake2b(audio_bytes, digest_size=16).digest())
 
 
 def process_audio(audio_bytes):
@@ -12,11 +24,69 @@ def process_audio(audio_bytes):
     Returns:
         Processed audio bytes
     """
-    channel = grpc.insecure_channel("localhost:50052")
-    stub = audio_pb2_grpc.AudioServiceStub(channel)
+    return inflight.do(audio_key(audio_bytes), _process_audio_rpc, audio_bytes)
+
+
+def _process_audio_rpc(audio_bytes):
+    # Retried but not hedged: a second copy of a clip doubles the CPU work
+    response = resilience.audio.call(
+        "ProcessAudio",
+        audio_pb2.AudioRequest(audio=audio_bytes),
+        config.GRPC_AUDIO_DEADLINE,
+        compression=compression.choose(audio_bytes),
+        metadata=compression.request_metadata(),
+    )
+    return response.audio
+
+
+def process_audio_stream(chunks):
+    """
+    Stream audio to the Audio gRPC service chunk by chunk.
+
+    Args:
+        chunks: Iterable of raw audio byte chunks, consumed lazily
+
+    Returns:
+        Iterator over processed audio byte chunks
+    """
+    # The call's compression is judged on its first chunk; streamed clips
+    # are always above the size threshold
+    chunks = iter(chunks)
+    first = next(chunks, b"")
 
-    response = stub.ProcessAudio(
-        audio_pb2.AudioRequest(audio=audio_bytes)
+    # Timed from the first request chunk to the last response chunk
+    responses = resilience.audio.stream(
+        "ProcessAudioStream",
+        (audio_pb2.AudioChunk(data=chunk) for chunk in itertools.chain((first,), chunks)),
+        config.GRPC_AUDIO_STREAM_DEADLINE,
+        compression=compression.choose(first, min_bytes=0),
+        metadata=compression.request_metadata(),
     )
+    for response in responses:
+        yield response.data
+
+
+async def process_audio_async(audio_bytes):
+    """
+    grpc.aio variant of process_audio for the async gateway views.
+
+    Args:
+        audio_bytes: Raw audio data as bytes
 
+    Returns:
+        Processed audio bytes
+    """
+    return await inflight.do_async(
+        audio_key(audio_bytes), _process_audio_rpc_async, audio_bytes
+    )
+
+
+async def _process_audio_rpc_async(audio_bytes):
+    response = await resilience.audio.call_async(
+        "ProcessAudio",
+        audio_pb2.AudioRequest(audio=audio_bytes),
+        config.GRPC_AUDIO_DEADLINE,
+        compression=compression.choose(audio_bytes),
+        metadata=compression.request_metadata(),
+    )
     return response.audio
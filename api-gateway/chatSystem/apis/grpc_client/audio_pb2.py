@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0b\x61udio.proto\x12\x05\x61udio\"\x1d\n\x0c\x41udioRequest\x12\r\n\x05\x61udio\x18\x01 \x01(\x0c\"\x1e\n\rAudioResponse\x12\r\n\x05\x61udio\x18\x01 \x01(\x0c\x32I\n\x0c\x41udioService\x12\x39\n\x0cProcessAudio\x12\x13.audio.AudioRequest\x1a\x14.audio.AudioResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0b\x61udio.proto\x12\x05\x61udio\"\x1d\n\x0c\x41udioRequest\x12\r\n\x05\x61udio\x18\x01 \x01(\x0c\"\x1e\n\rAudioResponse\x12\r\n\x05\x61udio\x18\x01 \x01(\x0c\"\x1a\n\nAudioChunk\x12\x0c\n\x04\x64\x61ta\x18\x01 \x01(\x0c\x32\x89\x01\n\x0c\x41udioService\x12\x39\n\x0cProcessAudio\x12\x13.audio.AudioRequest\x1a\x14.audio.AudioResponse\x12>\n\x12ProcessAudioStream\x12\x11.audio.AudioChunk\x1a\x11.audio.AudioChunk(\x01\x30\x01\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -35,6 +35,8 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_AUDIOREQUEST']._serialized_end=51
   _globals['_AUDIORESPONSE']._serialized_start=53
   _globals['_AUDIORESPONSE']._serialized_end=83
-  _globals['_AUDIOSERVICE']._serialized_start=85
-  _globals['_AUDIOSERVICE']._serialized_end=158
+  _globals['_AUDIOCHUNK']._serialized_start=85
+  _globals['_AUDIOCHUNK']._serialized_end=111
+  _globals['_AUDIOSERVICE']._serialized_start=114
+  _globals['_AUDIOSERVICE']._serialized_end=251
 # @@protoc_insertion_point(module_scope)
@@ -2,6 +2,7 @@
 """Client and server classes corresponding to protobuf-defined services."""
 import grpc
 import warnings
+
 from . import audio_pb2 as audio__pb2
 
 GRPC_GENERATED_VERSION = '1.76.0'
@@ -38,6 +39,11 @@ class AudioServiceStub(object):
                 request_serializer=audio__pb2.AudioRequest.SerializeToString,
                 response_deserializer=audio__pb2.AudioResponse.FromString,
                 _registered_method=True)
+        self.ProcessAudioStream = channel.stream_stream(
+                '/audio.AudioService/ProcessAudioStream',
+                request_serializer=audio__pb2.AudioChunk.SerializeToString,
+                response_deserializer=audio__pb2.AudioChunk.FromString,
+                _registered_method=True)
 
 
 class AudioServiceServicer(object):
@@ -49,6 +55,12 @@ class AudioServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def ProcessAudioStream(self, request_iterator, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_AudioServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -57,6 +69,11 @@ def add_AudioServiceServicer_to_server(servicer, server):
                     request_deserializer=audio__pb2.AudioRequest.FromString,
                     response_serializer=audio__pb2.AudioResponse.SerializeToString,
             ),
+            'ProcessAudioStream': grpc.stream_stream_rpc_method_handler(
+                    servicer.ProcessAudioStream,
+                    request_deserializer=audio__pb2.AudioChunk.FromString,
+                    response_serializer=audio__pb2.AudioChunk.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'audio.AudioService', rpc_method_handlers)
@@ -94,3 +111,30 @@ class AudioService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def ProcessAudioStream(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(
+            request_iterator,
+            target,
+            '/audio.AudioService/ProcessAudioStream',
+            audio__pb2.AudioChunk.SerializeToString,
+            audio__pb2.AudioChunk.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
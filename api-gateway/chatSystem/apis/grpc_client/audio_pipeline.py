@@ -0,0 +1,202 @@
+"""
+16-bit PCM processing pipeline behind AudioService.ProcessAudio.
+
+    decode -> downmix -> resample -> normalize gain -> noise gate -> encode
+
+Input is a RIFF/WAVE file with 16-bit PCM samples (any channel count and
+rate) or, if it has no RIFF header, raw little-endian 16-bit mono PCM at
+AUDIO_RAW_PCM_RATE. Output is always a mono 16-bit WAV file at
+AUDIO_SAMPLE_RATE. Headers that are truncated or declare a rate or
+channel count out of range raise AudioFormatError, which the services
+return as INVALID_ARGUMENT.
+
+Every stage is a whole-array NumPy operation: the samples are read through
+a zero-copy np.frombuffer view of the request bytes, there are no Python
+loops over samples, and intermediate arrays are float32 and updated in
+place where possible.
+"""
+import struct
+
+import numpy as np
+
+from .config import (
+    AUDIO_SAMPLE_RATE,
+    AUDIO_RAW_PCM_RATE,
+    AUDIO_TARGET_PEAK_DBFS,
+    AUDIO_MAX_GAIN_DB,
+    AUDIO_GATE_THRESHOLD_DBFS,
+    AUDIO_GATE_FRAME_MS,
+)
+
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# Header values accepted from clients. A tiny declared rate would make
+# resample() blow a few bytes up into a long clip, so upsampling is also
+# capped at MAX_UPSAMPLE output samples per input sample.
+MIN_SAMPLE_RATE = 4000
+MAX_SAMPLE_RATE = 384000
+MAX_CHANNELS = 16
+MAX_UPSAMPLE = 16
+
+# Output samples resampled per step, to bound the float64/index
+# temporaries on long clips
+_RESAMPLE_BLOCK = 1 << 20
+
+
+class AudioFormatError(ValueError):
+    """The input is a WAV file this pipeline can't decode."""
+
+
+def decode(data):
+    """
+    Decode WAV or raw PCM bytes.
+
+    Returns:
+        (int16 array of shape (frames, channels) viewing data, sample rate)
+
+    Raises:
+        AudioFormatError for unsupported, out of range or truncated headers
+    """
+    try:
+        return _decode(data)
+    except struct.error as e:
+        raise AudioFormatError(f"truncated WAV header: {e}") from e
+
+
+def _decode(data):
+    if data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        # Raw PCM; an odd trailing byte is not a whole sample
+        samples = np.frombuffer(data, dtype="<i2", count=len(data) // 2)
+        return samples.reshape(-1, 1), AUDIO_RAW_PCM_RATE
+
+    view = memoryview(data)
+    fmt = None
+    offset = 12
+    while offset + 8 <= len(data):
+        chunk_id = bytes(view[offset:offset + 4])
+        (size,) = struct.unpack_from("<I", data, offset + 4)
+        body = offset + 8
+        if chunk_id == b"fmt ":
+            if size < 16:
+                raise AudioFormatError(f"WAV fmt chunk is {size} bytes, expected at least 16")
+            fmt = struct.unpack_from("<HHIIHH", data, body)
+            if fmt[0] == WAVE_FORMAT_EXTENSIBLE and size >= 40:
+                # The real format tag is the first two bytes of the SubFormat GUID
+                fmt = (struct.unpack_from("<H", data, body + 24)[0],) + fmt[1:]
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise AudioFormatError("WAV data chunk before fmt chunk")
+            format_tag, channels, rate, _, _, bits = fmt
+            if format_tag != WAVE_FORMAT_PCM or bits != 16 or not 1 <= channels <= MAX_CHANNELS:
+                raise AudioFormatError(
+                    f"unsupported WAV format {format_tag:#06x}, {bits}-bit, "
+                    f"{channels} channel(s); expected 16-bit PCM with at most "
+                    f"{MAX_CHANNELS} channels"
+                )
+            if not MIN_SAMPLE_RATE <= rate <= MAX_SAMPLE_RATE:
+                raise AudioFormatError(
+                    f"unsupported WAV sample rate {rate} Hz; expected "
+                    f"{MIN_SAMPLE_RATE}-{MAX_SAMPLE_RATE} Hz"
+                )
+            # Truncated files: keep the whole frames that are present
+            size = min(size, len(data) - body)
+            frames = size // (2 * channels)
+            samples = np.frombuffer(data, dtype="<i2", count=frames * channels, offset=body)
+            return samples.reshape(frames, channels), rate
+        # Chunks are word aligned
+        offset = body + size + (size & 1)
+    raise AudioFormatError("WAV file has no data chunk")
+
+
+def downmix(samples):
+    """(frames, channels) int16 -> mono float32 in [-1, 1)."""
+    channels = samples.shape[1]
+    mono = samples[:, 0].astype(np.float32)
+    # One vectorized add per channel; mean(axis=1) over a short axis is
+    # several times slower
+    for channel in range(1, channels):
+        mono += samples[:, channel]
+    mono *= 1.0 / (32768.0 * channels)
+    return mono
+
+
+def resample(signal, rate, target_rate=AUDIO_SAMPLE_RATE):
+    """Linear-interpolation resampling of a mono float32 signal."""
+    if rate == target_rate or len(signal) == 0:
+        return signal
+    if rate <= 0 or target_rate > rate * MAX_UPSAMPLE:
+        raise AudioFormatError(
+            f"cannot resample {rate} Hz to {target_rate} Hz: more than "
+            f"{MAX_UPSAMPLE}x upsampling"
+        )
+    out_len = int(round(len(signal) * target_rate / rate))
+    out = np.empty(out_len, dtype=np.float32)
+    step = rate / target_rate
+    last = len(signal) - 1
+    # The output grid is uniform, so the neighbours of every output sample
+    # are found by arithmetic instead of np.interp's per-point binary search
+    for start in range(0, out_len, _RESAMPLE_BLOCK):
+        stop = min(start + _RESAMPLE_BLOCK, out_len)
+        position = np.arange(start, stop, dtype=np.float64) * step
+        np.minimum(position, last, out=position)
+        left = position.astype(np.intp)
+        right = np.minimum(left + 1, last)
+        fraction = (position - left).astype(np.float32)
+        block = out[start:stop]
+        np.subtract(signal[right], signal[left], out=block)
+        block *= fraction
+        block += signal[left]
+    return out
+
+
+def normalize(signal, target_peak_dbfs=AUDIO_TARGET_PEAK_DBFS,
+              max_gain_db=AUDIO_MAX_GAIN_DB):
+    """Scale the peak to target_peak_dbfs, never amplifying by more than max_gain_db."""
+    peak = float(np.abs(signal).max()) if len(signal) else 0.0
+    if peak == 0.0:
+        return signal
+    gain = min(10 ** (target_peak_dbfs / 20) / peak, 10 ** (max_gain_db / 20))
+    signal *= gain
+    return signal
+
+
+def noise_gate(signal, rate=AUDIO_SAMPLE_RATE,
+               threshold_dbfs=AUDIO_GATE_THRESHOLD_DBFS, frame_ms=AUDIO_GATE_FRAME_MS):
+    """Silence every frame_ms frame whose RMS is below threshold_dbfs."""
+    frame = max(1, rate * frame_ms // 1000)
+    whole = len(signal) - len(signal) % frame
+    frames = signal[:whole].reshape(-1, frame)
+    rms = np.sqrt(np.einsum("ij,ij->i", frames, frames) / frame)
+    threshold = 10 ** (threshold_dbfs / 20)
+    frames[rms < threshold] = 0.0
+    # Trailing partial frame
+    tail = signal[whole:]
+    if len(tail) and np.sqrt(np.dot(tail, tail) / len(tail)) < threshold:
+        tail[:] = 0.0
+    return signal
+
+
+def encode(signal, rate=AUDIO_SAMPLE_RATE):
+    """Mono float32 -> 16-bit PCM WAV bytes."""
+    np.clip(signal, -1.0, 32767.0 / 32768.0, out=signal)
+    signal *= 32768.0
+    pcm = signal.astype("<i2")
+    header = struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + pcm.nbytes, b"WAVE",
+        b"fmt ", 16, WAVE_FORMAT_PCM, 1, rate, rate * 2, 2, 16,
+        b"data", pcm.nbytes
+    )
+    return header + pcm.tobytes()
+
+
+def process(data, target_rate=AUDIO_SAMPLE_RATE):
+    """Run the whole pipeline on WAV / raw PCM bytes and return WAV bytes."""
+    samples, rate = decode(data)
+    signal = downmix(samples)
+    signal = resample(signal, rate, target_rate)
+    signal = normalize(signal)
+    signal = noise_gate(signal, target_rate)
+    return encode(signal, target_rate)
@@ -1,34 +1,185 @@
+import argparse
+import asyncio
 import grpc
+import multiprocessing
+import os
+import signal
 from concurrent import futures
 import sys
 from pathlib import Path
-from .audio_pb2 import AudioResponse
-from . import audio_pb2_grpc
+from .audio_pb2 import AudioResponse, AudioChunk
+from . import audio_pb2_grpc, compression
+from .engine import AudioFormatError, process_audio
+from .config import (
+    SERVER_OPTIONS,
+    AUDIO_CHUNK_SIZE,
+    GRPC_SERVER_MODE,
+    AUDIO_PROCESS_WORKERS,
+    AUDIO_OFFLOAD_THRESHOLD,
+    AUDIO_METRICS_PORT,
+)
+from .interceptors import MetricsInterceptor, AsyncMetricsInterceptor, start_metrics_server
+
+
+def _compress_response(context, audio):
+    """Compress the response as the caller asked, if it is worth it."""
+    context.set_compression(
+        compression.choose(audio, compression.accepted(context), direction="response")
+    )
+
+
+def _output_chunks(audio):
+    view = memoryview(audio)
+    for i in range(0, len(audio), AUDIO_CHUNK_SIZE):
+        yield AudioChunk(data=bytes(view[i:i + AUDIO_CHUNK_SIZE]))
 
 
 class AudioService(audio_pb2_grpc.AudioServiceServicer):
 
     def ProcessAudio(self, request, context):
+        try:
+            processed_audio = process_audio(request.audio)
+        except AudioFormatError as e:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        _compress_response(context, processed_audio)
+        return AudioResponse(audio=processed_audio)
+
+    def ProcessAudioStream(self, request_iterator, context):
         """
-        Process audio by simulating compression/processing.
-        In a real system, this would do actual audio processing.
+        Streaming variant of ProcessAudio for clips too large for one message.
+        The output is identical to ProcessAudio on the concatenated input.
         """
-        # Simulate audio processing by reversing the bytes
-        processed_audio = request.audio[::-1]
-        
-        return AudioResponse(audio=processed_audio)
+        # The WAV header and the gain both depend on the whole clip
+        audio = b"".join(chunk.data for chunk in request_iterator)
+        try:
+            processed_audio = process_audio(audio)
+        except AudioFormatError as e:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+
+        _compress_response(context, processed_audio)
+        yield from _output_chunks(processed_audio)
 
 
-def serve():
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+def create_server(port=50052, max_workers=10, maximum_concurrent_rpcs=None,
+                  extra_options=()):
+    """
+    Build (but don't start) an Audio gRPC server bound to port.
+
+    maximum_concurrent_rpcs caps in-flight RPCs; beyond it new calls fail
+    fast with RESOURCE_EXHAUSTED instead of queueing behind the pool.
+    """
+    server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=max_workers),
+        interceptors=[MetricsInterceptor()],
+        options=SERVER_OPTIONS + list(extra_options),
+        maximum_concurrent_rpcs=maximum_concurrent_rpcs
+    )
     audio_pb2_grpc.add_AudioServiceServicer_to_server(
         AudioService(), server
     )
-    server.add_insecure_port("[::]:50052")
+    server.add_insecure_port(f"[::]:{port}")
+    return server
+
+
+class AsyncAudioService(audio_pb2_grpc.AudioServiceServicer):
+    """
+    grpc.aio variant. The event loop only moves bytes; pipeline work on
+    clips of at least offload_threshold bytes runs in executor (a process
+    pool) so it uses other cores and never stalls the loop.
+    """
+
+    def __init__(self, executor, offload_threshold=AUDIO_OFFLOAD_THRESHOLD):
+        self.executor = executor
+        self.offload_threshold = offload_threshold
+
+    async def _process(self, audio, context):
+        try:
+            if len(audio) < self.offload_threshold:
+                return process_audio(audio)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, process_audio, audio)
+        except AudioFormatError as e:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+
+    async def ProcessAudio(self, request, context):
+        processed_audio = await self._process(request.audio, context)
+        _compress_response(context, processed_audio)
+        return AudioResponse(audio=processed_audio)
+
+    async def ProcessAudioStream(self, request_iterator, context):
+        audio = b"".join([chunk.data async for chunk in request_iterator])
+        processed_audio = await self._process(audio, context)
+        _compress_response(context, processed_audio)
+
+        for chunk in _output_chunks(processed_audio):
+            yield chunk
+
+
+def create_process_pool(workers=AUDIO_PROCESS_WORKERS):
+    # forkserver, not fork: the pool is created in a process that already
+    # runs gRPC, which is not fork-safe
+    return futures.ProcessPoolExecutor(
+        max_workers=workers or os.cpu_count() or 1,
+        mp_context=multiprocessing.get_context("forkserver")
+    )
+
+
+def create_aio_server(port=50052, maximum_concurrent_rpcs=None, extra_options=(),
+                      executor=None):
+    """
+    Build (but don't start) a grpc.aio Audio server bound to port.
+    Must be called with the event loop that will run it; the caller owns
+    executor (see create_process_pool) and shuts it down after the server.
+    """
+    server = grpc.aio.server(
+        interceptors=[AsyncMetricsInterceptor()],
+        options=SERVER_OPTIONS + list(extra_options),
+        maximum_concurrent_rpcs=maximum_concurrent_rpcs
+    )
+    audio_pb2_grpc.add_AudioServiceServicer_to_server(
+        AsyncAudioService(executor), server
+    )
+    server.add_insecure_port(f"[::]:{port}")
+    return server
+
+
+async def serve_aio(port=50052, maximum_concurrent_rpcs=None, metrics_port=AUDIO_METRICS_PORT):
+    with create_process_pool() as executor:
+        server = create_aio_server(
+            port, maximum_concurrent_rpcs=maximum_concurrent_rpcs, executor=executor
+        )
+        # Stop gracefully on SIGTERM so the pool workers are shut down too
+        asyncio.get_running_loop().add_signal_handler(
+            signal.SIGTERM, lambda: asyncio.ensure_future(server.stop(5))
+        )
+        start_metrics_server(metrics_port)
+        await server.start()
+        print(f"Audio gRPC Service (aio) running on port {port}")
+        await server.wait_for_termination()
+
+
+def serve(port=50052, maximum_concurrent_rpcs=None, metrics_port=AUDIO_METRICS_PORT):
+    server = create_server(port, maximum_concurrent_rpcs=maximum_concurrent_rpcs)
+    start_metrics_server(metrics_port)
     server.start()
-    print("Audio gRPC Service running on port 50052")
+    print(f"Audio gRPC Service running on port {port}")
     server.wait_for_termination()
 
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Audio gRPC Service")
+    parser.add_argument("--mode", choices=["sync", "aio"], default=GRPC_SERVER_MODE)
+    parser.add_argument("--port", type=int, default=50052)
+    parser.add_argument("--max-concurrent-rpcs", type=int, default=None)
+    parser.add_argument("--metrics-port", type=int, default=AUDIO_METRICS_PORT,
+                        help="Prometheus metrics port, 0 to disable")
+    args = parser.parse_args(argv)
+
+    if args.mode == "aio":
+        asyncio.run(serve_aio(args.port, args.max_concurrent_rpcs, args.metrics_port))
+    else:
+        serve(args.port, args.max_concurrent_rpcs, args.metrics_port)
+
+
 if __name__ == "__main__":
-    serve()
+    main()
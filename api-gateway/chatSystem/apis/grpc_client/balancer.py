@@ -0,0 +1,266 @@
+"""
+Client-side load balancing across replicas of a gRPC service.
+
+A target (TRANSLATION_GRPC_TARGET, AUDIO_GRPC_TARGET) is one of
+    "localhost:50051"                      a single server, as before
+    "10.0.0.5:50051,10.0.0.6:50051"        a fixed list of replicas
+    "file:/etc/chat/translation.txt"       a resolver file: one host:port
+                                           per line, '#' comments; re-read
+                                           when it changes
+Every replica has its own pooled channel (channels.py). Each call leases
+one replica:
+
+    with balancer.translation.pick() as replica:
+        stub = channels.get_stub(replica.address, StubClass)
+        ...
+
+Policies (GRPC_LB_POLICY):
+    round_robin         rotate over the healthy replicas
+    least_outstanding   the healthy replica with the fewest calls in
+                        flight from this process; ties rotate
+
+Health: with more than one replica, a background thread checks every
+replica's channel every GRPC_HEALTH_CHECK_INTERVAL seconds (can it
+connect within GRPC_HEALTH_CHECK_TIMEOUT?), evicts those that fail and
+readmits them once they connect again. A call failing with UNAVAILABLE
+evicts its replica at once rather than at the next check. If every
+replica is evicted, calls go to all of them anyway so the caller sees
+the real error instead of an empty pool.
+
+stats() reports per replica: health, calls in flight, requests, errors,
+average and EWMA latency.
+"""
+import itertools
+import os
+import threading
+import time
+
+import grpc
+
+from . import channels, config
+
+
+ROUND_ROBIN = "round_robin"
+LEAST_OUTSTANDING = "least_outstanding"
+POLICIES = (ROUND_ROBIN, LEAST_OUTSTANDING)
+
+# Errors that say the replica itself is unreachable, not the request bad
+_EVICTING_CODES = (grpc.StatusCode.UNAVAILABLE,)
+
+
+def parse_addresses(text):
+    """Addresses from a comma list or resolver file contents."""
+    addresses = []
+    for line in text.replace(",", "\n").splitlines():
+        address = line.split("#", 1)[0].strip()
+        if address and address not in addresses:
+            addresses.append(address)
+    return addresses
+
+
+class Replica:
+
+    __slots__ = ("address", "healthy", "outstanding", "requests", "errors",
+                 "total_ms", "ewma_ms", "evictions", "last_error")
+
+    def __init__(self, address):
+        self.address = address
+        self.healthy = True
+        self.outstanding = 0
+        self.requests = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.ewma_ms = None
+        self.evictions = 0
+        self.last_error = None
+
+    def stats(self):
+        return {
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "errors": self.errors,
+            "evictions": self.evictions,
+            "avg_ms": self.total_ms / self.requests if self.requests else 0.0,
+            "ewma_ms": self.ewma_ms,
+            "last_error": self.last_error,
+        }
+
+
+class _Lease:
+    """
+    One call on one replica; records its outcome on exit, or on
+    release() for calls that complete in a callback.
+    """
+
+    __slots__ = ("balancer", "replica", "start")
+
+    def __init__(self, balancer, replica):
+        self.balancer = balancer
+        self.replica = replica
+        self.start = time.perf_counter()
+
+    def __enter__(self):
+        return self.replica
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release(exc, cancelled=isinstance(exc, GeneratorExit))
+        return False
+
+    def release(self, error=None, cancelled=False):
+        self.balancer._release(
+            self.replica, (time.perf_counter() - self.start) * 1000, error, cancelled
+        )
+
+
+class Balancer:
+
+    def __init__(self, name, target, policy=config.GRPC_LB_POLICY,
+                 check_interval=config.GRPC_HEALTH_CHECK_INTERVAL,
+                 check_timeout=config.GRPC_HEALTH_CHECK_TIMEOUT,
+                 alpha=config.ROUTING_EWMA_ALPHA):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown load balancing policy {policy!r}, expected one of {POLICIES}")
+        self.name = name
+        self.target = target
+        self.policy = policy
+        self.check_interval = check_interval
+        self.check_timeout = check_timeout
+        self.alpha = alpha
+        self._path = target[len("file:"):] if target.startswith("file:") else None
+        self._mtime = None
+        self._lock = threading.Lock()
+        self._replicas = []
+        self._rotation = itertools.count()
+        self._checker = None
+        self._checker_pid = None
+        self._reload()
+
+    # -- replica set -------------------------------------------------------
+
+    def _reload(self):
+        """Read the resolver file if it changed; keep stats of known replicas."""
+        if self._path is None:
+            addresses = parse_addresses(self.target)
+        else:
+            try:
+                mtime = os.stat(self._path).st_mtime
+                if mtime == self._mtime:
+                    return
+                with open(self._path) as f:
+                    addresses = parse_addresses(f.read())
+            except OSError:
+                # Keep the last known replicas while the file is missing
+                return
+            self._mtime = mtime
+        if not addresses:
+            return
+        with self._lock:
+            known = {replica.address: replica for replica in self._replicas}
+            self._replicas = [known.get(address) or Replica(address) for address in addresses]
+
+    def replicas(self):
+        return list(self._replicas)
+
+    # -- picking -----------------------------------------------------------
+
+    def pick(self):
+        """Lease a replica for one call (use as a context manager)."""
+        self._ensure_checker()
+        with self._lock:
+            replicas = self._replicas
+            candidates = [replica for replica in replicas if replica.healthy] or replicas
+            offset = next(self._rotation)
+            if self.policy == ROUND_ROBIN or len(candidates) == 1:
+                replica = candidates[offset % len(candidates)]
+            else:
+                # Scan from a rotating start so ties are spread evenly
+                n = len(candidates)
+                replica = min(
+                    (candidates[(offset + i) % n] for i in range(n)),
+                    key=lambda candidate: candidate.outstanding,
+                )
+            replica.outstanding += 1
+        return _Lease(self, replica)
+
+    def _release(self, replica, elapsed_ms, error, cancelled=False):
+        with self._lock:
+            replica.outstanding -= 1
+            if cancelled:
+                # Abandoned by the caller (a lost hedge, a stream not read
+                # to the end): says nothing about the replica
+                return
+            if error is None:
+                replica.requests += 1
+                replica.total_ms += elapsed_ms
+                replica.ewma_ms = (
+                    elapsed_ms if replica.ewma_ms is None
+                    else replica.ewma_ms + self.alpha * (elapsed_ms - replica.ewma_ms)
+                )
+                return
+            replica.errors += 1
+            code = error.code() if isinstance(error, grpc.RpcError) else None
+            replica.last_error = code.name if code is not None else type(error).__name__
+            if code in _EVICTING_CODES and len(self._replicas) > 1:
+                self._evict(replica)
+
+    def _evict(self, replica):
+        if replica.healthy:
+            replica.healthy = False
+            replica.evictions += 1
+
+    # -- health checks -----------------------------------------------------
+
+    def _ensure_checker(self):
+        # One checker thread per process (again after a fork), and only
+        # when there is something to fail over to or a file to watch
+        if self._checker_pid == os.getpid():
+            return
+        if len(self._replicas) < 2 and self._path is None:
+            return
+        with self._lock:
+            if self._checker_pid == os.getpid():
+                return
+            self._checker = threading.Thread(
+                target=self._check_loop, name=f"{self.name}-health", daemon=True
+            )
+            self._checker_pid = os.getpid()
+            self._checker.start()
+
+    def _check_loop(self):
+        while True:
+            self.check()
+            time.sleep(self.check_interval)
+
+    def check(self):
+        """Reload the resolver file and probe every replica once."""
+        self._reload()
+        for replica in self.replicas():
+            channel = channels.get_channel(replica.address)
+            try:
+                grpc.channel_ready_future(channel).result(timeout=self.check_timeout)
+            except grpc.FutureTimeoutError:
+                with self._lock:
+                    replica.last_error = "health check timed out"
+                    if len(self._replicas) > 1:
+                        self._evict(replica)
+            else:
+                replica.healthy = True
+
+    def stats(self):
+        with self._lock:
+            return {
+                "target": self.target,
+                "policy": self.policy,
+                "healthy": sum(replica.healthy for replica in self._replicas),
+                "replicas": {replica.address: replica.stats() for replica in self._replicas},
+            }
+
+
+# Process-wide balancers used by the gRPC clients
+translation = Balancer("translation", config.TRANSLATION_TARGET)
+audio = Balancer("audio", config.AUDIO_TARGET)
+
+
+def stats():
+    return {"translation": translation.stats(), "audio": audio.stats()}
@@ -0,0 +1,226 @@
+"""
+Bounded in-process cache for translation results.
+
+Chat traffic is highly repetitive, so translate_text answers repeated
+(text, language) pairs from memory instead of making another RPC. The
+cache is LRU, entries expire after a TTL, and it is bounded by both
+entry count and an approximate byte size.
+
+An optional SQLite file can be shared by every gateway worker on the
+host: a local miss checks the shared file before going to the service.
+The shared tier is best effort: when SQLite fails (e.g. the file stays
+locked past the connect timeout) the lookup is a miss and the write is
+skipped, logged and counted in stats()["shared_errors"].
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from . import config
+
+
+logger = logging.getLogger(__name__)
+
+# Rough per-entry bookkeeping cost (tuple key, OrderedDict node, floats)
+ENTRY_OVERHEAD_BYTES = 200
+
+
+class SQLiteCacheBackend:
+    """
+    Cross-process cache tier stored in a local SQLite file.
+
+    Each thread gets its own connection; connections are reopened after
+    a fork since SQLite handles must not cross process boundaries.
+    """
+
+    def __init__(self, path, max_entries=config.TRANSLATION_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.errors = 0
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS translation_cache ("
+                " text TEXT NOT NULL, language TEXT NOT NULL,"
+                " translated TEXT NOT NULL, expires_at REAL NOT NULL,"
+                " PRIMARY KEY (text, language))"
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        """
+        Returns:
+            (translation, expires_at as time.time()), or None on a miss
+        """
+        try:
+            row = self._connection().execute(
+                "SELECT translated, expires_at FROM translation_cache"
+                " WHERE text = ? AND language = ?",
+                key,
+            ).fetchone()
+        except sqlite3.Error as e:
+            self._failed("get", e)
+            return None
+        if row is None or row[1] < time.time():
+            return None
+        return row
+
+    def set(self, key, value, expires_at):
+        try:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO translation_cache VALUES (?, ?, ?, ?)",
+                (key[0], key[1], value, expires_at),
+            )
+            with self._lock:
+                self._writes += 1
+                prune = self._writes % 1000 == 0
+            if prune:
+                self._prune(conn)
+        except sqlite3.Error as e:
+            self._failed("set", e)
+
+    def _failed(self, operation, error):
+        with self._lock:
+            self.errors += 1
+        logger.warning("Shared translation cache %s failed: %s", operation, error)
+
+    def _prune(self, conn):
+        conn.execute("DELETE FROM translation_cache WHERE expires_at < ?", (time.time(),))
+        conn.execute(
+            "DELETE FROM translation_cache WHERE rowid IN ("
+            " SELECT rowid FROM translation_cache ORDER BY expires_at DESC"
+            " LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def clear(self):
+        try:
+            self._connection().execute("DELETE FROM translation_cache")
+        except sqlite3.Error as e:
+            self._failed("clear", e)
+
+
+class TranslationCache:
+    """
+    Thread-safe LRU + TTL cache keyed on (text, target_language).
+    """
+
+    def __init__(self, max_entries=config.TRANSLATION_CACHE_MAX_ENTRIES,
+                 max_bytes=config.TRANSLATION_CACHE_MAX_BYTES,
+                 ttl=config.TRANSLATION_CACHE_TTL, backend=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, expires_at, size)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def _size(key, value):
+        return len(key[0].encode()) + len(key[1]) + len(value.encode()) + ENTRY_OVERHEAD_BYTES
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                self._remove(key)
+                self.expirations += 1
+
+        if self.backend is not None:
+            row = self.backend.get(key)
+            if row is not None:
+                value, expires_at = row
+                with self._lock:
+                    self.shared_hits += 1
+                    # Keep the shared entry's expiry rather than a fresh TTL
+                    self._store(key, value, min(expires_at - time.time(), self.ttl))
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._store(key, value)
+        if self.backend is not None:
+            self.backend.set(key, value, time.time() + self.ttl)
+
+    def _store(self, key, value, ttl=None):
+        size = self._size(key, value)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl), size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "shared_errors": self.backend.errors if self.backend is not None else 0,
+                "hit_ratio": (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+            }
+
+
+def _build_cache():
+    if not config.TRANSLATION_CACHE_ENABLED:
+        return None
+    backend = None
+    if config.TRANSLATION_CACHE_SHARED_PATH:
+        backend = SQLiteCacheBackend(config.TRANSLATION_CACHE_SHARED_PATH)
+    return TranslationCache(backend=backend)
+
+
+# Process-wide cache used by translate_client (None when disabled)
+translation_cache = _build_cache()
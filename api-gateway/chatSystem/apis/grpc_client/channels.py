@@ -0,0 +1,177 @@
+"""
+Process-wide pool of long-lived gRPC channels and stubs.
+
+Creating a channel per call means a new HTTP/2 connection (and handshake)
+for every chat message. Channels are thread-safe and multiplex concurrent
+RPCs, so one channel per target is shared by every request in the process.
+"""
+import asyncio
+import atexit
+import os
+import threading
+
+import grpc
+
+from . import config
+
+
+class ChannelManager:
+    """
+    Keeps one channel per target and one stub per (target, stub class).
+
+    Safe to use from many threads. After a fork the child drops the
+    parent's channels (they are not usable across fork) and lazily opens
+    its own on first use.
+    """
+
+    def __init__(self, options=None):
+        self._options = list(config.CHANNEL_OPTIONS if options is None else options)
+        self._lock = threading.Lock()
+        self._channels = {}
+        self._stubs = {}
+        self._pid = os.getpid()
+
+    def get_channel(self, target):
+        self._check_pid()
+        channel = self._channels.get(target)
+        if channel is not None:
+            return channel
+
+        with self._lock:
+            channel = self._channels.get(target)
+            if channel is None:
+                channel = grpc.insecure_channel(target, options=self._options)
+                self._channels[target] = channel
+            return channel
+
+    def get_stub(self, target, stub_class):
+        key = (target, stub_class)
+        self._check_pid()
+        stub = self._stubs.get(key)
+        if stub is not None:
+            return stub
+
+        channel = self.get_channel(target)
+        with self._lock:
+            stub = self._stubs.get(key)
+            if stub is None:
+                stub = stub_class(channel)
+                self._stubs[key] = stub
+            return stub
+
+    def close(self):
+        """Close every channel. Later calls transparently reopen them."""
+        with self._lock:
+            channels = list(self._channels.values())
+            self._channels.clear()
+            self._stubs.clear()
+
+        for channel in channels:
+            channel.close()
+
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            self._reset_after_fork()
+
+    def _reset_after_fork(self):
+        # The inherited channels belong to the parent; closing them here
+        # would tear down the parent's connections, so just forget them.
+        self._lock = threading.Lock()
+        self._channels = {}
+        self._stubs = {}
+        self._pid = os.getpid()
+
+
+class AioChannelManager:
+    """
+    Pool of grpc.aio channels and stubs for the async gateway path.
+
+    An aio channel is bound to the event loop that created it, so the
+    pool is kept per running loop. A channel holds its loop, so pools are
+    keyed by id(loop) and those of closed loops are dropped whenever a
+    new loop's pool is made: short-lived loops (asyncio.run, async views
+    under WSGI via async_to_sync) leave at most one stale pool behind.
+    A dropped channel's connection is released by its finalizer.
+    """
+
+    def __init__(self, options=None):
+        self._options = list(config.CHANNEL_OPTIONS if options is None else options)
+        self._pools = {}    # id(loop) -> (loop, channels, stubs)
+
+    def _pool(self):
+        loop = asyncio.get_running_loop()
+        pool = self._pools.get(id(loop))
+        # The id of a closed loop can be reused by a new one
+        if pool is None or pool[0] is not loop:
+            self._drop_closed()
+            pool = self._pools[id(loop)] = (loop, {}, {})
+        return pool
+
+    def _drop_closed(self):
+        """Forget the pools of loops that have closed."""
+        for key, (loop, channels, stubs) in list(self._pools.items()):
+            if loop.is_closed():
+                del self._pools[key]
+                channels.clear()
+                stubs.clear()
+
+    def get_channel(self, target):
+        _, channels, _ = self._pool()
+        channel = channels.get(target)
+        if channel is None:
+            channel = grpc.aio.insecure_channel(target, options=self._options)
+            channels[target] = channel
+        return channel
+
+    def get_stub(self, target, stub_class):
+        _, _, stubs = self._pool()
+        key = (target, stub_class)
+        stub = stubs.get(key)
+        if stub is None:
+            stub = stubs[key] = stub_class(self.get_channel(target))
+        return stub
+
+    async def close(self):
+        """Close the channels owned by the running loop."""
+        _, channels, stubs = self._pool()
+        pending = list(channels.values())
+        channels.clear()
+        stubs.clear()
+        for channel in pending:
+            await channel.close()
+
+    def _reset_after_fork(self):
+        self._pools = {}
+
+
+_manager = ChannelManager()
+_aio_manager = AioChannelManager()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_manager._reset_after_fork)
+    os.register_at_fork(after_in_child=_aio_manager._reset_after_fork)
+
+atexit.register(_manager.close)
+
+
+def get_channel(target):
+    return _manager.get_channel(target)
+
+
+def get_stub(target, stub_class):
+    return _manager.get_stub(target, stub_class)
+
+
+def shutdown():
+    """Close all pooled channels (called automatically at interpreter exit)."""
+    _manager.close()
+
+
+def get_aio_stub(target, stub_class):
+    """Return a grpc.aio stub bound to the running event loop."""
+    return _aio_manager.get_stub(target, stub_class)
+
+
+async def shutdown_aio():
+    """Close the grpc.aio channels of the running event loop."""
+    await _aio_manager.close()
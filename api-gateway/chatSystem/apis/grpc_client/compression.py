@@ -0,0 +1,94 @@
+"""
+Per-call compression of audio payloads.
+
+gRPC can gzip or deflate every message of a call, but that only pays off
+for large payloads that actually shrink: text RPCs are a few hundred
+bytes, and a lot of audio (noise, already-compressed formats) barely
+compresses at all while still costing CPU on both ends. So each audio
+call decides for itself:
+
+  - the gateway sends the algorithm it accepts for the response in
+    COMPRESSION_METADATA_KEY ("gzip", "deflate" or "none", from
+    AUDIO_COMPRESSION) and compresses the request with choose()
+  - the audio service compresses the response with choose() on the
+    processed clip and the algorithm the caller asked for
+
+choose() compresses a message only when it is at least
+AUDIO_COMPRESSION_MIN_BYTES long and a sample of it (three slices from
+the start, middle and end, AUDIO_COMPRESSION_SAMPLE_BYTES in total)
+compresses to at most AUDIO_COMPRESSION_MAX_RATIO of its size with the
+fastest zlib level. The sample costs tens of microseconds.
+
+benchmarks/compression_benchmark.py measures bytes on the wire against
+CPU time per clip size and content.
+"""
+import zlib
+
+import grpc
+from prometheus_client import Counter
+
+from . import config
+
+
+ALGORITHMS = {
+    "none": grpc.Compression.NoCompression,
+    "gzip": grpc.Compression.Gzip,
+    "deflate": grpc.Compression.Deflate,
+}
+COMPRESSION_METADATA_KEY = "x-accept-compression"
+
+DECISIONS = Counter(
+    "grpc_payload_compression_total",
+    "Audio messages by the compression chosen for them",
+    ["direction", "algorithm"],
+)
+
+
+def sample_ratio(data, sample_bytes=config.AUDIO_COMPRESSION_SAMPLE_BYTES):
+    """Compressed / original size of a sample of data (1.0 for no data)."""
+    if len(data) <= sample_bytes:
+        sample = bytes(data)
+    else:
+        part = sample_bytes // 3
+        middle = (len(data) - part) // 2
+        view = memoryview(data)
+        sample = b"".join((view[:part], view[middle:middle + part], view[-part:]))
+    if not sample:
+        return 1.0
+    return len(zlib.compress(sample, 1)) / len(sample)
+
+
+def choose(data, algorithm=config.AUDIO_COMPRESSION, direction="request",
+           min_bytes=config.AUDIO_COMPRESSION_MIN_BYTES,
+           max_ratio=config.AUDIO_COMPRESSION_MAX_RATIO):
+    """
+    Compression for one message.
+
+    Args:
+        data: The payload bytes
+        algorithm: "gzip", "deflate" or "none"
+        direction: "request" or "response", for the metrics
+        min_bytes: Smaller payloads are never compressed
+
+    Returns:
+        grpc.Compression
+    """
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"unknown compression {algorithm!r}, expected one of {tuple(ALGORITHMS)}")
+    if algorithm != "none" and (len(data) < min_bytes or sample_ratio(data) > max_ratio):
+        algorithm = "none"
+    DECISIONS.labels(direction, algorithm).inc()
+    return ALGORITHMS[algorithm]
+
+
+def request_metadata(algorithm=config.AUDIO_COMPRESSION):
+    """Call metadata telling the service which response compression to use."""
+    return ((COMPRESSION_METADATA_KEY, algorithm),)
+
+
+def accepted(context):
+    """The response compression the caller asked for (default: "none")."""
+    for key, value in context.invocation_metadata() or ():
+        if key == COMPRESSION_METADATA_KEY and value in ALGORITHMS:
+            return value
+    return "none"
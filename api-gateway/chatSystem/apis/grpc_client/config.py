@@ -0,0 +1,159 @@
+"""
+Shared configuration for the gRPC clients and services.
+
+Values are read from the environment so the same settings apply to the
+Django gateway, the standalone servers and the benchmark scripts.
+"""
+import os
+
+
+# Service targets: "host:port", a comma separated list of replicas, or
+# "file:<path>" to a resolver file with one host:port per line (see
+# balancer.py).
+TRANSLATION_TARGET = os.environ.get("TRANSLATION_GRPC_TARGET", "localhost:50051")
+AUDIO_TARGET = os.environ.get("AUDIO_GRPC_TARGET", "localhost:50052")
+
+# Client-side load balancing over the replicas of a target:
+# "round_robin" or "least_outstanding". With more than one replica, each
+# is probed every GRPC_HEALTH_CHECK_INTERVAL seconds and evicted when it
+# cannot connect within GRPC_HEALTH_CHECK_TIMEOUT.
+GRPC_LB_POLICY = os.environ.get("GRPC_LB_POLICY", "round_robin")
+GRPC_HEALTH_CHECK_INTERVAL = float(os.environ.get("GRPC_HEALTH_CHECK_INTERVAL", 2.0))
+GRPC_HEALTH_CHECK_TIMEOUT = float(os.environ.get("GRPC_HEALTH_CHECK_TIMEOUT", 1.0))
+
+# Client call policy (see resilience.py). Deadlines in seconds cover a
+# call including its retries; 0 means no deadline.
+GRPC_TRANSLATE_DEADLINE = float(os.environ.get("GRPC_TRANSLATE_DEADLINE", 2.0))
+GRPC_TRANSLATE_BATCH_DEADLINE = float(os.environ.get("GRPC_TRANSLATE_BATCH_DEADLINE", 5.0))
+GRPC_AUDIO_DEADLINE = float(os.environ.get("GRPC_AUDIO_DEADLINE", 10.0))
+GRPC_AUDIO_STREAM_DEADLINE = float(os.environ.get("GRPC_AUDIO_STREAM_DEADLINE", 60.0))
+# Retries after UNAVAILABLE / RESOURCE_EXHAUSTED, each on a freshly picked
+# replica after a full-jitter backoff: uniform(0, min(max, base * 2**n)) ms
+GRPC_MAX_RETRIES = int(os.environ.get("GRPC_MAX_RETRIES", 2))
+GRPC_RETRY_BACKOFF_BASE_MS = float(os.environ.get("GRPC_RETRY_BACKOFF_BASE_MS", 25))
+GRPC_RETRY_BACKOFF_MAX_MS = float(os.environ.get("GRPC_RETRY_BACKOFF_MAX_MS", 500))
+# Hedging of idempotent translations: a second RPC goes out when the
+# first has taken longer than the GRPC_HEDGE_QUANTILE of recent calls
+# (never sooner than GRPC_HEDGE_MIN_DELAY_MS). Hedges are limited to
+# GRPC_HEDGE_BUDGET (a fraction) of calls so a slow backend is not
+# buried under twice its load.
+GRPC_HEDGE_ENABLED = os.environ.get("GRPC_HEDGE_ENABLED", "1") == "1"
+GRPC_HEDGE_QUANTILE = float(os.environ.get("GRPC_HEDGE_QUANTILE", 0.95))
+GRPC_HEDGE_MIN_DELAY_MS = float(os.environ.get("GRPC_HEDGE_MIN_DELAY_MS", 1.0))
+GRPC_HEDGE_BUDGET = float(os.environ.get("GRPC_HEDGE_BUDGET", 0.1))
+# Circuit breaker per service: open after GRPC_BREAKER_FAILURES
+# consecutive failed calls (unavailable, deadline exceeded, internal
+# errors), then let one probe call through every GRPC_BREAKER_RESET
+# seconds until one succeeds. While open, calls either fail at once
+# ("fail") or the router runs them in-process ("local").
+GRPC_BREAKER_FAILURES = int(os.environ.get("GRPC_BREAKER_FAILURES", 5))
+GRPC_BREAKER_RESET = float(os.environ.get("GRPC_BREAKER_RESET", 5.0))
+GRPC_BREAKER_FALLBACK = os.environ.get("GRPC_BREAKER_FALLBACK", "local")
+
+# Keepalive: ping idle connections so dead peers are noticed quickly and
+# NATs / load balancers don't silently drop the long-lived channel.
+KEEPALIVE_TIME_MS = int(os.environ.get("GRPC_KEEPALIVE_TIME_MS", 30000))
+KEEPALIVE_TIMEOUT_MS = int(os.environ.get("GRPC_KEEPALIVE_TIMEOUT_MS", 10000))
+
+# Reconnect backoff after a connection drops.
+INITIAL_RECONNECT_BACKOFF_MS = int(os.environ.get("GRPC_INITIAL_RECONNECT_BACKOFF_MS", 100))
+MAX_RECONNECT_BACKOFF_MS = int(os.environ.get("GRPC_MAX_RECONNECT_BACKOFF_MS", 5000))
+
+# Audio larger than AUDIO_STREAM_THRESHOLD bytes goes through the streaming
+# ProcessAudioStream RPC in AUDIO_CHUNK_SIZE pieces instead of one message
+# (the default gRPC message limit is 4 MB). The chunk size is a multiple of
+# 3 so chunks can be base64 encoded independently.
+AUDIO_CHUNK_SIZE = int(os.environ.get("AUDIO_CHUNK_SIZE", 48 * 1024))
+AUDIO_STREAM_THRESHOLD = int(os.environ.get("AUDIO_STREAM_THRESHOLD", 1024 * 1024))
+
+# Audio payload compression, decided per call (see compression.py): the
+# gateway accepts AUDIO_COMPRESSION ("gzip", "deflate" or "none") for
+# responses, and either side compresses a message only when it is at
+# least AUDIO_COMPRESSION_MIN_BYTES and an AUDIO_COMPRESSION_SAMPLE_BYTES
+# sample of it compresses to at most AUDIO_COMPRESSION_MAX_RATIO. gRPC's
+# gzip costs ~100 ms of caller CPU per MiB and only pays off on links
+# slower than ~30-50 Mbit/s (benchmarks/compression_benchmark.py), so it
+# is off by default; enable it when the gateway and the audio service
+# are far apart.
+AUDIO_COMPRESSION = os.environ.get("AUDIO_COMPRESSION", "none")
+AUDIO_COMPRESSION_MIN_BYTES = int(os.environ.get("AUDIO_COMPRESSION_MIN_BYTES", 32 * 1024))
+AUDIO_COMPRESSION_SAMPLE_BYTES = int(os.environ.get("AUDIO_COMPRESSION_SAMPLE_BYTES", 12 * 1024))
+AUDIO_COMPRESSION_MAX_RATIO = float(os.environ.get("AUDIO_COMPRESSION_MAX_RATIO", 0.8))
+
+# Server mode for the standalone services: "sync" (thread pool) or "aio"
+# (grpc.aio on an event loop). In aio mode, ProcessAudio payloads of at
+# least AUDIO_OFFLOAD_THRESHOLD bytes are processed in a pool of
+# AUDIO_PROCESS_WORKERS processes (0 = number of cores) so CPU work never
+# blocks the loop; smaller ones are cheaper to handle inline than to pickle.
+GRPC_SERVER_MODE = os.environ.get("GRPC_SERVER_MODE", "sync")
+AUDIO_PROCESS_WORKERS = int(os.environ.get("AUDIO_PROCESS_WORKERS", 0))
+AUDIO_OFFLOAD_THRESHOLD = int(os.environ.get("AUDIO_OFFLOAD_THRESHOLD", 256 * 1024))
+
+# PCM pipeline (audio_pipeline.py): output rate, rate assumed for raw
+# headerless PCM input, peak normalization target / gain limit, and the
+# noise gate threshold and frame length.
+AUDIO_SAMPLE_RATE = int(os.environ.get("AUDIO_SAMPLE_RATE", 16000))
+AUDIO_RAW_PCM_RATE = int(os.environ.get("AUDIO_RAW_PCM_RATE", 16000))
+AUDIO_TARGET_PEAK_DBFS = float(os.environ.get("AUDIO_TARGET_PEAK_DBFS", -1.0))
+AUDIO_MAX_GAIN_DB = float(os.environ.get("AUDIO_MAX_GAIN_DB", 30.0))
+AUDIO_GATE_THRESHOLD_DBFS = float(os.environ.get("AUDIO_GATE_THRESHOLD_DBFS", -50.0))
+AUDIO_GATE_FRAME_MS = int(os.environ.get("AUDIO_GATE_FRAME_MS", 10))
+
+# Local HTTP ports serving the Prometheus metrics recorded by the server
+# interceptors (interceptors.py); 0 disables the endpoint. The
+# interceptors also return each call's queue wait and handler time (ms)
+# in these trailing metadata keys.
+TRANSLATION_METRICS_PORT = int(os.environ.get("TRANSLATION_METRICS_PORT", 9451))
+AUDIO_METRICS_PORT = int(os.environ.get("AUDIO_METRICS_PORT", 9452))
+QUEUE_WAIT_METADATA_KEY = "x-queue-wait-ms"
+SERVICE_TIME_METADATA_KEY = "x-service-time-ms"
+
+# Directory of <language>.tsv phrase tables (see translation_engine.py)
+TRANSLATION_PHRASE_TABLE_DIR = os.environ.get(
+    "TRANSLATION_PHRASE_TABLE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "phrase_tables")
+)
+
+# Gateway-side translation cache (see cache.py). Setting
+# TRANSLATION_CACHE_SHARED_PATH to a file lets all workers on the host
+# share hits through SQLite.
+TRANSLATION_CACHE_ENABLED = os.environ.get("TRANSLATION_CACHE_ENABLED", "1") == "1"
+TRANSLATION_CACHE_MAX_ENTRIES = int(os.environ.get("TRANSLATION_CACHE_MAX_ENTRIES", 10000))
+TRANSLATION_CACHE_MAX_BYTES = int(os.environ.get("TRANSLATION_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+TRANSLATION_CACHE_TTL = float(os.environ.get("TRANSLATION_CACHE_TTL", 300))
+TRANSLATION_CACHE_SHARED_PATH = os.environ.get("TRANSLATION_CACHE_SHARED_PATH", "")
+
+# Gateway routing between the in-process engine and the remote services
+# (see router.py). GATEWAY_ROUTING_POLICY is "remote" (always gRPC, the
+# default), "local" (always in-process) or "adaptive" (per request, from
+# payload size, measured latency of both paths and local CPU load).
+GATEWAY_ROUTING_POLICY = os.environ.get("GATEWAY_ROUTING_POLICY", "remote")
+# Adaptive: never run audio larger than this in the gateway process
+ROUTING_LOCAL_AUDIO_MAX_BYTES = int(os.environ.get("ROUTING_LOCAL_AUDIO_MAX_BYTES", 1024 * 1024))
+# Adaptive: the local latency estimate is multiplied by
+# 1 + ROUTING_LOAD_WEIGHT * CPU load (0-1)
+ROUTING_LOAD_WEIGHT = float(os.environ.get("ROUTING_LOAD_WEIGHT", 1.0))
+# Adaptive: one request in ROUTING_EXPLORE_EVERY takes the other path to
+# keep its latency estimate current
+ROUTING_EXPLORE_EVERY = int(os.environ.get("ROUTING_EXPLORE_EVERY", 20))
+ROUTING_EWMA_ALPHA = float(os.environ.get("ROUTING_EWMA_ALPHA", 0.2))
+
+CHANNEL_OPTIONS = [
+    ("grpc.keepalive_time_ms", KEEPALIVE_TIME_MS),
+    ("grpc.keepalive_timeout_ms", KEEPALIVE_TIMEOUT_MS),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+    ("grpc.initial_reconnect_backoff_ms", INITIAL_RECONNECT_BACKOFF_MS),
+    ("grpc.min_reconnect_backoff_ms", INITIAL_RECONNECT_BACKOFF_MS),
+    ("grpc.max_reconnect_backoff_ms", MAX_RECONNECT_BACKOFF_MS),
+]
+
+# Servers must accept the client keepalive pings above, otherwise they
+# answer with GOAWAY (too_many_pings) and the client reconnects.
+SERVER_OPTIONS = [
+    ("grpc.keepalive_time_ms", KEEPALIVE_TIME_MS),
+    ("grpc.keepalive_timeout_ms", KEEPALIVE_TIMEOUT_MS),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+    ("grpc.http2.min_ping_interval_without_data_ms", KEEPALIVE_TIME_MS // 2),
+]
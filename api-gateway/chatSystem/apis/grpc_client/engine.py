@@ -0,0 +1,33 @@
+"""
+In-process translation and audio engine.
+
+The one implementation of the work behind TranslationService and
+AudioService. The gRPC servicers call it, and so does the gateway when
+router.py sends a request down the local fast path instead of over gRPC.
+"""
+from . import audio_pipeline, translation_engine
+from .audio_pipeline import AudioFormatError
+
+
+def translate(text, language):
+    return translation_engine.translate(text, language)
+
+
+def translate_many(items):
+    """Translate (text, language) pairs, in order."""
+    return [translation_engine.translate(text, language) for text, language in items]
+
+
+def process_audio(audio):
+    """
+    Run a WAV / raw 16-bit PCM clip through the processing pipeline
+    (see audio_pipeline.py); returns a mono 16-bit WAV file.
+
+    Module-level so it can be sent to a process pool.
+    """
+    return audio_pipeline.process(audio)
+
+
+def warm():
+    """Build the phrase-table indexes before the first request."""
+    translation_engine.engine.warm()
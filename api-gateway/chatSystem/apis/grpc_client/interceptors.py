@@ -0,0 +1,241 @@
+"""
+Server interceptors recording per-method metrics of the gRPC services.
+
+Both services (server.py, audio_server.py), sync and aio, install one of
+these. Per method (e.g. "TranslateText") they record
+    grpc_server_queue_wait_seconds     call received -> first handler
+                                       work (waiting for a pool thread;
+                                       on aio servers, for the event loop)
+    grpc_server_handling_seconds       handler time, by status code
+    grpc_server_handled_total          calls, by status code
+    grpc_server_in_flight              calls being handled
+    grpc_server_{request,response}_message_bytes
+                                       wire size of every message
+and put the queue wait and handler time of each call in its trailing
+metadata (QUEUE_WAIT_METADATA_KEY, SERVICE_TIME_METADATA_KEY, in ms) so
+a client can tell
+network time from service time. Calls rejected by
+maximum_concurrent_rpcs never reach a handler and are not counted.
+
+Sync servers invoke interceptors on the thread that polls the completion
+queue, before the call is submitted to the thread pool; request messages
+are deserialized in the pool. The interval between the two is the queue
+wait, without instrumenting the executor itself.
+
+start_metrics_server() exposes the metrics on a local HTTP port. Worker
+processes of launcher.py write them to PROMETHEUS_MULTIPROC_DIR instead
+and the launcher serves the sum.
+"""
+import os
+import time
+
+import grpc
+from prometheus_client import Counter, Gauge, Histogram
+
+from .config import QUEUE_WAIT_METADATA_KEY, SERVICE_TIME_METADATA_KEY
+
+DURATION_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+SIZE_BUCKETS = tuple(4 ** i for i in range(3, 13))
+
+QUEUE_WAIT = Histogram(
+    "grpc_server_queue_wait_seconds",
+    "Time from call arrival until the handler starts",
+    ["method"],
+    buckets=DURATION_BUCKETS,
+)
+HANDLING = Histogram(
+    "grpc_server_handling_seconds",
+    "Handler time",
+    ["method", "code"],
+    buckets=DURATION_BUCKETS,
+)
+HANDLED = Counter(
+    "grpc_server_handled_total",
+    "Completed calls",
+    ["method", "code"],
+)
+IN_FLIGHT = Gauge(
+    "grpc_server_in_flight",
+    "Calls being handled",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+REQUEST_BYTES = Histogram(
+    "grpc_server_request_message_bytes",
+    "Request message size",
+    ["method"],
+    buckets=SIZE_BUCKETS,
+)
+RESPONSE_BYTES = Histogram(
+    "grpc_server_response_message_bytes",
+    "Response message size",
+    ["method"],
+    buckets=SIZE_BUCKETS,
+)
+
+
+class _CallMetrics:
+    """Timestamps of one call; created when the interceptor sees it."""
+
+    __slots__ = ("method", "received", "started")
+
+    def __init__(self, method):
+        self.method = method
+        self.received = time.perf_counter()
+        self.started = None
+
+    def start(self):
+        # The first deserialization or the handler, whichever comes first
+        if self.started is None:
+            self.started = time.perf_counter()
+            QUEUE_WAIT.labels(self.method).observe(self.started - self.received)
+
+    def begin(self):
+        """
+        The handler starts: the call is in flight until finish(). A
+        request that fails to deserialize never gets here.
+        """
+        self.start()
+        IN_FLIGHT.labels(self.method).inc()
+
+    def finish(self, context, failed):
+        elapsed = time.perf_counter() - self.started
+        code = context.code() or (grpc.StatusCode.UNKNOWN if failed else grpc.StatusCode.OK)
+        code = code.name if isinstance(code, grpc.StatusCode) else str(code)
+        HANDLING.labels(self.method, code).observe(elapsed)
+        HANDLED.labels(self.method, code).inc()
+        IN_FLIGHT.labels(self.method).dec()
+        context.set_trailing_metadata((
+            (QUEUE_WAIT_METADATA_KEY, f"{(self.started - self.received) * 1000:.3f}"),
+            (SERVICE_TIME_METADATA_KEY, f"{elapsed * 1000:.3f}"),
+        ))
+
+    def deserializer(self, deserialize):
+        if deserialize is None:
+            return None
+        request_bytes = REQUEST_BYTES.labels(self.method)
+
+        def wrapped(data):
+            self.start()
+            request_bytes.observe(len(data))
+            return deserialize(data)
+        return wrapped
+
+    def serializer(self, serialize):
+        if serialize is None:
+            return None
+        response_bytes = RESPONSE_BYTES.labels(self.method)
+
+        def wrapped(message):
+            data = serialize(message)
+            response_bytes.observe(len(data))
+            return data
+        return wrapped
+
+
+def _sync_behavior(behavior, call, response_streaming):
+    if response_streaming:
+        def wrapped(request, context):
+            call.begin()
+            failed = True
+            try:
+                yield from behavior(request, context)
+                failed = False
+            finally:
+                call.finish(context, failed)
+        return wrapped
+
+    def wrapped(request, context):
+        call.begin()
+        failed = True
+        try:
+            response = behavior(request, context)
+            failed = False
+            return response
+        finally:
+            call.finish(context, failed)
+    return wrapped
+
+
+def _aio_behavior(behavior, call, response_streaming):
+    if response_streaming:
+        async def wrapped(request, context):
+            call.begin()
+            failed = True
+            try:
+                async for response in behavior(request, context):
+                    yield response
+                failed = False
+            finally:
+                call.finish(context, failed)
+        return wrapped
+
+    async def wrapped(request, context):
+        call.begin()
+        failed = True
+        try:
+            response = await behavior(request, context)
+            failed = False
+            return response
+        finally:
+            call.finish(context, failed)
+    return wrapped
+
+
+_HANDLER_FACTORIES = {
+    (False, False): ("unary_unary", grpc.unary_unary_rpc_method_handler),
+    (False, True): ("unary_stream", grpc.unary_stream_rpc_method_handler),
+    (True, False): ("stream_unary", grpc.stream_unary_rpc_method_handler),
+    (True, True): ("stream_stream", grpc.stream_stream_rpc_method_handler),
+}
+
+
+def _instrument(handler, full_method, wrap_behavior):
+    if handler is None:
+        return None
+    kind, factory = _HANDLER_FACTORIES[(handler.request_streaming, handler.response_streaming)]
+    call = _CallMetrics(full_method.rsplit("/", 1)[-1])
+    return factory(
+        wrap_behavior(getattr(handler, kind), call, handler.response_streaming),
+        request_deserializer=call.deserializer(handler.request_deserializer),
+        response_serializer=call.serializer(handler.response_serializer),
+    )
+
+
+class MetricsInterceptor(grpc.ServerInterceptor):
+    """For grpc.server (thread pool) servers."""
+
+    def intercept_service(self, continuation, handler_call_details):
+        return _instrument(
+            continuation(handler_call_details), handler_call_details.method, _sync_behavior
+        )
+
+
+class AsyncMetricsInterceptor(grpc.aio.ServerInterceptor):
+    """For grpc.aio servers."""
+
+    async def intercept_service(self, continuation, handler_call_details):
+        return _instrument(
+            await continuation(handler_call_details), handler_call_details.method, _aio_behavior
+        )
+
+
+def start_metrics_server(port, addr="127.0.0.1"):
+    """
+    Serve /metrics on addr:port; 0 disables it. With PROMETHEUS_MULTIPROC_DIR
+    set, the sum over every process writing to that directory is served.
+    """
+    if not port:
+        return
+    from prometheus_client import CollectorRegistry, start_http_server
+    from prometheus_client import multiprocess
+
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        start_http_server(port, addr=addr, registry=registry)
+    else:
+        start_http_server(port, addr=addr)
@@ -0,0 +1,275 @@
+"""
+Multi-process launcher for the gRPC services.
+
+A single Python process runs the servicers on one core no matter how many
+threads its pool has (the GIL), so CPU-bound audio work does not scale.
+The launcher forks N worker processes that each bind the same port with
+SO_REUSEPORT; the kernel spreads incoming connections across them.
+
+    python -m apis.grpc_client.launcher audio --workers 4
+    python -m apis.grpc_client.launcher translation --max-concurrent-rpcs 200
+    python -m apis.grpc_client.launcher audio --mode aio
+
+Signals (sent to the launcher):
+    SIGHUP           rolling restart, one worker at a time: start a
+                     replacement, wait until it serves, then drain the old
+                     one (a replacement that does not start aborts the
+                     restart and the old worker keeps serving). A call
+                     that reaches the old worker just as it stops, before
+                     gRPC has handed it to a handler, fails with CANCELLED
+                     (grpcio server shutdown); the handler never ran.
+    SIGTERM/SIGINT   graceful shutdown of every worker
+
+The launcher itself never creates a channel or server: gRPC must not be
+initialised in a process that forks afterwards.
+
+Metrics: every worker records the interceptor metrics (interceptors.py)
+into PROMETHEUS_MULTIPROC_DIR (a temporary directory unless set) and the
+launcher serves their sum on --metrics-port.
+"""
+import argparse
+import asyncio
+import importlib
+import multiprocessing
+import os
+import shutil
+import signal
+import tempfile
+import threading
+import time
+
+from .config import GRPC_SERVER_MODE, TRANSLATION_METRICS_PORT, AUDIO_METRICS_PORT
+
+
+SERVICES = {
+    "translation": ("apis.grpc_client.server", 50051),
+    "audio": ("apis.grpc_client.audio_server", 50052),
+}
+METRICS_PORTS = {
+    "translation": TRANSLATION_METRICS_PORT,
+    "audio": AUDIO_METRICS_PORT,
+}
+
+
+def _worker_main(service, mode, port, threads, max_rpcs, grace, ready):
+    """Entry point of one worker process."""
+    module = importlib.import_module(SERVICES[service][0])
+    if mode == "aio":
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        asyncio.run(_aio_worker_main(module, port, max_rpcs, grace, ready))
+        return
+
+    server = module.create_server(
+        port=port,
+        max_workers=threads,
+        maximum_concurrent_rpcs=max_rpcs,
+        extra_options=[("grpc.so_reuseport", 1)]
+    )
+
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the launcher handles Ctrl+C
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+    server.start()
+    ready.set()
+    stopping.wait()
+    # Stop accepting new RPCs and let in-flight ones finish
+    server.stop(grace).wait()
+
+
+async def _aio_worker_main(module, port, max_rpcs, grace, ready):
+    stopping = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stopping.set)
+
+    kwargs = {}
+    executor = None
+    if hasattr(module, "create_process_pool"):
+        executor = kwargs["executor"] = module.create_process_pool()
+    server = module.create_aio_server(
+        port=port,
+        maximum_concurrent_rpcs=max_rpcs,
+        extra_options=[("grpc.so_reuseport", 1)],
+        **kwargs
+    )
+
+    await server.start()
+    ready.set()
+    await stopping.wait()
+    await server.stop(grace)
+    if executor is not None:
+        executor.shutdown()
+
+
+class Launcher:
+
+    def __init__(self, service, workers, port, threads, max_rpcs, grace, mode="sync",
+                 metrics_port=0):
+        self.service = service
+        self.mode = mode
+        self.workers = workers
+        self.port = port
+        self.threads = threads
+        self.max_rpcs = max_rpcs
+        self.grace = grace
+        self.metrics_port = metrics_port
+        self._metrics_dir = None
+        self._context = multiprocessing.get_context("fork")
+        self._procs = []
+        self._respawn_at = {}   # worker index -> (monotonic time, backoff) after a failed respawn
+        self._stopping = False
+        self._restart_requested = False
+
+    def _spawn(self, timeout=10.0):
+        ready = self._context.Event()
+        proc = self._context.Process(
+            target=_worker_main,
+            args=(self.service, self.mode, self.port, self.threads, self.max_rpcs, self.grace, ready),
+            daemon=False
+        )
+        proc.start()
+        if not ready.wait(timeout):
+            proc.terminate()
+            proc.join(5)
+            if proc.is_alive():
+                proc.kill()
+                proc.join()
+            self._forget(proc)
+            raise RuntimeError(f"{self.service} worker {proc.pid} did not start")
+        return proc
+
+    def _retire(self, proc):
+        if proc.is_alive():
+            os.kill(proc.pid, signal.SIGTERM)
+        proc.join(self.grace + 5)
+        if proc.is_alive():
+            proc.kill()
+            proc.join()
+        self._forget(proc)
+
+    def _forget(self, proc):
+        if self.metrics_port:
+            from prometheus_client import multiprocess
+            # Drop the dead worker's live gauges (in-flight calls)
+            multiprocess.mark_process_dead(proc.pid)
+
+    def _start_metrics(self):
+        """Serve the workers' summed metrics; must run before any worker starts."""
+        if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+            self._metrics_dir = tempfile.mkdtemp(prefix=f"{self.service}-metrics-")
+            os.environ["PROMETHEUS_MULTIPROC_DIR"] = self._metrics_dir
+        from prometheus_client import CollectorRegistry, start_http_server
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        start_http_server(self.metrics_port, addr="127.0.0.1", registry=registry)
+
+    def rolling_restart(self):
+        for i, old in enumerate(list(self._procs)):
+            if self._stopping:
+                return
+            try:
+                new = self._spawn()
+            except RuntimeError as error:
+                # Keep the old worker serving rather than run one short
+                print(f"  {error}; rolling restart aborted, worker {old.pid} kept", flush=True)
+                return
+            self._procs[i] = new
+            self._retire(old)
+            print(f"  worker {old.pid} replaced by {new.pid}", flush=True)
+
+    def _respawn_dead(self, backoff=1.0, backoff_max=30.0):
+        """Replace workers that died unexpectedly, backing off after failed starts."""
+        for i, proc in enumerate(self._procs):
+            if proc.is_alive() or self._stopping:
+                continue
+            retry_at, delay = self._respawn_at.get(i, (0.0, backoff))
+            if time.monotonic() < retry_at:
+                continue
+            if i not in self._respawn_at:
+                print(f"  worker {proc.pid} exited ({proc.exitcode}), restarting", flush=True)
+                self._forget(proc)
+            try:
+                self._procs[i] = self._spawn()
+            except RuntimeError as error:
+                print(f"  {error}; retrying in {delay:g}s", flush=True)
+                self._respawn_at[i] = (time.monotonic() + delay, min(delay * 2, backoff_max))
+            else:
+                self._respawn_at.pop(i, None)
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        signal.signal(signal.SIGHUP, self._on_hup)
+
+        if self.metrics_port:
+            self._start_metrics()
+        try:
+            for _ in range(self.workers):
+                self._procs.append(self._spawn())
+            print(
+                f"{self.service} gRPC Service running on port {self.port} "
+                f"({self.workers} {self.mode} processes x {self.threads} threads, "
+                f"max_concurrent_rpcs={self.max_rpcs}, metrics port {self.metrics_port or 'off'})",
+                flush=True
+            )
+
+            while not self._stopping:
+                if self._restart_requested:
+                    self._restart_requested = False
+                    print("Rolling restart...", flush=True)
+                    self.rolling_restart()
+                self._respawn_dead()
+                time.sleep(0.5)
+        finally:
+            # Whatever ended the loop, never leave workers holding the port
+            for proc in self._procs:
+                if proc.is_alive():
+                    os.kill(proc.pid, signal.SIGTERM)
+            for proc in self._procs:
+                self._retire(proc)
+            if self._metrics_dir:
+                shutil.rmtree(self._metrics_dir, ignore_errors=True)
+
+    def _on_stop(self, *_):
+        self._stopping = True
+
+    def _on_hup(self, *_):
+        self._restart_requested = True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("service", choices=sorted(SERVICES))
+    parser.add_argument("--mode", choices=["sync", "aio"], default=GRPC_SERVER_MODE,
+                        help="thread-pool or grpc.aio servers")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: number of cores)")
+    parser.add_argument("--port", type=int, help="default: the service's usual port")
+    parser.add_argument("--threads", type=int, default=10,
+                        help="thread pool size per worker")
+    parser.add_argument("--max-concurrent-rpcs", type=int, default=None,
+                        help="per-worker cap on in-flight RPCs")
+    parser.add_argument("--grace", type=float, default=5.0,
+                        help="seconds in-flight RPCs get to finish on stop")
+    parser.add_argument("--metrics-port", type=int,
+                        help="Prometheus metrics port, 0 to disable "
+                             "(default: the service's usual metrics port)")
+    args = parser.parse_args(argv)
+
+    Launcher(
+        service=args.service,
+        mode=args.mode,
+        workers=args.workers,
+        port=args.port or SERVICES[args.service][1],
+        threads=args.threads,
+        max_rpcs=args.max_concurrent_rpcs,
+        grace=args.grace,
+        metrics_port=METRICS_PORTS[args.service] if args.metrics_port is None else args.metrics_port,
+    ).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,533 @@
+"""
+Deadlines, retries, hedging and circuit breaking for the gRPC clients.
+
+Every RPC of translate_client.py and audio_client.py goes through the
+ResilientClient of its service:
+
+    response = resilience.translation.call(
+        "TranslateText", request, config.GRPC_TRANSLATE_DEADLINE, hedge=True
+    )
+
+  - Deadline: the call, including its retries and backoff, fails with
+    DEADLINE_EXCEEDED once it is used up; every attempt is sent with the
+    time that is left, so a stuck servicer thread can no longer pin a
+    gateway worker.
+  - Retries: an attempt failing with UNAVAILABLE or RESOURCE_EXHAUSTED
+    (never processed by the service) is retried up to GRPC_MAX_RETRIES
+    times on a freshly picked replica, after a full-jitter backoff.
+  - Hedging (idempotent calls only, hedge=True): when the first attempt
+    has not answered within the GRPC_HEDGE_QUANTILE of recent successful
+    calls of that method, a second one goes to another replica; the first
+    answer wins and the other is cancelled. Hedges draw on a budget of
+    GRPC_HEDGE_BUDGET per call so they cannot double a slow backend's
+    load, and none are sent until the method has a latency history.
+  - Circuit breaker, one per service: after GRPC_BREAKER_FAILURES
+    consecutive failed attempts (unavailable, deadline exceeded, internal
+    errors) calls raise CircuitOpenError at once, without touching the
+    network. Every GRPC_BREAKER_RESET seconds one probe call is let
+    through; only an OK answer to it closes the circuit. Other outcomes
+    (request errors, client-side exceptions) neither count as failures
+    nor close it, and attempts admitted before the circuit opened do not
+    count once it has. The router (router.py)
+    answers CircuitOpenError with the in-process engine when
+    GRPC_BREAKER_FALLBACK is "local".
+
+stats() reports, per service, the breaker state, attempts, retries,
+hedges and how often they won, errors by status code and the current
+hedge delay per method.
+"""
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+
+import grpc
+
+from . import audio_pb2_grpc, translation_pb2_grpc
+from . import balancer, channels, config
+from .. import metrics, timing
+
+
+# Attempts that failed before the service did any work: safe to resend
+RETRYABLE_CODES = (grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.RESOURCE_EXHAUSTED)
+# Failures that count against the backend; the rest (INVALID_ARGUMENT,
+# NOT_FOUND, ...) are answers about the request
+FAILURE_CODES = (
+    grpc.StatusCode.UNAVAILABLE,
+    grpc.StatusCode.DEADLINE_EXCEEDED,
+    grpc.StatusCode.RESOURCE_EXHAUSTED,
+    grpc.StatusCode.INTERNAL,
+    grpc.StatusCode.UNKNOWN,
+)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Tickets from CircuitBreaker.allow(): a call let through while closed,
+# or the one probe of a half-open circuit
+ADMITTED = "admitted"
+PROBE = "probe"
+
+# Unused hedge budget saved up for bursts, in hedges
+HEDGE_BURST = 10
+
+
+class CircuitOpenError(Exception):
+    """A call refused without being sent because its service's circuit is open."""
+
+    def __init__(self, service):
+        super().__init__(f"circuit open for the {service} service")
+        self.service = service
+
+
+def _code(error):
+    return error.code() if isinstance(error, grpc.RpcError) else None
+
+
+def _code_name(error):
+    if error is None:
+        return "OK"
+    code = _code(error)
+    return code.name if code is not None else "UNKNOWN"
+
+
+def _remaining(expires):
+    """Seconds until expires (a monotonic time), or None for no deadline."""
+    if expires is None:
+        return None
+    return max(0.0, expires - time.monotonic())
+
+
+class CircuitBreaker:
+
+    def __init__(self, name, failures=config.GRPC_BREAKER_FAILURES,
+                 reset=config.GRPC_BREAKER_RESET, clock=time.monotonic):
+        self.name = name
+        self.failures = failures
+        self.reset = reset
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.opened = 0
+        self.rejected = 0
+
+    def allow(self):
+        """
+        Whether a call may go out now; half-open lets one probe at a time.
+
+        Returns:
+            A ticket (ADMITTED or PROBE) to pass to record(), or None
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return ADMITTED
+            if self.state == OPEN and self._clock() - self._opened_at >= self.reset:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return PROBE
+            self.rejected += 1
+            return None
+
+    def check(self):
+        """allow(), raising CircuitOpenError instead of returning None."""
+        ticket = self.allow()
+        if ticket is None:
+            metrics.GRPC_CIRCUIT_REJECTED.labels(self.name).inc()
+            raise CircuitOpenError(self.name)
+        return ticket
+
+    def record(self, ticket, error=None, cancelled=False):
+        """Record the outcome of an attempt let through with ticket."""
+        with self._lock:
+            probe = ticket == PROBE
+            if probe:
+                self._probing = False
+            if cancelled:
+                return
+            if self.state != CLOSED and not probe:
+                # Sent before the circuit opened: only the probe decides now
+                return
+            if error is None:
+                self._consecutive = 0
+                self.state = CLOSED
+                return
+            if _code(error) not in FAILURE_CODES:
+                return
+            self._consecutive += 1
+            if probe or self._consecutive >= self.failures:
+                if self.state != OPEN:
+                    self.opened += 1
+                self.state = OPEN
+                self._opened_at = self._clock()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self._consecutive,
+                "opened": self.opened,
+                "rejected": self.rejected,
+            }
+
+
+class LatencyWindow:
+    """Recent successful call times of one method, for the hedge delay."""
+
+    def __init__(self, size=200, min_samples=20, refresh_every=20):
+        self.min_samples = min_samples
+        self.refresh_every = refresh_every
+        self._samples = deque(maxlen=size)
+        self._added = 0
+        self._sorted = None
+
+    def add(self, seconds):
+        self._samples.append(seconds)
+        self._added += 1
+        if self._added % self.refresh_every == 0:
+            self._sorted = None
+
+    def quantile(self, q):
+        """Seconds, or None while there are fewer than min_samples."""
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = self._sorted
+        if ordered is None:
+            ordered = self._sorted = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class ResilientClient:
+    """
+    Sends the unary RPCs of one service with a deadline, retries, optional
+    hedging and a circuit breaker; call() from threads, call_async() from
+    coroutines, stream() for the request-streaming audio RPC.
+    """
+
+    def __init__(self, name, balancer, stub_class, breaker=None,
+                 max_retries=config.GRPC_MAX_RETRIES,
+                 backoff_base_ms=config.GRPC_RETRY_BACKOFF_BASE_MS,
+                 backoff_max_ms=config.GRPC_RETRY_BACKOFF_MAX_MS,
+                 hedge_enabled=config.GRPC_HEDGE_ENABLED,
+                 hedge_quantile=config.GRPC_HEDGE_QUANTILE,
+                 hedge_min_delay_ms=config.GRPC_HEDGE_MIN_DELAY_MS,
+                 hedge_budget=config.GRPC_HEDGE_BUDGET):
+        self.name = name
+        self.balancer = balancer
+        self.stub_class = stub_class
+        self.breaker = breaker or CircuitBreaker(name)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base_ms / 1000
+        self.backoff_max = backoff_max_ms / 1000
+        self.hedge_enabled = hedge_enabled
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay_ms / 1000
+        self.hedge_budget = hedge_budget
+        self._lock = threading.Lock()
+        self._hedge_tokens = 0.0
+        self._latency = {}          # method -> LatencyWindow
+        self.attempts = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.errors = {}            # status code name -> attempts
+
+    # -- policy ------------------------------------------------------------
+
+    def _window(self, method):
+        window = self._latency.get(method)
+        if window is None:
+            window = self._latency.setdefault(method, LatencyWindow())
+        return window
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _retry_delay(self, method, error, attempt, expires):
+        """Seconds to wait before retrying after error, or None to give up."""
+        if _code(error) not in RETRYABLE_CODES or attempt >= self.max_retries:
+            return None
+        delay = self._backoff(attempt)
+        if expires is not None and time.monotonic() + delay >= expires:
+            return None
+        with self._lock:
+            self.retries += 1
+        metrics.GRPC_RETRIES.labels(method, _code_name(error)).inc()
+        return delay
+
+    def _hedge_delay(self, method):
+        """Seconds to wait for the first attempt before hedging, or None."""
+        if not self.hedge_enabled:
+            return None
+        with self._lock:
+            self._hedge_tokens = min(HEDGE_BURST, self._hedge_tokens + self.hedge_budget)
+        delay = self._window(method).quantile(self.hedge_quantile)
+        return None if delay is None else max(delay, self.hedge_min_delay)
+
+    def _take_hedge(self, method):
+        # A half-open circuit gets its single probe, nothing more
+        if self.breaker.state != CLOSED:
+            return False
+        with self._lock:
+            if self._hedge_tokens < 1:
+                return False
+            self._hedge_tokens -= 1
+            self.hedges += 1
+        metrics.GRPC_HEDGES.labels(method).inc()
+        return True
+
+    def _won_hedge(self, method):
+        with self._lock:
+            self.hedge_wins += 1
+        metrics.GRPC_HEDGE_WINS.labels(method).inc()
+
+    def _finish(self, method, ticket, lease, start, error=None, metadata=None, cancelled=False):
+        """Book-keeping for one completed attempt."""
+        elapsed = time.perf_counter() - start
+        lease.release(error, cancelled=cancelled)
+        self.breaker.record(ticket, error, cancelled=cancelled)
+        code = "CANCELLED" if cancelled else _code_name(error)
+        metrics.observe_grpc(
+            method, code, lease.replica.address, elapsed,
+            metrics.service_seconds(metadata) if metadata else None,
+        )
+        with self._lock:
+            self.attempts += 1
+            if error is not None:
+                self.errors[code] = self.errors.get(code, 0) + 1
+        if error is None and not cancelled:
+            self._window(method).add(elapsed)
+
+    # -- threads -----------------------------------------------------------
+
+    def call(self, method, request, deadline, hedge=False, **options):
+        """
+        Send one unary RPC.
+
+        Args:
+            method: RPC name on the stub, e.g. "TranslateText"
+            request: Request message
+            deadline: Seconds for the whole call, retries included; 0 for none
+            hedge: The call is idempotent and may be hedged
+            options: Passed to every attempt (metadata, compression)
+
+        Returns:
+            The response message
+        """
+        expires = time.monotonic() + deadline if deadline else None
+        with timing.phase("grpc"):
+            attempt = 0
+            while True:
+                ticket = self.breaker.check()
+                try:
+                    if hedge:
+                        return self._hedged(method, request, expires, options, ticket)
+                    return self._start(method, request, expires, options, ticket).result()
+                except grpc.RpcError as e:
+                    delay = self._retry_delay(method, e, attempt, expires)
+                    if delay is None:
+                        raise
+                time.sleep(delay)
+                attempt += 1
+
+    def _start(self, method, request, expires, options, ticket):
+        """Send one attempt; returns its grpc.Future."""
+        lease = self._pick(ticket)
+        stub = channels.get_stub(lease.replica.address, self.stub_class)
+        start = time.perf_counter()
+        try:
+            future = getattr(stub, method).future(
+                request, timeout=_remaining(expires), **options
+            )
+        except BaseException as e:
+            self._finish(method, ticket, lease, start, e)
+            raise
+
+        def done(future):
+            if future.cancelled():
+                self._finish(method, ticket, lease, start, cancelled=True)
+            else:
+                self._finish(method, ticket, lease, start, future.exception(),
+                             future.trailing_metadata())
+        future.add_done_callback(done)
+        return future
+
+    def _pick(self, ticket):
+        try:
+            return self.balancer.pick()
+        except BaseException as e:
+            # Nothing was sent, but a probe must still give its slot back
+            self.breaker.record(ticket, e)
+            raise
+
+    def _hedged(self, method, request, expires, options, ticket):
+        delay = self._hedge_delay(method)
+        primary = self._start(method, request, expires, options, ticket)
+        if delay is None:
+            return primary.result()
+        try:
+            return primary.result(timeout=delay)
+        except grpc.FutureTimeoutError:
+            pass
+        if not self._take_hedge(method):
+            return primary.result()
+
+        secondary = self._start(method, request, expires, options, ADMITTED)
+        completed = threading.Event()
+        pending = [primary, secondary]
+        for future in pending:
+            future.add_done_callback(lambda _: completed.set())
+        while True:
+            completed.wait()
+            completed.clear()
+            for future in [future for future in pending if future.done()]:
+                pending.remove(future)
+                if future.exception() is None:
+                    for loser in pending:
+                        loser.cancel()
+                    if future is secondary:
+                        self._won_hedge(method)
+                    return future.result()
+                if not pending:
+                    raise future.exception()
+
+    # -- coroutines --------------------------------------------------------
+
+    async def call_async(self, method, request, deadline, hedge=False, **options):
+        """call() for coroutines, over grpc.aio."""
+        expires = time.monotonic() + deadline if deadline else None
+        with timing.phase("grpc"):
+            attempt = 0
+            while True:
+                ticket = self.breaker.check()
+                try:
+                    if hedge:
+                        return await self._hedged_async(method, request, expires, options, ticket)
+                    return await self._attempt_async(method, request, expires, options, ticket)
+                except grpc.RpcError as e:
+                    delay = self._retry_delay(method, e, attempt, expires)
+                    if delay is None:
+                        raise
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    async def _attempt_async(self, method, request, expires, options, ticket):
+        lease = self._pick(ticket)
+        stub = channels.get_aio_stub(lease.replica.address, self.stub_class)
+        start = time.perf_counter()
+        call = None
+        try:
+            call = getattr(stub, method)(request, timeout=_remaining(expires), **options)
+            response = await call
+        except asyncio.CancelledError:
+            if call is not None:
+                call.cancel()
+            self._finish(method, ticket, lease, start, cancelled=True)
+            raise
+        except grpc.aio.AioRpcError as e:
+            self._finish(method, ticket, lease, start, e, e.trailing_metadata())
+            raise
+        except BaseException as e:
+            self._finish(method, ticket, lease, start, e)
+            raise
+        self._finish(method, ticket, lease, start, metadata=await call.trailing_metadata())
+        return response
+
+    async def _hedged_async(self, method, request, expires, options, ticket):
+        delay = self._hedge_delay(method)
+        primary = asyncio.ensure_future(
+            self._attempt_async(method, request, expires, options, ticket)
+        )
+        pending = {primary}
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(pending, timeout=delay)
+                if not done and self._take_hedge(method):
+                    secondary = asyncio.ensure_future(
+                        self._attempt_async(method, request, expires, options, ADMITTED)
+                    )
+                    pending.add(secondary)
+                    while pending:
+                        done, pending = await asyncio.wait(
+                            pending, return_when=asyncio.FIRST_COMPLETED
+                        )
+                        for task in done:
+                            if task.exception() is None:
+                                if task is secondary:
+                                    self._won_hedge(method)
+                                return task.result()
+                            error = task.exception()
+                    raise error
+            return await primary
+        finally:
+            for task in pending:
+                task.cancel()
+
+    # -- streams -----------------------------------------------------------
+
+    def stream(self, method, request_iterator, deadline, **options):
+        """
+        Send one stream-stream RPC with a deadline and the circuit breaker.
+        Not retried or hedged: the request iterator can only be read once.
+
+        Returns:
+            Iterator over the response messages
+        """
+        ticket = self.breaker.check()
+        try:
+            with (
+                self.balancer.pick() as replica,
+                metrics.grpc_timer(method, replica.address) as rpc,
+            ):
+                stub = channels.get_stub(replica.address, self.stub_class)
+                responses = getattr(stub, method)(
+                    request_iterator, timeout=deadline or None, **options
+                )
+                try:
+                    yield from responses
+                    rpc.trailers(responses.trailing_metadata())
+                except GeneratorExit:
+                    responses.cancel()
+                    raise
+        except GeneratorExit:
+            self.breaker.record(ticket, cancelled=True)
+            raise
+        except BaseException as e:
+            self.breaker.record(ticket, e)
+            raise
+        self.breaker.record(ticket)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "breaker": self.breaker.stats(),
+                "attempts": self.attempts,
+                "retries": self.retries,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "errors": dict(self.errors),
+                "hedge_delay_ms": {
+                    method: delay * 1000
+                    for method, delay in (
+                        (method, window.quantile(self.hedge_quantile))
+                        for method, window in self._latency.items()
+                    )
+                    if delay is not None
+                },
+            }
+
+
+# Process-wide clients used by translate_client.py and audio_client.py
+translation = ResilientClient(
+    "translation", balancer.translation, translation_pb2_grpc.TranslationServiceStub
+)
+audio = ResilientClient("audio", balancer.audio, audio_pb2_grpc.AudioServiceStub)
+
+
+def stats():
+    return {"translation": translation.stats(), "audio": audio.stats()}
@@ -0,0 +1,293 @@
+"""
+Per-request routing between the in-process engine and the gRPC services.
+
+Every translation or audio request in the gateway goes through a Router,
+which runs it either locally (engine.py, no network hop) or remotely (the
+gRPC clients, with their cache and request coalescing). The policy is
+
+  - "local"     always in-process (what the REST-only views used to inline)
+  - "remote"    always over gRPC
+  - "adaptive"  per request:
+        audio above ROUTING_LOCAL_AUDIO_MAX_BYTES     -> remote ("size")
+        a path without a latency estimate yet          -> that path ("explore")
+        every ROUTING_EXPLORE_EVERY-th request         -> the other path ("explore")
+        otherwise the path with the lower estimate     -> ("latency"), or
+        ("load") when only the CPU load penalty made remote win
+
+A remote request refused by an open circuit breaker (resilience.py) runs
+in-process instead when GRPC_BREAKER_FALLBACK is "local"; those are
+counted as "fallbacks" and recorded on the local path.
+
+Latency estimates are EWMAs kept per operation, path and payload size
+class (powers of two). The local estimate is multiplied by
+1 + ROUTING_LOAD_WEIGHT * load, since more local work on a busy CPU slows
+every request in the process, not just this one. CPU load is the larger
+of this process's CPU use and the host load average, per core (0-1),
+sampled at most twice a second. A busy CPU alone never forces requests
+remote: offloading 0.1 ms of work onto a 10 ms round-trip does not make
+anything faster.
+
+stats() reports decisions by path and reason, observed latency per path,
+the current estimates and the estimated time saved by the routing choice
+(estimate of the path not taken minus the observed latency).
+"""
+import asyncio
+import os
+import threading
+import time
+
+from . import config, engine
+from ..timing import phase
+from .resilience import CircuitOpenError
+from .audio_client import process_audio as remote_process_audio
+from .audio_client import process_audio_async as remote_process_audio_async
+from .translate_client import translate_text, translate_text_async, translate_batch
+
+
+LOCAL = "local"
+REMOTE = "remote"
+POLICIES = (LOCAL, REMOTE, "adaptive")
+FALLBACKS = (LOCAL, "fail")
+
+
+class Router:
+
+    def __init__(self, policy=config.GATEWAY_ROUTING_POLICY,
+                 local_audio_max_bytes=config.ROUTING_LOCAL_AUDIO_MAX_BYTES,
+                 load_weight=config.ROUTING_LOAD_WEIGHT,
+                 explore_every=config.ROUTING_EXPLORE_EVERY,
+                 alpha=config.ROUTING_EWMA_ALPHA,
+                 circuit_fallback=config.GRPC_BREAKER_FALLBACK):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown routing policy {policy!r}, expected one of {POLICIES}")
+        if circuit_fallback not in FALLBACKS:
+            raise ValueError(
+                f"unknown circuit breaker fallback {circuit_fallback!r}, expected one of {FALLBACKS}"
+            )
+        self.policy = policy
+        self.circuit_fallback = circuit_fallback
+        self.local_audio_max_bytes = local_audio_max_bytes
+        self.load_weight = load_weight
+        self.explore_every = explore_every
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self._estimates = {}   # (operation, path, size class) -> EWMA ms
+        self._ops = {}
+        self._cores = os.cpu_count() or 1
+        self._load = 0.0
+        self._load_at = time.monotonic()
+        self._cpu_at = time.process_time()
+
+    # -- load and estimates ------------------------------------------------
+
+    def cpu_load(self):
+        now = time.monotonic()
+        if now - self._load_at >= 0.5:
+            cpu = time.process_time()
+            process_load = (cpu - self._cpu_at) / (now - self._load_at) / self._cores
+            host_load = os.getloadavg()[0] / self._cores if hasattr(os, "getloadavg") else 0.0
+            self._load = min(1.0, max(process_load, host_load))
+            self._load_at, self._cpu_at = now, cpu
+        return self._load
+
+    def _estimate(self, operation, path, size_class):
+        return self._estimates.get((operation, path, size_class))
+
+    def _load_penalty(self):
+        return 1.0 + self.load_weight * self.cpu_load()
+
+    def _op_stats(self, operation):
+        stats = self._ops.get(operation)
+        if stats is None:
+            stats = self._ops[operation] = {
+                "decisions": {LOCAL: 0, REMOTE: 0},
+                "reasons": {},
+                "requests": {LOCAL: 0, REMOTE: 0},
+                "total_ms": {LOCAL: 0.0, REMOTE: 0.0},
+                "errors": {LOCAL: 0, REMOTE: 0},
+                "fallbacks": 0,
+                "estimated_saved_ms": 0.0,
+            }
+        return stats
+
+    # -- decisions ---------------------------------------------------------
+
+    def decide(self, operation, size, policy=None):
+        """
+        Choose a path for one request.
+
+        Returns:
+            (path, reason, estimate of the other path in ms or None)
+        """
+        policy = policy or self.policy
+        size_class = max(size, 1).bit_length()
+        with self._lock:
+            stats = self._op_stats(operation)
+            if policy in (LOCAL, REMOTE):
+                path, reason, other = policy, "forced", None
+            else:
+                path, reason, other = self._adaptive(operation, size, size_class, stats)
+            stats["decisions"][path] += 1
+            stats["reasons"][reason] = stats["reasons"].get(reason, 0) + 1
+        return path, reason, other
+
+    def _adaptive(self, operation, size, size_class, stats):
+        if operation == "audio" and size > self.local_audio_max_bytes:
+            return REMOTE, "size", None
+        local = self._estimate(operation, LOCAL, size_class)
+        remote = self._estimate(operation, REMOTE, size_class)
+        if remote is None:
+            return REMOTE, "explore", local
+        if local is None:
+            return LOCAL, "explore", remote
+
+        loaded_local = local * self._load_penalty()
+        preferred, other = (LOCAL, remote) if loaded_local <= remote else (REMOTE, loaded_local)
+        if self.explore_every and sum(stats["decisions"].values()) % self.explore_every == 0:
+            path = REMOTE if preferred == LOCAL else LOCAL
+            return path, "explore", None
+        reason = "load" if preferred == REMOTE and local <= remote else "latency"
+        return preferred, reason, other
+
+    def record(self, operation, size, path, elapsed_ms, other_estimate=None, error=False):
+        key = (operation, path, max(size, 1).bit_length())
+        with self._lock:
+            stats = self._op_stats(operation)
+            if error:
+                stats["errors"][path] += 1
+                return
+            previous = self._estimates.get(key)
+            self._estimates[key] = (
+                elapsed_ms if previous is None
+                else previous + self.alpha * (elapsed_ms - previous)
+            )
+            stats["requests"][path] += 1
+            stats["total_ms"][path] += elapsed_ms
+            if other_estimate is not None:
+                stats["estimated_saved_ms"] += other_estimate - elapsed_ms
+
+    # -- execution ---------------------------------------------------------
+
+    def _fall_back(self, operation):
+        """Whether to run a request refused by an open circuit locally."""
+        if self.circuit_fallback != LOCAL:
+            return False
+        with self._lock:
+            self._op_stats(operation)["fallbacks"] += 1
+        return True
+
+    def run(self, operation, size, local_fn, remote_fn, *args, policy=None):
+        """Run one request on the chosen path. Returns (result, path)."""
+        path, _, other = self.decide(operation, size, policy)
+        start = time.perf_counter()
+        try:
+            if path == REMOTE:
+                try:
+                    result = remote_fn(*args)
+                except CircuitOpenError:
+                    if not self._fall_back(operation):
+                        raise
+                    path, other = LOCAL, None
+            if path == LOCAL:
+                with phase("local"):
+                    result = local_fn(*args)
+        except Exception:
+            self.record(operation, size, path, 0.0, error=True)
+            raise
+        self.record(operation, size, path, (time.perf_counter() - start) * 1000, other)
+        return result, path
+
+    async def run_async(self, operation, size, local_fn, remote_fn, *args, policy=None,
+                        offload=True):
+        """
+        Async variant: remote_fn is a coroutine function; with offload,
+        local_fn runs in a thread so CPU work never blocks the event loop
+        (not worth it for work cheaper than the thread hop).
+        """
+        path, _, other = self.decide(operation, size, policy)
+        start = time.perf_counter()
+        try:
+            if path == REMOTE:
+                try:
+                    result = await remote_fn(*args)
+                except CircuitOpenError:
+                    if not self._fall_back(operation):
+                        raise
+                    path, other = LOCAL, None
+            if path == LOCAL:
+                with phase("local"):
+                    result = await asyncio.to_thread(local_fn, *args) if offload else local_fn(*args)
+        except Exception:
+            self.record(operation, size, path, 0.0, error=True)
+            raise
+        self.record(operation, size, path, (time.perf_counter() - start) * 1000, other)
+        return result, path
+
+    def stats(self):
+        with self._lock:
+            operations = {}
+            for operation, stats in self._ops.items():
+                operations[operation] = {
+                    **stats,
+                    "decisions": dict(stats["decisions"]),
+                    "reasons": dict(stats["reasons"]),
+                    "avg_ms": {
+                        path: stats["total_ms"][path] / stats["requests"][path]
+                        if stats["requests"][path] else 0.0
+                        for path in (LOCAL, REMOTE)
+                    },
+                    "estimates_ms": {
+                        f"{path}/<{2 ** size_class}B": estimate
+                        for (op, path, size_class), estimate in sorted(self._estimates.items())
+                        if op == operation
+                    },
+                }
+            return {
+                "policy": self.policy,
+                "circuit_fallback": self.circuit_fallback,
+                "cpu_load": self._load,
+                "operations": operations,
+            }
+
+
+# Process-wide router used by the gateway views
+router = Router()
+
+
+def translate(text, language, policy=None):
+    """Returns (translated text, path)."""
+    return router.run(
+        "translate", len(text), engine.translate, translate_text, text, language,
+        policy=policy
+    )
+
+
+def translate_many(items, policy=None):
+    """Returns (translations in order, path); the batch takes one path."""
+    return router.run(
+        "translate_batch", sum(len(text) for text, _ in items),
+        engine.translate_many, translate_batch, items,
+        policy=policy
+    )
+
+
+def process_audio(audio, policy=None):
+    """Returns (processed audio, path)."""
+    return router.run(
+        "audio", len(audio), engine.process_audio, remote_process_audio, audio,
+        policy=policy
+    )
+
+
+async def translate_async(text, language, policy=None):
+    return await router.run_async(
+        "translate", len(text), engine.translate, translate_text_async, text, language,
+        policy=policy, offload=False
+    )
+
+
+async def process_audio_async(audio, policy=None):
+    return await router.run_async(
+        "audio", len(audio), engine.process_audio, remote_process_audio_async, audio,
+        policy=policy
+    )
@@ -1,34 +1,125 @@
+import argparse
+import asyncio
 import grpc
 from concurrent import futures
 import sys
 from pathlib import Path
-from .translation_pb2 import TextResponse
+from .translation_pb2 import TextResponse, BatchResponse
 from . import translation_pb2_grpc
+from .config import SERVER_OPTIONS, GRPC_SERVER_MODE, TRANSLATION_METRICS_PORT
+from . import engine
+from .interceptors import MetricsInterceptor, AsyncMetricsInterceptor, start_metrics_server
+
 
 class TranslationService(translation_pb2_grpc.TranslationServiceServicer):
 
     def TranslateText(self, request, context):
-        mapping = {
-            "ur": "ہیلو",
-            "fr": "Bonjour",
-            "es": "Hola"
-        }
-
         return TextResponse(
-            translated_text=mapping.get(request.language, request.text)
+            translated_text=engine.translate(request.text, request.language)
+        )
+
+    def TranslateBatch(self, request, context):
+        """
+        Translate many (text, language) items in one round-trip.
+        Results are returned in the same order as the request items.
+        """
+        return BatchResponse(
+            items=[self.TranslateText(item, context) for item in request.items]
         )
 
 
-def serve():
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+def create_server(port=50051, max_workers=10, maximum_concurrent_rpcs=None,
+                  extra_options=()):
+    """
+    Build (but don't start) a Translation gRPC server bound to port.
+
+    maximum_concurrent_rpcs caps in-flight RPCs; beyond it new calls fail
+    fast with RESOURCE_EXHAUSTED instead of queueing behind the pool.
+    """
+    # Index the phrase tables before the first request, not during it
+    engine.warm()
+    server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=max_workers),
+        interceptors=[MetricsInterceptor()],
+        options=SERVER_OPTIONS + list(extra_options),
+        maximum_concurrent_rpcs=maximum_concurrent_rpcs
+    )
     translation_pb2_grpc.add_TranslationServiceServicer_to_server(
         TranslationService(), server
     )
-    server.add_insecure_port("[::]:50051")
+    server.add_insecure_port(f"[::]:{port}")
+    return server
+
+
+class AsyncTranslationService(translation_pb2_grpc.TranslationServiceServicer):
+    """
+    grpc.aio variant: handlers are coroutines on one event loop, so the
+    number of in-flight RPCs is not bounded by a thread pool.
+    """
+
+    async def TranslateText(self, request, context):
+        return TextResponse(
+            translated_text=engine.translate(request.text, request.language)
+        )
+
+    async def TranslateBatch(self, request, context):
+        return BatchResponse(
+            items=[
+                TextResponse(translated_text=engine.translate(item.text, item.language))
+                for item in request.items
+            ]
+        )
+
+
+def create_aio_server(port=50051, maximum_concurrent_rpcs=None, extra_options=()):
+    """
+    Build (but don't start) a grpc.aio Translation server bound to port.
+    Must be called with the event loop that will run it.
+    """
+    engine.warm()
+    server = grpc.aio.server(
+        interceptors=[AsyncMetricsInterceptor()],
+        options=SERVER_OPTIONS + list(extra_options),
+        maximum_concurrent_rpcs=maximum_concurrent_rpcs
+    )
+    translation_pb2_grpc.add_TranslationServiceServicer_to_server(
+        AsyncTranslationService(), server
+    )
+    server.add_insecure_port(f"[::]:{port}")
+    return server
+
+
+async def serve_aio(port=50051, maximum_concurrent_rpcs=None,
+                    metrics_port=TRANSLATION_METRICS_PORT):
+    server = create_aio_server(port, maximum_concurrent_rpcs=maximum_concurrent_rpcs)
+    start_metrics_server(metrics_port)
+    await server.start()
+    print(f"Translation gRPC Service (aio) running on port {port}")
+    await server.wait_for_termination()
+
+
+def serve(port=50051, maximum_concurrent_rpcs=None, metrics_port=TRANSLATION_METRICS_PORT):
+    server = create_server(port, maximum_concurrent_rpcs=maximum_concurrent_rpcs)
+    start_metrics_server(metrics_port)
     server.start()
-    print("Translation gRPC Service running on port 50051")
+    print(f"Translation gRPC Service running on port {port}")
     server.wait_for_termination()
 
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Translation gRPC Service")
+    parser.add_argument("--mode", choices=["sync", "aio"], default=GRPC_SERVER_MODE)
+    parser.add_argument("--port", type=int, default=50051)
+    parser.add_argument("--max-concurrent-rpcs", type=int, default=None)
+    parser.add_argument("--metrics-port", type=int, default=TRANSLATION_METRICS_PORT,
+                        help="Prometheus metrics port, 0 to disable")
+    args = parser.parse_args(argv)
+
+    if args.mode == "aio":
+        asyncio.run(serve_aio(args.port, args.max_concurrent_rpcs, args.metrics_port))
+    else:
+        serve(args.port, args.max_concurrent_rpcs, args.metrics_port)
+
+
 if __name__ == "__main__":
-    serve()
+    main()
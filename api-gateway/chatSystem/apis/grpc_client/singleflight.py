@@ -0,0 +1,83 @@
+"""
+Request coalescing ("single-flight") for identical in-flight RPCs.
+
+When many callers ask for the same thing at the same moment, only the
+first one (the leader) makes the RPC; the others wait for it and share
+its result or exception. Nothing is kept once the call completes, so
+unlike a cache this never serves a stale answer.
+"""
+import asyncio
+import threading
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key.
+
+    do() is for threads (sync views), do_async() for coroutines on an
+    event loop (async views). The two paths are tracked separately.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._tasks = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key, fn, *args):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
+
+    async def do_async(self, key, fn, *args):
+        # Tasks belong to one loop, so the loop is part of the key
+        task_key = (id(asyncio.get_running_loop()), key)
+        task = self._tasks.get(task_key)
+        if task is None:
+            task = asyncio.ensure_future(fn(*args))
+            self._tasks[task_key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(task_key, None))
+            self.executed += 1
+        else:
+            self.coalesced += 1
+        # shield: one caller being cancelled must not cancel the shared RPC
+        return await asyncio.shield(task)
+
+    def stats(self):
+        return {
+            "in_flight": len(self._calls) + len(self._tasks),
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+        }
@@ -1,13 +1,93 @@
-import grpc
-from . import translation_pb2, translation_pb2_grpc
+from . import translation_pb2
+from . import config, resilience
+from .cache import translation_cache
+from .singleflight import SingleFlight
+
+
+# Identical concurrent translations share one outstanding RPC
+inflight = SingleFlight()
 
 
 def translate_text(text, language):
-    channel = grpc.insecure_channel("localhost:50051")
-    stub = translation_pb2_grpc.TranslationServiceStub(channel)
+    key = (text, language)
+    if translation_cache is not None:
+        cached = translation_cache.get(key)
+        if cached is not None:
+            return cached
+
+    translated = inflight.do(key, _translate_rpc, text, language)
+
+    if translation_cache is not None:
+        translation_cache.set(key, translated)
+    return translated
+
+
+def _translate_rpc(text, language):
+    response = resilience.translation.call(
+        "TranslateText",
+        translation_pb2.TextRequest(text=text, language=language),
+        config.GRPC_TRANSLATE_DEADLINE,
+        hedge=True,
+    )
+    return response.translated_text
+
+
+def translate_batch(items):
+    """
+    Translate a list of (text, language) pairs with a single RPC.
+    Items already in the translation cache are not sent.
 
-    response = stub.TranslateText(
-        translation_pb2.TextRequest(text=text, language=language)
+    Returns:
+        List of translated strings, in the same order as items
+    """
+    results = [None] * len(items)
+    missing = []
+    for i, key in enumerate(items):
+        cached = translation_cache.get(tuple(key)) if translation_cache is not None else None
+        if cached is None:
+            missing.append(i)
+        else:
+            results[i] = cached
+
+    if not missing:
+        return results
+
+    response = resilience.translation.call(
+        "TranslateBatch",
+        translation_pb2.BatchRequest(items=[
+            translation_pb2.TextRequest(text=items[i][0], language=items[i][1])
+            for i in missing
+        ]),
+        config.GRPC_TRANSLATE_BATCH_DEADLINE,
     )
 
-    return response.translated_text
\ No newline at end of file
+    for i, item in zip(missing, response.items):
+        results[i] = item.translated_text
+        if translation_cache is not None:
+            translation_cache.set(tuple(items[i]), item.translated_text)
+    return results
+
+
+async def translate_text_async(text, language):
+    """grpc.aio variant of translate_text for the async gateway views."""
+    key = (text, language)
+    if translation_cache is not None:
+        cached = translation_cache.get(key)
+        if cached is not None:
+            return cached
+
+    translated = await inflight.do_async(key, _translate_rpc_async, text, language)
+
+    if translation_cache is not None:
+        translation_cache.set(key, translated)
+    return translated
+
+
+async def _translate_rpc_async(text, language):
+    response = await resilience.translation.call_async(
+        "TranslateText",
+        translation_pb2.TextRequest(text=text, language=language),
+        config.GRPC_TRANSLATE_DEADLINE,
+        hedge=True,
+    )
+    return response.translated_text
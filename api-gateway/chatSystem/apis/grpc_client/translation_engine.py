@@ -0,0 +1,156 @@
+"""
+Phrase-table translation engine behind TranslationService.
+
+Each target language has a UTF-8 TSV table <language>.tsv in
+TRANSLATION_PHRASE_TABLE_DIR, one "source<TAB>target" entry per line
+(lines starting with # are comments, later duplicates win). Sources are
+lowercase and tokenized the same way as the input: words separated by
+single spaces, punctuation as separate tokens.
+
+A table is memory-mapped and indexed once, the first time its language is
+used (or up front with warm()): the index maps each source phrase to the
+byte span of its target in the mapping, so only sources are copied into
+memory and the OS pages targets in on demand. Building it is one pass
+over the lines, under a second for 500k entries.
+
+translate() tokenizes the input and, at each position, replaces the
+longest phrase present in the table (up to the longest source in it);
+unknown tokens are kept as they are, along with the original spacing.
+"""
+import mmap
+import os
+import re
+import threading
+
+from .config import TRANSLATION_PHRASE_TABLE_DIR
+
+
+_TOKEN_RE = re.compile(r"\w+(?:['’]\w+)*|[^\w\s]")
+_LANGUAGE_RE = re.compile(r"[A-Za-z0-9_-]+")
+
+
+class PhraseTable:
+    """Hash index over one memory-mapped phrase table file."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self._index = self._build_index()
+        self.max_phrase_tokens = max(
+            (source.count(" ") + 1 for source in self._index), default=0
+        )
+
+    def _build_index(self):
+        # Target spans are packed as offset << 32 | length: one int per
+        # entry instead of a tuple of two. The scan reads the mapping one
+        # line at a time; only the keys stay in memory.
+        index = {}
+        if not self._map:
+            return index
+        offset = 0
+        for line in iter(self._map.readline, b""):
+            size = len(line)
+            tab = line.find(b"\t")
+            if tab > 0 and line[0] != 0x23:  # "#"
+                end = size
+                if line.endswith(b"\n"):
+                    end -= 2 if line.endswith(b"\r\n") else 1
+                index[line[:tab].decode()] = (offset + tab + 1) << 32 | end - tab - 1
+            offset += size
+        return index
+
+    def __len__(self):
+        return len(self._index)
+
+    def get(self, phrase):
+        span = self._index.get(phrase)
+        if span is None:
+            return None
+        start = span >> 32
+        return self._map[start:start + (span & 0xFFFFFFFF)].decode()
+
+
+class TranslationEngine:
+    """
+    Lazily loaded phrase tables for every language found in table_dir.
+    Safe to share between threads; each table is built exactly once.
+    The directory is listed on first use; tables added later need a
+    restart.
+    """
+
+    def __init__(self, table_dir=TRANSLATION_PHRASE_TABLE_DIR):
+        self.table_dir = table_dir
+        self._tables = {}
+        self._available = None
+        self._lock = threading.Lock()
+
+    def languages(self):
+        return sorted(
+            name[:-4] for name in os.listdir(self.table_dir) if name.endswith(".tsv")
+        )
+
+    def table(self, language):
+        """The PhraseTable for language, or None if there is none."""
+        table = self._tables.get(language)
+        if table is not None:
+            return table
+        # The language code comes from the request: only the plain file
+        # names listed in table_dir are opened, and nothing is kept for
+        # the others
+        if self._available is None:
+            self._available = frozenset(
+                name for name in self.languages() if _LANGUAGE_RE.fullmatch(name)
+            )
+        if language not in self._available:
+            return None
+        with self._lock:
+            if language not in self._tables:
+                path = os.path.join(self.table_dir, f"{language}.tsv")
+                self._tables[language] = PhraseTable(path)
+            return self._tables[language]
+
+    def warm(self, languages=None):
+        """Build the indexes up front (e.g. at server start)."""
+        for language in languages or self.languages():
+            self.table(language)
+
+    def translate(self, text, language):
+        """
+        Greedy longest-match phrase translation of text into language.
+        Text in a language without a table is returned unchanged.
+        """
+        table = self.table(language)
+        if table is None or not len(table):
+            return text
+
+        matches = list(_TOKEN_RE.finditer(text))
+        tokens = [match.group().lower() for match in matches]
+        out = [text[:matches[0].start()]] if matches else [text]
+        i = 0
+        while i < len(tokens):
+            translated = None
+            for n in range(min(table.max_phrase_tokens, len(tokens) - i), 0, -1):
+                translated = table.get(" ".join(tokens[i:i + n]))
+                if translated is not None:
+                    break
+            if translated is None:
+                n = 1
+                translated = matches[i].group()
+            elif matches[i].group()[:1].isupper():
+                translated = translated[:1].upper() + translated[1:]
+            out.append(translated)
+            # Keep whatever separated the phrase from the next token
+            end = matches[i + n - 1].end()
+            out.append(text[end:matches[i + n].start()] if i + n < len(tokens) else text[end:])
+            i += n
+        return "".join(out)
+
+
+# Process-wide engine used by the servicers and the REST-only views
+engine = TranslationEngine()
+
+
+def translate(text, language):
+    return engine.translate(text, language)
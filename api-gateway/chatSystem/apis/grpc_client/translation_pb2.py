@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x11translation.proto\x12\x0btranslation\"-\n\x0bTextRequest\x12\x0c\n\x04text\x18\x01 \x01(\t\x12\x10\n\x08language\x18\x02 \x01(\t\"\'\n\x0cTextResponse\x12\x17\n\x0ftranslated_text\x18\x01 \x01(\t2Z\n\x12TranslationService\x12\x44\n\rTranslateText\x12\x18.translation.TextRequest\x1a\x19.translation.TextResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x11translation.proto\x12\x0btranslation\"-\n\x0bTextRequest\x12\x0c\n\x04text\x18\x01 \x01(\t\x12\x10\n\x08language\x18\x02 \x01(\t\"\'\n\x0cTextResponse\x12\x17\n\x0ftranslated_text\x18\x01 \x01(\t\"7\n\x0c\x42\x61tchRequest\x12\'\n\x05items\x18\x01 \x03(\x0b\x32\x18.translation.TextRequest\"9\n\rBatchResponse\x12(\n\x05items\x18\x01 \x03(\x0b\x32\x19.translation.TextResponse2\xa3\x01\n\x12TranslationService\x12\x44\n\rTranslateText\x12\x18.translation.TextRequest\x1a\x19.translation.TextResponse\x12G\n\x0eTranslateBatch\x12\x19.translation.BatchRequest\x1a\x1a.translation.BatchResponseb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -35,6 +35,10 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_TEXTREQUEST']._serialized_end=79
   _globals['_TEXTRESPONSE']._serialized_start=81
   _globals['_TEXTRESPONSE']._serialized_end=120
-  _globals['_TRANSLATIONSERVICE']._serialized_start=122
-  _globals['_TRANSLATIONSERVICE']._serialized_end=212
+  _globals['_BATCHREQUEST']._serialized_start=122
+  _globals['_BATCHREQUEST']._serialized_end=177
+  _globals['_BATCHRESPONSE']._serialized_start=179
+  _globals['_BATCHRESPONSE']._serialized_end=236
+  _globals['_TRANSLATIONSERVICE']._serialized_start=239
+  _globals['_TRANSLATIONSERVICE']._serialized_end=402
 # @@protoc_insertion_point(module_scope)
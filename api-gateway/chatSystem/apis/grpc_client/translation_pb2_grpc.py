@@ -39,6 +39,11 @@ class TranslationServiceStub(object):
                 request_serializer=translation__pb2.TextRequest.SerializeToString,
                 response_deserializer=translation__pb2.TextResponse.FromString,
                 _registered_method=True)
+        self.TranslateBatch = channel.unary_unary(
+                '/translation.TranslationService/TranslateBatch',
+                request_serializer=translation__pb2.BatchRequest.SerializeToString,
+                response_deserializer=translation__pb2.BatchResponse.FromString,
+                _registered_method=True)
 
 
 class TranslationServiceServicer(object):
@@ -50,6 +55,12 @@ class TranslationServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def TranslateBatch(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_TranslationServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -58,6 +69,11 @@ def add_TranslationServiceServicer_to_server(servicer, server):
                     request_deserializer=translation__pb2.TextRequest.FromString,
                     response_serializer=translation__pb2.TextResponse.SerializeToString,
             ),
+            'TranslateBatch': grpc.unary_unary_rpc_method_handler(
+                    servicer.TranslateBatch,
+                    request_deserializer=translation__pb2.BatchRequest.FromString,
+                    response_serializer=translation__pb2.BatchResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'translation.TranslationService', rpc_method_handlers)
@@ -95,3 +111,30 @@ class TranslationService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def TranslateBatch(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/translation.TranslationService/TranslateBatch',
+            translation__pb2.BatchRequest.SerializeToString,
+            translation__pb2.BatchResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
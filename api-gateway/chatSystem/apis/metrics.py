@@ -0,0 +1,216 @@
+"""
+Prometheus metrics for the gateway, exposed at /api/metrics/.
+
+MetricsMiddleware (apis/middleware.py) records, per URL route of
+apis/urls.py ("api/send-text/", unmatched paths as "<unmatched>"):
+  - request duration, by route, method and status
+  - requests in flight
+  - request and response body sizes
+  - errors: 4xx/5xx responses (view exceptions arrive as 500s)
+and the gRPC clients and persistence.py add
+  - gRPC call time by RPC method, status code and replica (cache hits and
+    coalesced waiters are not RPCs and are not counted), split into the
+    service's own queue wait + handler time, from the trailing metadata
+    its interceptors add (grpc_client/interceptors.py), and the rest:
+    network, HTTP/2 and protobuf work on both ends; every attempt of a
+    retried or hedged call counts (grpc_client/resilience.py)
+  - retries, hedges sent and won, and calls refused by an open circuit
+  - ChatMessage write time by operation: "create", "bulk_create", and
+    "flush" for write-behind batches
+
+Several worker processes (gunicorn, uvicorn --workers) each have their
+own counters. Set PROMETHEUS_MULTIPROC_DIR to an empty directory shared
+by the workers before they start: every process then writes its samples
+to files there and any worker answers a scrape with the sum over all of
+them. Clear the directory between runs, and have the process manager
+call mark_process_dead(pid) when a worker exits so its in-flight gauge
+is dropped (gunicorn: child_exit hook).
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+
+from . import timing
+from .grpc_client.config import QUEUE_WAIT_METADATA_KEY, SERVICE_TIME_METADATA_KEY
+
+
+MULTIPROCESS = bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+# Seconds: from sub-millisecond cache hits to multi-second audio clips
+DURATION_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+# Bytes: short texts up to the 64 MiB upload limit, powers of four
+SIZE_BUCKETS = tuple(4 ** i for i in range(3, 14))
+
+
+REQUEST_DURATION = Histogram(
+    "chat_http_request_duration_seconds",
+    "Gateway request duration",
+    ["route", "method", "status"],
+    buckets=DURATION_BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "chat_http_requests_in_flight",
+    "Gateway requests being handled",
+    ["route"],
+    multiprocess_mode="livesum",
+)
+REQUEST_SIZE = Histogram(
+    "chat_http_request_size_bytes",
+    "Gateway request body size",
+    ["route"],
+    buckets=SIZE_BUCKETS,
+)
+RESPONSE_SIZE = Histogram(
+    "chat_http_response_size_bytes",
+    "Gateway response body size",
+    ["route"],
+    buckets=SIZE_BUCKETS,
+)
+REQUEST_ERRORS = Counter(
+    "chat_http_request_errors_total",
+    "Gateway 4xx/5xx responses",
+    ["route", "method", "status"],
+)
+GRPC_DURATION = Histogram(
+    "chat_grpc_client_duration_seconds",
+    "gRPC call time seen by the gateway",
+    ["method", "code", "replica"],
+    buckets=DURATION_BUCKETS,
+)
+GRPC_SERVICE_DURATION = Histogram(
+    "chat_grpc_service_duration_seconds",
+    "Queue wait plus handler time reported by the gRPC service",
+    ["method"],
+    buckets=DURATION_BUCKETS,
+)
+GRPC_NETWORK_DURATION = Histogram(
+    "chat_grpc_network_duration_seconds",
+    "gRPC call time minus the service's queue wait and handler time",
+    ["method"],
+    buckets=DURATION_BUCKETS,
+)
+GRPC_RETRIES = Counter(
+    "chat_grpc_client_retries_total",
+    "gRPC attempts retried, by the status code that failed them",
+    ["method", "code"],
+)
+GRPC_HEDGES = Counter(
+    "chat_grpc_client_hedges_total",
+    "Hedged second attempts sent",
+    ["method"],
+)
+GRPC_HEDGE_WINS = Counter(
+    "chat_grpc_client_hedge_wins_total",
+    "Hedged attempts that answered first",
+    ["method"],
+)
+GRPC_CIRCUIT_REJECTED = Counter(
+    "chat_grpc_client_circuit_rejected_total",
+    "Calls refused by an open circuit breaker",
+    ["service"],
+)
+DB_WRITE_DURATION = Histogram(
+    "chat_db_write_duration_seconds",
+    "ChatMessage write time",
+    ["operation"],
+    buckets=DURATION_BUCKETS,
+)
+
+
+def service_seconds(metadata):
+    """
+    The service's queue wait plus handler time from a completed call's
+    trailing metadata, or None if the service did not report it.
+    """
+    # Not dict(): grpc.aio Metadata is a mapping that iterates as pairs
+    values = {key: value for key, value in metadata or ()}
+    if SERVICE_TIME_METADATA_KEY not in values:
+        return None
+    return (
+        float(values[SERVICE_TIME_METADATA_KEY])
+        + float(values.get(QUEUE_WAIT_METADATA_KEY, 0))
+    ) / 1000
+
+
+def observe_grpc(method, code, replica, elapsed, service=None):
+    """Record one gRPC call of elapsed seconds (service: see service_seconds)."""
+    GRPC_DURATION.labels(method, code, replica).observe(elapsed)
+    if service is not None:
+        GRPC_SERVICE_DURATION.labels(method).observe(service)
+        GRPC_NETWORK_DURATION.labels(method).observe(max(0.0, elapsed - service))
+
+
+class _RPC:
+    __slots__ = ("service_seconds",)
+
+    def __init__(self):
+        self.service_seconds = None
+
+    def trailers(self, metadata):
+        """Pick the service time out of a completed call's trailing metadata."""
+        self.service_seconds = service_seconds(metadata)
+
+
+@contextmanager
+def grpc_timer(method, replica=""):
+    """
+    Time one gRPC call (also the request's "grpc" phase, apis/timing.py);
+    the code label is the gRPC status name. Hand the call's trailing
+    metadata to the yielded object's trailers() to split the time into
+    service and network.
+    """
+    rpc = _RPC()
+    start = time.perf_counter()
+    code = "OK"
+    try:
+        with timing.phase("grpc"):
+            yield rpc
+    except Exception as e:
+        status = getattr(e, "code", None)
+        code = status().name if callable(status) else "UNKNOWN"
+        raise
+    finally:
+        observe_grpc(method, code, replica, time.perf_counter() - start, rpc.service_seconds)
+
+
+@contextmanager
+def db_write_timer(operation):
+    """Time one ChatMessage write (also the request's "db" phase)."""
+    start = time.perf_counter()
+    try:
+        with timing.phase("db"):
+            yield
+    finally:
+        DB_WRITE_DURATION.labels(operation).observe(time.perf_counter() - start)
+
+
+def exposition():
+    """
+    Returns:
+        (body, content type) of the text exposition format
+    """
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid):
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,157 @@
+import json
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.urls import Resolver404, resolve
+
+from . import metrics, timing
+
+
+timing_logger = logging.getLogger("apis.timing")
+
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def _route(request):
+    """The URL pattern, not the path, so label cardinality stays bounded."""
+    try:
+        return resolve(request.path_info).route or UNMATCHED_ROUTE
+    except Resolver404:
+        return UNMATCHED_ROUTE
+
+
+def _request_size(request):
+    try:
+        return int(request.META.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        return 0
+
+
+def _response_size(response):
+    if response.streaming:
+        # Streamed bodies are only sized when the view set Content-Length
+        return int(response.get("Content-Length") or 0)
+    return len(response.content)
+
+
+class MetricsMiddleware:
+    """
+    Records duration, in-flight count, body sizes and errors of every
+    request (see apis/metrics.py). Works under WSGI and ASGI.
+
+    Django turns view exceptions into 500 responses before they reach
+    middleware, so those are counted as status 500. A streamed response
+    is timed until the view returns, not until the last chunk is sent.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        route, start = self._start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.REQUESTS_IN_FLIGHT.labels(route).dec()
+        self._finish(request, route, start, response)
+        return response
+
+    async def __acall__(self, request):
+        route, start = self._start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            # Also when the client disconnects and the task is cancelled
+            metrics.REQUESTS_IN_FLIGHT.labels(route).dec()
+        self._finish(request, route, start, response)
+        return response
+
+    def _start(self, request):
+        route = _route(request)
+        metrics.REQUESTS_IN_FLIGHT.labels(route).inc()
+        metrics.REQUEST_SIZE.labels(route).observe(_request_size(request))
+        return route, time.perf_counter()
+
+    def _finish(self, request, route, start, response):
+        elapsed = time.perf_counter() - start
+        status = str(response.status_code)
+        metrics.REQUEST_DURATION.labels(route, request.method, status).observe(elapsed)
+        if response.status_code >= 400:
+            metrics.REQUEST_ERRORS.labels(route, request.method, status).inc()
+        metrics.RESPONSE_SIZE.labels(route).observe(_response_size(response))
+
+
+class ServerTimingMiddleware:
+    """
+    Times each request's phases (see apis/timing.py) and reports them in
+    a Server-Timing header, plus a JSON log line when
+    CHAT_SERVER_TIMING['LOG'] is set.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        options = getattr(settings, "CHAT_SERVER_TIMING", {})
+        self.enabled = options.get("ENABLED", True)
+        self.log = options.get("LOG", False)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+        timer, token = timing.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            timing.finish(token)
+        self._report(request, timer, response)
+        return response
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+        timer, token = timing.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            timing.finish(token)
+        self._report(request, timer, response)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered by the handler after the view
+        # returns; the post-render callback closes the phase
+        timer = timing.current()
+        if timer is not None:
+            start = time.perf_counter()
+            response.add_post_render_callback(
+                lambda rendered: timer.add("render", (time.perf_counter() - start) * 1000)
+            )
+        return response
+
+    def _report(self, request, timer, response):
+        total_ms = timer.elapsed_ms()
+        response["Server-Timing"] = timer.header(total_ms)
+        if self.log:
+            timing_logger.info(json.dumps({
+                "method": request.method,
+                "path": request.path,
+                "status": response.status_code,
+                "total_ms": round(total_ms, 3),
+                "phases_ms": {name: round(ms, 3) for name, ms in timer.durations.items()},
+            }))
@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-17 02:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apis', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['-timestamp', '-id'], name='chat_ts_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['sender', '-timestamp', '-id'], name='chat_sender_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['receiver', '-timestamp', '-id'], name='chat_receiver_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['sender', 'receiver', '-timestamp', '-id'], name='chat_pair_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['message_type', '-timestamp', '-id'], name='chat_type_ts_idx'),
+        ),
+    ]
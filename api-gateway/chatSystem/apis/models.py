@@ -22,5 +22,20 @@ class ChatMessage(models.Model):
     translated_message = models.TextField(null=True, blank=True)
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # Every history query orders by (timestamp, id) descending and pages
+        # with a keyset cursor, so each filter gets a composite index ending
+        # in those columns and a page is a single index range scan.
+        indexes = [
+            models.Index(fields=['-timestamp', '-id'], name='chat_ts_id_idx'),
+            models.Index(fields=['sender', '-timestamp', '-id'], name='chat_sender_ts_idx'),
+            models.Index(fields=['receiver', '-timestamp', '-id'], name='chat_receiver_ts_idx'),
+            models.Index(
+                fields=['sender', 'receiver', '-timestamp', '-id'],
+                name='chat_pair_ts_idx'
+            ),
+            models.Index(fields=['message_type', '-timestamp', '-id'], name='chat_type_ts_idx'),
+        ]
+
     def __str__(self):
         return f"{self.sender} → {self.receiver}"
@@ -0,0 +1,81 @@
+"""
+Keyset (cursor) pagination for chat history.
+
+Pages are ordered by (timestamp, id) descending. The cursor is an opaque
+token holding the (timestamp, id) of the last row of the previous page, so
+the next page is "rows strictly before that key": an index range scan on
+the composite indexes declared on ChatMessage, no OFFSET and no count.
+"""
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+
+HISTORY_ORDERING = ('-timestamp', '-id')
+
+
+def encode_cursor(message):
+    raw = f"{message.timestamp.isoformat()}|{message.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Returns:
+        (timestamp, id) tuple
+
+    Raises:
+        ValueError if the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        timestamp, pk = raw.rsplit("|", 1)
+        return datetime.fromisoformat(timestamp), int(pk)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def filter_history(queryset, params):
+    """Apply the validated ChatHistoryQuerySerializer filters."""
+    if params.get('sender'):
+        queryset = queryset.filter(sender=params['sender'])
+    if params.get('receiver'):
+        queryset = queryset.filter(receiver=params['receiver'])
+    if params.get('message_type'):
+        queryset = queryset.filter(message_type=params['message_type'])
+    if params.get('conversation'):
+        user_a, user_b = params['conversation']
+        queryset = queryset.filter(
+            Q(sender=user_a, receiver=user_b) | Q(sender=user_b, receiver=user_a)
+        )
+    return queryset
+
+
+def page_queryset(queryset, params):
+    """
+    Order, position after the cursor and slice one extra row, which tells
+    whether another page exists.
+    """
+    queryset = queryset.order_by(*HISTORY_ORDERING)
+    if params.get('cursor'):
+        timestamp, pk = params['cursor']
+        # (timestamp, id) < cursor. The redundant timestamp__lte bound is
+        # what lets SQLite turn this into an index range; with the OR alone
+        # it walks the index from the top and every page costs O(depth).
+        queryset = queryset.filter(
+            Q(timestamp__lte=timestamp),
+            Q(timestamp__lt=timestamp) | Q(id__lt=pk)
+        )
+    return queryset[:params['limit'] + 1]
+
+
+def build_page(rows, limit):
+    """
+    Returns:
+        (rows of this page, next cursor or None)
+    """
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
@@ -0,0 +1,14 @@
+from rest_framework.parsers import BaseParser
+
+
+class OctetStreamParser(BaseParser):
+    """
+    Parser for raw binary request bodies (application/octet-stream).
+
+    Returns the request stream itself instead of reading it, so the view
+    can consume a large upload in chunks without buffering it whole.
+    """
+    media_type = 'application/octet-stream'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return stream
@@ -0,0 +1,315 @@
+"""
+ChatMessage persistence with an optional write-behind mode.
+
+By default every message is inserted synchronously, as before. With
+settings.CHAT_WRITE_BEHIND['ENABLED'] the request only enqueues the row
+and a background flusher thread commits queued rows with bulk_create in
+batches bounded by size (BATCH_SIZE) and time (FLUSH_INTERVAL). This turns
+many single-row SQLite transactions, which serialize on the database write
+lock, into a few multi-row ones.
+
+Durability knobs:
+  - the queue is bounded (MAX_QUEUE); a full queue blocks the producer for
+    up to PUT_TIMEOUT seconds (backpressure) and then falls back to a
+    synchronous insert, so a message is never dropped;
+  - a batch whose bulk_create fails is written row by row; rows that
+    still fail are kept and retried on later flushes, with a backoff
+    from RETRY_BACKOFF doubling up to RETRY_BACKOFF_MAX seconds, so a
+    database error delays messages instead of dropping them;
+  - pending rows are flushed at interpreter exit (a graceful worker
+    shutdown); a hard kill loses at most what is still queued.
+
+Note that auto_now_add stamps the timestamp when the batch is written,
+i.e. at most FLUSH_INTERVAL (plus flush time) after the request.
+
+Every message is published to its receiver's push connections
+(apis/push.py) once it is stored: right after the insert, or with
+write-behind, by the flusher after its batch (or row) is written, so
+events always carry the row's id and timestamp.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .metrics import db_write_timer
+from .models import ChatMessage
+from .push import publish_messages
+
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindQueue:
+    """
+    Bounded queue of unsaved ChatMessage rows plus the thread that
+    flushes them with bulk_create.
+    """
+
+    def __init__(self, batch_size=500, flush_interval=0.05, max_queue=10000,
+                 put_timeout=1.0, retry_backoff=0.1, retry_backoff_max=5.0):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.retry_backoff = retry_backoff
+        self.retry_backoff_max = retry_backoff_max
+        self._queue = queue.Queue(maxsize=max_queue)
+        # Guards the counters below and the flusher's start
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stopping = threading.Event()
+        # Rows that failed to write, retried once _retry_at has passed
+        # (both under _flush_lock)
+        self._retry = []
+        self._retry_at = 0.0
+        self._retry_delay = 0.0
+
+        self.enqueued = 0
+        self.flushed = 0
+        self.batches = 0
+        self.failed = 0
+        self.overflow_writes = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    def _ensure_started(self):
+        # Started lazily (and again after a fork) so each worker process
+        # owns its own flusher thread
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self._queue.maxsize)
+            self._stopping.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="chat-write-behind", daemon=True
+            )
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def put(self, message, block=True):
+        """
+        Enqueue an unsaved ChatMessage.
+
+        Returns:
+            False if the queue stayed full (the caller must save it itself)
+        """
+        self._ensure_started()
+        try:
+            self._queue.put(message, block=block, timeout=self.put_timeout if block else None)
+        except queue.Full:
+            with self._lock:
+                self.overflow_writes += 1
+            return False
+        with self._lock:
+            self.enqueued += 1
+        return True
+
+    def _run(self):
+        while not self._stopping.is_set():
+            batch = self._collect()
+            if batch:
+                self._write(batch)
+            if self._retry and time.monotonic() >= self._retry_at:
+                self._write([])
+        close_old_connections()
+
+    def _collect(self):
+        """Wait for a first row, then gather up to batch_size until the deadline."""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        """Write batch, plus any rows due for a retry."""
+        start = time.perf_counter()
+        with self._flush_lock:
+            if self._retry and time.monotonic() >= self._retry_at:
+                batch, self._retry = self._retry + batch, []
+            if not batch:
+                return
+            try:
+                with db_write_timer("flush"):
+                    ChatMessage.objects.bulk_create(batch)
+                written, failed = batch, []
+            except Exception:
+                logger.exception(
+                    "write-behind flush of %d messages failed, writing them one by one",
+                    len(batch)
+                )
+                close_old_connections()
+                written, failed = self._write_rows(batch)
+            if failed:
+                self._retry.extend(failed)
+                self._retry_delay = min(
+                    max(self._retry_delay * 2, self.retry_backoff), self.retry_backoff_max
+                )
+                self._retry_at = time.monotonic() + self._retry_delay
+            else:
+                self._retry_delay = 0.0
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        try:
+            publish_messages(written)
+        except Exception:
+            logger.exception("publishing %d written messages failed", len(written))
+        with self._lock:
+            self.flushed += len(written)
+            self.failed += len(failed)
+            self.batches += 1
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self.total_flush_ms += elapsed_ms
+
+    def _write_rows(self, batch):
+        """
+        Save rows one at a time, so one bad row or a transient error
+        does not hold back the others.
+
+        Returns:
+            (rows written, rows that failed)
+        """
+        written, failed = [], []
+        for message in batch:
+            try:
+                with db_write_timer("create"):
+                    message.save(force_insert=True)
+                written.append(message)
+            except Exception:
+                message.pk = None
+                failed.append(message)
+        if failed:
+            logger.error(
+                "write-behind kept %d messages that failed to write for a retry",
+                len(failed)
+            )
+            close_old_connections()
+        return written, failed
+
+    def flush(self):
+        """Synchronously write everything currently queued, and retry failed rows."""
+        with self._flush_lock:
+            # Failed rows go with the next write rather than after their backoff
+            self._retry_at = 0.0
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(batch) >= self.batch_size:
+                self._write(batch)
+                batch = []
+        # Also with no batch: the retry rows
+        self._write(batch)
+
+    def stop(self):
+        """Stop the flusher and write any pending rows (used at shutdown)."""
+        self._stopping.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout=self.flush_interval * 4 + 1)
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue": self._queue.maxsize,
+                "retry_pending": len(self._retry),
+                "enqueued": self.enqueued,
+                "flushed": self.flushed,
+                "batches": self.batches,
+                "failed": self.failed,
+                "overflow_writes": self.overflow_writes,
+                "last_flush_ms": self.last_flush_ms,
+                "max_flush_ms": self.max_flush_ms,
+                "avg_flush_ms": self.total_flush_ms / self.batches if self.batches else 0.0,
+                "avg_batch_size": self.flushed / self.batches if self.batches else 0.0,
+            }
+
+
+def _build_queue():
+    options = getattr(settings, 'CHAT_WRITE_BEHIND', {})
+    if not options.get('ENABLED'):
+        return None
+    write_queue = WriteBehindQueue(
+        batch_size=options.get('BATCH_SIZE', 500),
+        flush_interval=options.get('FLUSH_INTERVAL', 0.05),
+        max_queue=options.get('MAX_QUEUE', 10000),
+        put_timeout=options.get('PUT_TIMEOUT', 1.0),
+        retry_backoff=options.get('RETRY_BACKOFF', 0.1),
+        retry_backoff_max=options.get('RETRY_BACKOFF_MAX', 5.0),
+    )
+    atexit.register(write_queue.stop)
+    return write_queue
+
+
+# Process-wide write-behind queue (None when write-behind is disabled)
+write_behind = _build_queue()
+
+
+def save_chat_message(**fields):
+    """Store a ChatMessage, through the write-behind queue when enabled."""
+    if write_behind is None:
+        with db_write_timer("create"):
+            message = ChatMessage.objects.create(**fields)
+    else:
+        message = ChatMessage(**fields)
+        if write_behind.put(message):
+            return message
+        with db_write_timer("create"):
+            message.save()
+    publish_messages([message])
+    return message
+
+
+def save_chat_messages(messages):
+    """Store a list of unsaved ChatMessage rows."""
+    if write_behind is None:
+        with db_write_timer("bulk_create"):
+            messages = ChatMessage.objects.bulk_create(messages)
+    else:
+        overflow = [message for message in messages if not write_behind.put(message)]
+        if not overflow:
+            return messages
+        with db_write_timer("bulk_create"):
+            ChatMessage.objects.bulk_create(overflow)
+        publish_messages(overflow)
+        return messages
+    publish_messages(messages)
+    return messages
+
+
+async def asave_chat_message(**fields):
+    """Async variant: never blocks the event loop on a full queue."""
+    if write_behind is None:
+        with db_write_timer("create"):
+            message = await ChatMessage.objects.acreate(**fields)
+    else:
+        message = ChatMessage(**fields)
+        if write_behind.put(message, block=False):
+            return message
+        with db_write_timer("create"):
+            await message.asave()
+    publish_messages([message])
+    return message
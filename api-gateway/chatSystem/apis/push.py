@@ -0,0 +1,365 @@
+"""
+Push delivery of new chat messages to their receivers.
+
+Instead of polling /api/history/, a receiver keeps one connection open to
+
+    GET /api/stream/<receiver>/      server-sent events (text/event-stream)
+    ws://.../api/stream/<receiver>/  WebSocket, one text frame per message
+
+served by PushApplication, which chatSystem/asgi.py puts in front of
+Django, so it needs an ASGI server (uvicorn); runserver does not serve
+it. Every message stored through apis/persistence.py is published as
+soon as it is in the database (with write-behind, when its batch is
+written) as the JSON of ChatMessageSerializer. After connecting or
+reconnecting, a client catches up on what it missed from
+/api/history/?receiver=<name> and drops events whose "id" it already has.
+
+The hub fans messages out to the subscriptions of this process. Its
+backend is settings.CHAT_PUSH['BACKEND']: InMemoryHub delivers within
+one process only; with several workers, a backend that relays
+publish() through a broker to every worker's deliver() is needed (see
+PushHub).
+
+Connections are cheap to keep open: an idle one is a coroutine waiting
+on a future, a Subscription and the server's transport, with no thread
+or task per connection beyond the one watching for disconnects. Each has
+a bounded queue (QUEUE_SIZE): a client that does not read fast enough
+first stalls its own sends (ASGI flow control), then fills its queue
+and is disconnected, after an "overflow" event, rather than holding
+memory or slowing anyone else. SSE connections get a comment line every
+HEARTBEAT seconds so proxies keep them open.
+
+stats() reports connections, receivers, messages published, deliveries
+and overflow disconnects.
+"""
+import abc
+import asyncio
+import json
+import re
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from prometheus_client import Counter, Gauge
+
+
+PATH = re.compile(r"^/api/stream/(?P<receiver>[^/]{1,50})/$")
+
+CONNECTIONS = Gauge(
+    "chat_push_connections",
+    "Open push connections",
+    ["transport"],
+    multiprocess_mode="livesum",
+)
+EVENTS = Counter(
+    "chat_push_events_total",
+    "Messages handed to push connections, and overflow disconnects",
+    ["outcome"],
+)
+
+
+class Subscription:
+    """One connection's bounded queue of encoded messages, on its event loop."""
+
+    __slots__ = ("receiver", "loop", "limit", "closed", "overflowed", "_items", "_waiter")
+
+    def __init__(self, receiver, loop, limit):
+        self.receiver = receiver
+        self.loop = loop
+        self.limit = limit
+        self.closed = False
+        self.overflowed = False
+        self._items = []
+        self._waiter = None
+
+    def offer(self, data):
+        """
+        Queue data (on the subscription's loop); overflowing closes it.
+
+        Returns:
+            Whether data was queued
+        """
+        if self.closed:
+            return False
+        if len(self._items) >= self.limit:
+            self.overflowed = True
+            # The connection may stay blocked in a send for a while yet:
+            # drop what it can no longer be sent now
+            self._items = []
+            EVENTS.labels("overflow").inc()
+            self.close()
+            return False
+        self._items.append(data)
+        EVENTS.labels("delivered").inc()
+        self._wake()
+        return True
+
+    def close(self):
+        self.closed = True
+        self._wake()
+
+    def _wake(self):
+        waiter = self._waiter
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    async def get(self, timeout=None):
+        """
+        Wait for messages.
+
+        Returns:
+            Queued messages, oldest first; [] after timeout seconds or
+            once the subscription is closed
+        """
+        if not self._items and not self.closed:
+            waiter = self._waiter = self.loop.create_future()
+            handle = self.loop.call_later(timeout, self._wake) if timeout else None
+            try:
+                await waiter
+            finally:
+                self._waiter = None
+                if handle is not None:
+                    handle.cancel()
+        items, self._items = self._items, []
+        return items
+
+
+class PushHub(abc.ABC):
+    """
+    Fan-out to the subscriptions of this process.
+
+    A backend implements publish() (and, if it can tell, subscribed()).
+    deliver() and publish() may be called from any thread; subscribe()
+    and unsubscribe() from the event loop of the connection.
+    """
+
+    def __init__(self, queue_size=100, heartbeat=15.0):
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+        self._lock = threading.Lock()
+        self._subscriptions = {}    # receiver -> set of Subscription
+        self.connections = 0
+        self.published = 0
+        self.delivered = 0
+        self.overflows = 0
+
+    def subscribe(self, receiver):
+        subscription = Subscription(receiver, asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._subscriptions.setdefault(receiver, set()).add(subscription)
+            self.connections += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscription.close()
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.receiver)
+            if subscriptions is None or subscription not in subscriptions:
+                return
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.receiver]
+            self.connections -= 1
+
+    def subscribed(self, receiver):
+        """Whether publishing for receiver can reach anyone (always, by default)."""
+        return True
+
+    @abc.abstractmethod
+    def publish(self, receiver, data):
+        """
+        Send data to every connection of receiver, in any process.
+
+        Must make deliver(receiver, data) run once in each process with
+        subscriptions for receiver (this one included), count the message
+        in self.published under self._lock, and return without waiting
+        for the connections. Called from sync views, the write-behind
+        flusher and event loops, so it must not block on the network
+        for long.
+
+        Args:
+            receiver: The receiver's name
+            data: The message, a JSON string
+        """
+
+    def deliver(self, receiver, data):
+        """Queue data on every local subscription of receiver."""
+        with self._lock:
+            subscriptions = tuple(self._subscriptions.get(receiver, ()))
+        if not subscriptions:
+            return
+        try:
+            current = asyncio.get_running_loop()
+        except RuntimeError:
+            current = None
+        by_loop = {}
+        for subscription in subscriptions:
+            by_loop.setdefault(subscription.loop, []).append(subscription)
+        for loop, group in by_loop.items():
+            if loop is current:
+                self._offer_all(group, data)
+            else:
+                # A sync view's worker thread: hand over to the loop
+                try:
+                    loop.call_soon_threadsafe(self._offer_all, group, data)
+                except RuntimeError:
+                    pass    # The loop is closed; its connections are gone
+
+    def _offer_all(self, subscriptions, data):
+        delivered = overflows = 0
+        for subscription in subscriptions:
+            if subscription.closed:
+                continue
+            if subscription.offer(data):
+                delivered += 1
+            else:
+                overflows += 1
+        with self._lock:
+            self.delivered += delivered
+            self.overflows += overflows
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": type(self).__name__,
+                "connections": self.connections,
+                "receivers": len(self._subscriptions),
+                "published": self.published,
+                "delivered": self.delivered,
+                "overflows": self.overflows,
+                "queue_size": self.queue_size,
+            }
+
+
+class InMemoryHub(PushHub):
+    """Delivers within this process only."""
+
+    def subscribed(self, receiver):
+        return receiver in self._subscriptions
+
+    def publish(self, receiver, data):
+        with self._lock:
+            self.published += 1
+        self.deliver(receiver, data)
+
+
+def _build_hub():
+    options = getattr(settings, 'CHAT_PUSH', {})
+    if not options.get('ENABLED', True):
+        return None
+    backend = import_string(options.get('BACKEND', 'apis.push.InMemoryHub'))
+    return backend(
+        queue_size=options.get('QUEUE_SIZE', 100),
+        heartbeat=options.get('HEARTBEAT', 15.0),
+    )
+
+
+# Process-wide hub (None when push is disabled)
+hub = _build_hub()
+
+
+def publish_messages(messages):
+    """Publish stored ChatMessage rows to their receivers' connections."""
+    if hub is None:
+        return
+    from .serializers import ChatMessageSerializer
+
+    for message in messages:
+        if hub.subscribed(message.receiver):
+            hub.publish(message.receiver, json.dumps(ChatMessageSerializer(message).data))
+
+
+def stats():
+    if hub is None:
+        return {"enabled": False}
+    return {"enabled": True, **hub.stats()}
+
+
+# -- ASGI --------------------------------------------------------------------
+
+SSE_HEADERS = [
+    (b"content-type", b"text/event-stream"),
+    (b"cache-control", b"no-cache"),
+    # Keep nginx from buffering the stream
+    (b"x-accel-buffering", b"no"),
+]
+SSE_OVERFLOW = b"event: overflow\ndata: {}\n\n"
+SSE_HEARTBEAT = b": ping\n\n"
+# WebSocket close code for a receiver that fell behind: "Try Again Later"
+WS_OVERFLOW = 1013
+
+
+class PushApplication:
+    """ASGI middleware serving /api/stream/<receiver>/; the rest goes to app."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        match = PATH.match(scope.get("path", "")) if scope["type"] in ("http", "websocket") else None
+        if match is None or hub is None:
+            return await self.app(scope, receive, send)
+        receiver = match.group("receiver")
+        if scope["type"] == "websocket":
+            return await self._websocket(receiver, receive, send)
+        if scope["method"] != "GET":
+            await send({"type": "http.response.start", "status": 405,
+                        "headers": [(b"allow", b"GET"), (b"content-length", b"0")]})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        await self._sse(receiver, receive, send)
+
+    async def _watch(self, receive, subscription, disconnect):
+        """Close subscription when the client goes away."""
+        while True:
+            message = await receive()
+            if message["type"] == disconnect:
+                subscription.close()
+                return
+
+    async def _sse(self, receiver, receive, send):
+        subscription = hub.subscribe(receiver)
+        watcher = asyncio.ensure_future(self._watch(receive, subscription, "http.disconnect"))
+        CONNECTIONS.labels("sse").inc()
+        try:
+            await send({"type": "http.response.start", "status": 200, "headers": SSE_HEADERS})
+            await send({"type": "http.response.body", "body": b"retry: 3000\n\n", "more_body": True})
+            while not subscription.closed:
+                items = await subscription.get(hub.heartbeat)
+                if items:
+                    body = b"".join(b"data: %s\n\n" % item.encode() for item in items)
+                elif subscription.closed:
+                    break
+                else:
+                    body = SSE_HEARTBEAT
+                await send({"type": "http.response.body", "body": body, "more_body": True})
+            if subscription.overflowed:
+                await send({"type": "http.response.body", "body": SSE_OVERFLOW, "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+        except OSError:
+            pass    # The client went away mid-send
+        finally:
+            CONNECTIONS.labels("sse").dec()
+            watcher.cancel()
+            hub.unsubscribe(subscription)
+
+    async def _websocket(self, receiver, receive, send):
+        if (await receive())["type"] != "websocket.connect":
+            return
+        await send({"type": "websocket.accept"})
+        subscription = hub.subscribe(receiver)
+        watcher = asyncio.ensure_future(self._watch(receive, subscription, "websocket.disconnect"))
+        CONNECTIONS.labels("websocket").inc()
+        try:
+            # The server pings idle WebSockets itself; no heartbeat here
+            while not subscription.closed:
+                for item in await subscription.get():
+                    await send({"type": "websocket.send", "text": item})
+            if subscription.overflowed:
+                await send({"type": "websocket.close", "code": WS_OVERFLOW})
+        except OSError:
+            pass
+        finally:
+            CONNECTIONS.labels("websocket").dec()
+            watcher.cancel()
+            hub.unsubscribe(subscription)
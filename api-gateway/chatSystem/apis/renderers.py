@@ -0,0 +1,23 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class OctetStreamRenderer(BaseRenderer):
+    """
+    Renderer for raw binary responses (application/octet-stream).
+
+    Views that negotiate this renderer return the binary body themselves;
+    anything else that reaches it (e.g. error payloads) is rendered, and
+    labelled, as JSON.
+    """
+    media_type = 'application/octet-stream'
+    format = 'bin'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, bytes):
+            return data
+        response = (renderer_context or {}).get('response')
+        if response is not None:
+            response['Content-Type'] = JSONRenderer.media_type
+        return JSONRenderer().render(data)
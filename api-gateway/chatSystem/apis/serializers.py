@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import UserProfile, ChatMessage
+from .pagination import decode_cursor
 
 
 class UserProfileSerializer(serializers.ModelSerializer):
@@ -8,6 +9,11 @@ class UserProfileSerializer(serializers.ModelSerializer):
         fields = ['username', 'language']
 
 
+# Most messages one /send-text-batch/ request may carry: each is a
+# translation in the batch RPC and a row in the bulk insert
+MAX_TEXT_BATCH = 500
+
+
 class SendTextSerializer(serializers.Serializer):
     sender = serializers.CharField(max_length=50)
     receiver = serializers.CharField(max_length=50)
@@ -21,7 +27,38 @@ class SendAudioSerializer(serializers.Serializer):
     audio = serializers.CharField()  # base64 encoded audio data or raw string
 
 
+class SendAudioUploadSerializer(serializers.Serializer):
+    """
+    Metadata for binary audio uploads (application/octet-stream or multipart).
+    The audio itself is read from the request body / uploaded file.
+    """
+    sender = serializers.CharField(max_length=50)
+    receiver = serializers.CharField(max_length=50)
+
+
 class ChatMessageSerializer(serializers.ModelSerializer):
     class Meta:
         model = ChatMessage
         fields = '__all__'
+
+
+class ChatHistoryQuerySerializer(serializers.Serializer):
+    """Query parameters of the paginated chat history."""
+    cursor = serializers.CharField(required=False)
+    limit = serializers.IntegerField(required=False, default=50, min_value=1, max_value=200)
+    sender = serializers.CharField(required=False, max_length=50)
+    receiver = serializers.CharField(required=False, max_length=50)
+    message_type = serializers.ChoiceField(required=False, choices=ChatMessage.MESSAGE_TYPE)
+    conversation = serializers.CharField(required=False)  # "alice,bob", either direction
+
+    def validate_cursor(self, value):
+        try:
+            return decode_cursor(value)
+        except ValueError:
+            raise serializers.ValidationError("Invalid cursor.")
+
+    def validate_conversation(self, value):
+        users = [user.strip() for user in value.split(",")]
+        if len(users) != 2 or not all(users):
+            raise serializers.ValidationError("Expected two comma-separated usernames.")
+        return users
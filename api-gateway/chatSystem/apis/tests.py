@@ -1,3 +1,1592 @@
-from django.test import TestCase
+import asyncio
+import base64
+import json
+import os
+import re
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import weakref
+from concurrent import futures
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import grpc
+import numpy as np
+from prometheus_client import REGISTRY
+from django.db import OperationalError
+from django.test import AsyncClient, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from . import timing
+from .grpc_client import (
+    audio_pb2,
+    audio_pb2_grpc,
+    audio_pipeline,
+    channels,
+    compression,
+    resilience,
+    router,
+    translation_pb2,
+    translation_pb2_grpc,
+)
+from .grpc_client.audio_pipeline import AudioFormatError
+from .grpc_client import audio_server, server as translation_server
+from .grpc_client.audio_server import AudioService
+from .grpc_client.balancer import LEAST_OUTSTANDING, Balancer, parse_addresses
+from .grpc_client.cache import SQLiteCacheBackend, TranslationCache
+from .grpc_client.interceptors import AsyncMetricsInterceptor, MetricsInterceptor
+from .grpc_client.launcher import Launcher
+from .grpc_client.resilience import (
+    ADMITTED,
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    PROBE,
+    CircuitBreaker,
+    CircuitOpenError,
+    ResilientClient,
+)
+from .grpc_client.router import LOCAL, REMOTE, Router
+from .grpc_client.singleflight import SingleFlight
+from .grpc_client.translation_engine import TranslationEngine
+from .metrics import grpc_timer
+from .models import ChatMessage
+from .pagination import decode_cursor, encode_cursor
+from .persistence import WriteBehindQueue
+from .push import InMemoryHub, PushApplication, PushHub
+from .serializers import MAX_TEXT_BATCH
+from .views import _b64decode_chunks, _b64encode_chunks
+
+
+class FakeTranslationService(translation_pb2_grpc.TranslationServiceServicer):
+    """
+    Upper-cases the text after an injected delay. delays and failures are
+    consumed one per call; an exhausted list means no delay / success.
+    """
+
+    def __init__(self):
+        self.delays = []
+        self.failures = []
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def TranslateText(self, request, context):
+        with self._lock:
+            self.calls += 1
+            delay = self.delays.pop(0) if self.delays else 0
+            failure = self.failures.pop(0) if self.failures else None
+        if failure is not None:
+            context.abort(failure, "injected failure")
+        deadline = time.monotonic() + delay
+        while time.monotonic() < deadline and context.is_active():
+            time.sleep(0.005)
+        return translation_pb2.TextResponse(translated_text=request.text.upper())
+
+
+class FakeServerTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.service = FakeTranslationService()
+        self.server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+        translation_pb2_grpc.add_TranslationServiceServicer_to_server(self.service, self.server)
+        port = self.server.add_insecure_port("127.0.0.1:0")
+        self.server.start()
+        self.breaker = CircuitBreaker("fake", failures=3, reset=0.2)
+        self.client = ResilientClient(
+            "fake",
+            Balancer("fake", f"127.0.0.1:{port}"),
+            translation_pb2_grpc.TranslationServiceStub,
+            breaker=self.breaker,
+            max_retries=2,
+            backoff_base_ms=1,
+            backoff_max_ms=5,
+            hedge_quantile=0.95,
+            hedge_min_delay_ms=1,
+            hedge_budget=0.5,
+        )
+
+    def tearDown(self):
+        self.server.stop(None)
+
+    def translate(self, text="hello", deadline=2.0, hedge=False):
+        request = translation_pb2.TextRequest(text=text, language="en")
+        return self.client.call("TranslateText", request, deadline, hedge=hedge).translated_text
+
+    def warm_up(self, calls=30):
+        """Give the client a latency history and hedge budget."""
+        for _ in range(calls):
+            self.translate(hedge=True)
+
+
+class StatusError(grpc.RpcError):
+
+    def __init__(self, code):
+        self._code = code
+
+    def code(self):
+        return self._code
+
+
+class BalancerTests(SimpleTestCase):
+
+    def balancer(self, target="a:1,b:2,c:3", **options):
+        patcher = mock.patch.object(Balancer, "_ensure_checker")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return Balancer("test", target, **options)
+
+    def picks(self, balancer, count):
+        addresses = []
+        for _ in range(count):
+            with balancer.pick() as replica:
+                addresses.append(replica.address)
+        return addresses
+
+    def test_parse_addresses(self):
+        self.assertEqual(
+            parse_addresses("a:1, b:2\n# comment\nc:3 # note\na:1\n"), ["a:1", "b:2", "c:3"]
+        )
+
+    def test_round_robin(self):
+        self.assertEqual(self.picks(self.balancer(), 6), ["a:1", "b:2", "c:3"] * 2)
+
+    def test_least_outstanding(self):
+        balancer = self.balancer(policy=LEAST_OUTSTANDING)
+        busy = [balancer.pick(), balancer.pick()]
+        self.assertEqual({lease.replica.address for lease in busy}, {"a:1", "b:2"})
+        self.assertEqual(self.picks(balancer, 3), ["c:3"] * 3)
+        for lease in busy:
+            lease.release()
+        self.assertEqual(sum(r.outstanding for r in balancer.replicas()), 0)
+
+    def test_unavailable_evicts_the_replica(self):
+        balancer = self.balancer()
+        balancer.pick().release(StatusError(grpc.StatusCode.UNAVAILABLE))
+        balancer.pick().release(StatusError(grpc.StatusCode.INVALID_ARGUMENT))
+        self.assertEqual(set(self.picks(balancer, 4)), {"b:2", "c:3"})
+        stats = balancer.stats()
+        self.assertEqual(stats["healthy"], 2)
+        self.assertEqual(stats["replicas"]["a:1"]["last_error"], "UNAVAILABLE")
+        self.assertEqual(sum(replica["errors"] for replica in stats["replicas"].values()), 2)
+
+    def test_single_replica_and_empty_pool_are_still_used(self):
+        single = self.balancer("a:1")
+        single.pick().release(StatusError(grpc.StatusCode.UNAVAILABLE))
+        self.assertTrue(single.replicas()[0].healthy)
+
+        balancer = self.balancer("a:1,b:2")
+        for _ in range(2):
+            balancer.pick().release(StatusError(grpc.StatusCode.UNAVAILABLE))
+        self.assertEqual(set(self.picks(balancer, 2)), {"a:1", "b:2"})
+
+    def test_cancelled_calls_are_not_recorded(self):
+        balancer = self.balancer("a:1,b:2")
+        balancer.pick().release(StatusError(grpc.StatusCode.CANCELLED), cancelled=True)
+        replica = balancer.stats()["replicas"]["a:1"]
+        self.assertEqual((replica["requests"], replica["errors"], replica["outstanding"]), (0, 0, 0))
+
+    def test_resolver_file_is_reloaded(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "replicas.txt")
+        with open(path, "w") as f:
+            f.write("a:1\nb:2\n")
+        balancer = self.balancer(f"file:{path}")
+        self.picks(balancer, 2)
+        with open(path, "w") as f:
+            f.write("b:2\nc:3\n")
+        os.utime(path, (time.time() + 5, time.time() + 5))
+        balancer._reload()
+        replicas = balancer.stats()["replicas"]
+        self.assertEqual(list(replicas), ["b:2", "c:3"])
+        self.assertEqual(replicas["b:2"]["requests"], 1)
+
+    def test_health_check_evicts_and_readmits(self):
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=1))
+        port = server.add_insecure_port("127.0.0.1:0")
+        server.start()
+        self.addCleanup(server.stop, None)
+        with socket.socket() as closed:
+            closed.bind(("127.0.0.1", 0))
+            dead = closed.getsockname()[1]
+        live = f"127.0.0.1:{port}"
+        balancer = self.balancer(f"{live},127.0.0.1:{dead}", check_timeout=0.5)
+        balancer.check()
+        self.assertEqual(balancer.stats()["healthy"], 1)
+        self.assertEqual(set(self.picks(balancer, 3)), {live})
+        balancer.replicas()[1].healthy = False
+        balancer.replicas()[0].healthy = False
+        balancer.check()
+        self.assertTrue(balancer.replicas()[0].healthy)
+
+
+class DeadlineTests(FakeServerTestCase):
+
+    def test_stuck_call_fails_at_the_deadline(self):
+        self.service.delays = [5.0]
+        start = time.monotonic()
+        with self.assertRaises(grpc.RpcError) as raised:
+            self.translate(deadline=0.2)
+        self.assertEqual(raised.exception.code(), grpc.StatusCode.DEADLINE_EXCEEDED)
+        self.assertLess(time.monotonic() - start, 1.0)
+
+    def test_deadline_is_not_retried(self):
+        self.service.delays = [5.0]
+        with self.assertRaises(grpc.RpcError):
+            self.translate(deadline=0.1)
+        self.assertEqual(self.service.calls, 1)
+        self.assertEqual(self.client.retries, 0)
+
+
+class RetryTests(FakeServerTestCase):
+
+    def test_unavailable_is_retried(self):
+        self.service.failures = [grpc.StatusCode.UNAVAILABLE] * 2
+        self.assertEqual(self.translate(), "HELLO")
+        self.assertEqual(self.service.calls, 3)
+        self.assertEqual(self.client.retries, 2)
+
+    def test_retries_are_bounded(self):
+        self.service.failures = [grpc.StatusCode.UNAVAILABLE] * 10
+        with self.assertRaises(grpc.RpcError) as raised:
+            self.translate()
+        self.assertEqual(raised.exception.code(), grpc.StatusCode.UNAVAILABLE)
+        self.assertEqual(self.service.calls, 3)
+
+    def test_request_errors_are_not_retried(self):
+        self.service.failures = [grpc.StatusCode.INVALID_ARGUMENT]
+        with self.assertRaises(grpc.RpcError):
+            self.translate()
+        self.assertEqual(self.service.calls, 1)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+
+class HedgingTests(FakeServerTestCase):
+
+    def test_no_hedge_without_latency_history(self):
+        self.service.delays = [0.3]
+        self.assertEqual(self.translate(hedge=True), "HELLO")
+        self.assertEqual(self.client.hedges, 0)
+
+    def test_hedge_answers_for_a_slow_replica(self):
+        self.warm_up()
+        self.service.delays = [1.0]
+        start = time.monotonic()
+        self.assertEqual(self.translate(hedge=True), "HELLO")
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(self.client.hedges, 1)
+        self.assertEqual(self.client.hedge_wins, 1)
+
+    def test_hedges_are_budgeted(self):
+        self.warm_up()
+        self.client.hedge_budget = 0.0
+        self.client._hedge_tokens = 0.0
+        self.service.delays = [0.3]
+        self.assertEqual(self.translate(hedge=True), "HELLO")
+        self.assertEqual(self.client.hedges, 0)
+
+    def test_async_hedge_answers_for_a_slow_replica(self):
+        self.warm_up()
+        self.service.delays = [1.0]
+        request = translation_pb2.TextRequest(text="hello", language="en")
+
+        async def translate():
+            return await self.client.call_async("TranslateText", request, 2.0, hedge=True)
+
+        start = time.monotonic()
+        self.assertEqual(asyncio.run(translate()).translated_text, "HELLO")
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(self.client.hedge_wins, 1)
+
+
+class CircuitBreakerTests(FakeServerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.max_retries = 0
+
+    def test_opens_and_fails_fast(self):
+        self.service.failures = [grpc.StatusCode.UNAVAILABLE] * 3
+        for _ in range(3):
+            with self.assertRaises(grpc.RpcError):
+                self.translate()
+        self.assertEqual(self.breaker.state, OPEN)
+        with self.assertRaises(CircuitOpenError):
+            self.translate()
+        self.assertEqual(self.service.calls, 3)
+
+    def test_slow_backend_opens_the_circuit(self):
+        self.service.delays = [1.0] * 3
+        for _ in range(3):
+            with self.assertRaises(grpc.RpcError):
+                self.translate(deadline=0.05)
+        self.assertEqual(self.breaker.state, OPEN)
+
+    def test_probe_closes_the_circuit(self):
+        self.service.failures = [grpc.StatusCode.UNAVAILABLE] * 3
+        for _ in range(3):
+            with self.assertRaises(grpc.RpcError):
+                self.translate()
+        time.sleep(0.25)
+        self.assertEqual(self.translate(), "HELLO")
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_probe_slot_is_freed_when_nothing_is_sent(self):
+        self.service.failures = [grpc.StatusCode.UNAVAILABLE] * 3
+        for _ in range(3):
+            with self.assertRaises(grpc.RpcError):
+                self.translate()
+        time.sleep(0.25)
+        with mock.patch.object(self.client.balancer, "pick", side_effect=RuntimeError("no replica")):
+            with self.assertRaises(RuntimeError):
+                self.translate()
+        self.assertEqual(self.translate(), "HELLO")
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_failed_probe_reopens_the_circuit(self):
+        self.service.failures = [grpc.StatusCode.UNAVAILABLE] * 4
+        for _ in range(3):
+            with self.assertRaises(grpc.RpcError):
+                self.translate()
+        time.sleep(0.25)
+        with self.assertRaises(grpc.RpcError):
+            self.translate()
+        with self.assertRaises(CircuitOpenError):
+            self.translate()
+        self.assertEqual(self.service.calls, 4)
+
+
+class InterceptorTests(SimpleTestCase):
+
+    method = "/translation.TranslationService/TranslateText"
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, {"method": "TranslateText", **labels}) or 0.0
+
+    def call(self, port, payload):
+        with grpc.insecure_channel(f"127.0.0.1:{port}") as channel:
+            call = channel.unary_unary(self.method)
+            try:
+                call(payload, timeout=2)
+                return grpc.StatusCode.OK
+            except grpc.RpcError as e:
+                return e.code()
+
+    def check(self, port):
+        in_flight = self.sample("grpc_server_in_flight")
+        handled = self.sample("grpc_server_handled_total", code="OK")
+        request = translation_pb2.TextRequest(text="hi", language="fr").SerializeToString()
+        self.assertEqual(self.call(port, request), grpc.StatusCode.OK)
+        # Not a TextRequest: the call is aborted before the handler runs
+        self.assertNotEqual(self.call(port, b"\xff\xff\xff"), grpc.StatusCode.OK)
+        self.assertEqual(self.sample("grpc_server_in_flight"), in_flight)
+        self.assertEqual(self.sample("grpc_server_handled_total", code="OK"), handled + 1)
+
+    def test_sync_server(self):
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=2),
+                             interceptors=[MetricsInterceptor()])
+        translation_pb2_grpc.add_TranslationServiceServicer_to_server(FakeTranslationService(), server)
+        port = server.add_insecure_port("127.0.0.1:0")
+        server.start()
+        self.addCleanup(server.stop, None)
+        self.check(port)
+
+    def test_aio_server(self):
+        class Service(translation_pb2_grpc.TranslationServiceServicer):
+            async def TranslateText(self, request, context):
+                return translation_pb2.TextResponse(translated_text=request.text.upper())
+
+        async def main():
+            server = grpc.aio.server(interceptors=[AsyncMetricsInterceptor()])
+            translation_pb2_grpc.add_TranslationServiceServicer_to_server(Service(), server)
+            port = server.add_insecure_port("127.0.0.1:0")
+            await server.start()
+            try:
+                await asyncio.to_thread(self.check, port)
+            finally:
+                await server.stop(None)
+
+        asyncio.run(main())
+
+
+class BreakerStateTests(SimpleTestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.breaker = CircuitBreaker("test", failures=3, reset=5, clock=lambda: self.now)
+
+    def fail(self, ticket=ADMITTED, code=grpc.StatusCode.UNAVAILABLE):
+        self.breaker.record(ticket, StatusError(code))
+
+    def open(self):
+        for _ in range(3):
+            self.fail(self.breaker.allow())
+        self.assertEqual(self.breaker.state, OPEN)
+
+    def test_only_ok_resets_the_failure_count(self):
+        self.fail()
+        self.fail()
+        self.breaker.record(ADMITTED, ValueError("could not encode"))
+        self.breaker.record(ADMITTED, CircuitOpenError("nested"))
+        self.fail(code=grpc.StatusCode.INVALID_ARGUMENT)
+        self.fail()
+        self.assertEqual(self.breaker.state, OPEN)
+
+    def test_half_open_lets_one_probe_through(self):
+        self.open()
+        self.assertIsNone(self.breaker.allow())
+        self.now = 5
+        self.assertEqual(self.breaker.allow(), PROBE)
+        self.assertIsNone(self.breaker.allow())
+        self.breaker.record(PROBE)
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertEqual(self.breaker.allow(), ADMITTED)
+
+    def test_calls_sent_before_opening_do_not_decide(self):
+        stale = [self.breaker.allow() for _ in range(2)]
+        self.open()
+        self.now = 5
+        probe = self.breaker.allow()
+        # A call admitted while closed completes during the probe
+        self.breaker.record(stale[0])
+        self.fail(stale[1])
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.assertIsNone(self.breaker.allow())
+        self.fail(probe)
+        self.assertEqual(self.breaker.state, OPEN)
+
+    def test_probe_without_a_verdict_frees_the_slot(self):
+        self.open()
+        self.now = 5
+        self.breaker.record(self.breaker.allow(), ValueError("could not encode"))
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.breaker.record(self.breaker.allow(), cancelled=True)
+        self.assertEqual(self.breaker.allow(), PROBE)
+
+
+class RouterFallbackTests(SimpleTestCase):
+
+    def refuse(self, text):
+        raise CircuitOpenError("translation")
+
+    def test_open_circuit_runs_locally(self):
+        router = Router(policy="remote", circuit_fallback="local")
+        result, path = router.run("translate", 5, str.upper, self.refuse, "hello")
+        self.assertEqual((result, path), ("HELLO", LOCAL))
+        self.assertEqual(router.stats()["operations"]["translate"]["fallbacks"], 1)
+
+    def test_open_circuit_fails_fast_without_fallback(self):
+        router = Router(policy="remote", circuit_fallback="fail")
+        with self.assertRaises(CircuitOpenError):
+            router.run("translate", 5, str.upper, self.refuse, "hello")
+
+
+class AdaptiveRouterTests(SimpleTestCase):
+
+    def setUp(self):
+        self.router = Router(policy="adaptive", local_audio_max_bytes=1000, explore_every=0)
+        self.load = 0.0
+        self.router.cpu_load = lambda: self.load
+
+    def teach(self, operation, size, local_ms, remote_ms):
+        self.router.record(operation, size, LOCAL, local_ms)
+        self.router.record(operation, size, REMOTE, remote_ms)
+
+    def test_forced_policies(self):
+        self.teach("translate", 10, 1.0, 50.0)
+        self.assertEqual(self.router.decide("translate", 10, "remote")[:2], (REMOTE, "forced"))
+        self.assertEqual(Router(policy="local").decide("translate", 10)[:2], (LOCAL, "forced"))
+
+    def test_each_path_is_explored_first(self):
+        self.assertEqual(self.router.decide("translate", 10)[:2], (REMOTE, "explore"))
+        self.router.record("translate", 10, REMOTE, 5.0)
+        self.assertEqual(self.router.decide("translate", 10)[:2], (LOCAL, "explore"))
+
+    def test_large_audio_always_goes_remote(self):
+        self.teach("audio", 5000, 1.0, 50.0)
+        self.assertEqual(self.router.decide("audio", 5000)[:2], (REMOTE, "size"))
+
+    def test_faster_path_wins_per_size_class(self):
+        self.teach("translate", 10, 0.5, 5.0)
+        self.teach("translate", 100000, 80.0, 20.0)
+        self.assertEqual(self.router.decide("translate", 12)[:2], (LOCAL, "latency"))
+        self.assertEqual(self.router.decide("translate", 100000)[:2], (REMOTE, "latency"))
+
+    def test_cpu_load_can_tip_the_choice(self):
+        self.teach("translate", 10, 4.0, 5.0)
+        self.load = 1.0
+        self.assertEqual(self.router.decide("translate", 10)[:2], (REMOTE, "load"))
+
+    def test_periodic_exploration(self):
+        self.router.explore_every = 3
+        self.teach("translate", 10, 0.5, 5.0)
+        paths = [self.router.decide("translate", 10)[0] for _ in range(6)]
+        self.assertEqual(paths.count(REMOTE), 2)
+
+    def test_run_records_latency_and_errors(self):
+        def fail(text):
+            raise RuntimeError("boom")
+
+        self.teach("translate", 5, 0.5, 5.0)
+        self.assertEqual(self.router.run("translate", 5, str.upper, fail, "hello"), ("HELLO", LOCAL))
+        with self.assertRaises(RuntimeError):
+            self.router.run("translate", 5, fail, str.upper, "hello")
+        stats = self.router.stats()["operations"]["translate"]
+        self.assertEqual(stats["requests"][LOCAL], 2)
+        self.assertEqual(stats["errors"][LOCAL], 1)
+
+
+class SendTextBatchTests(SimpleTestCase):
+
+    def post(self, items):
+        return self.client.post("/api/send-text-batch/", items, content_type="application/json")
+
+    def test_empty_batch_makes_no_call(self):
+        with mock.patch("apis.views.translate_many") as translate_many:
+            response = self.post([])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 0)
+        translate_many.assert_not_called()
+
+    def test_oversized_batch_is_rejected(self):
+        item = {"sender": "a", "receiver": "b", "text": "hello", "target_language": "fr"}
+        with mock.patch("apis.views.translate_many") as translate_many:
+            response = self.post([item] * (MAX_TEXT_BATCH + 1))
+        self.assertEqual(response.status_code, 400)
+        translate_many.assert_not_called()
+
+
+class Base64ChunkTests(SimpleTestCase):
+
+    data = bytes(range(256)) * 3 + b"xy"
+
+    def test_decode_round_trips_for_any_chunk_size(self):
+        encoded = base64.b64encode(self.data).decode()
+        for chunk_size in (1, 2, 3, 4, 48, 1000):
+            with self.subTest(chunk_size=chunk_size):
+                chunks = list(_b64decode_chunks(encoded, chunk_size))
+                self.assertEqual(b"".join(chunks), self.data)
+
+    def test_encode_carries_partial_groups_between_chunks(self):
+        chunks = [self.data[i:i + 7] for i in range(0, len(self.data), 7)]
+        encoded, size = _b64encode_chunks(chunks)
+        self.assertEqual(encoded, base64.b64encode(self.data).decode())
+        self.assertEqual(size, len(self.data))
+
+
+class SendAudioBinaryTests(TestCase):
+
+    def post(self, body, accept="application/octet-stream"):
+        return self.client.post(
+            "/api/send-audio/", body, content_type="application/octet-stream",
+            headers={"Accept": accept, "X-Sender": "a", "X-Receiver": "b"},
+        )
+
+    def test_empty_body_is_rejected(self):
+        with mock.patch("apis.views.process_audio") as process_audio:
+            response = self.post(b"")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertIn("audio", response.json())
+        process_audio.assert_not_called()
+
+    def test_errors_are_json_for_binary_accept(self):
+        with mock.patch("apis.views.process_audio", side_effect=RuntimeError("down")):
+            response = self.post(b"\x00\x01" * 10)
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertIn("down", response.json()["error"])
+
+    def test_streamed_clip_is_sent_as_it_arrives(self):
+        produced = []
+
+        def process_audio_stream(chunks):
+            for chunk in chunks:
+                produced.append(chunk)
+                yield chunk.upper()
+
+        with mock.patch("apis.views.AUDIO_STREAM_THRESHOLD", 0), \
+                mock.patch("apis.views.AUDIO_CHUNK_SIZE", 4), \
+                mock.patch("apis.views.process_audio_stream", process_audio_stream), \
+                mock.patch("apis.views.save_chat_message") as save:
+            response = self.post(b"abcdefghij")
+            self.assertTrue(response.streaming)
+            self.assertFalse(response.has_header("Content-Length"))
+            # Only the first chunk was processed before the response started
+            self.assertEqual(produced, [b"abcd"])
+            save.assert_not_called()
+            self.assertEqual(b"".join(response.streaming_content), b"ABCDEFGHIJ")
+        self.assertEqual(save.call_args.kwargs["translated_message"], "audio-10-bytes")
+
+    def test_streamed_clip_is_stored_when_the_client_goes_away(self):
+        def process_audio_stream(chunks):
+            for chunk in chunks:
+                yield chunk.upper()
+
+        with mock.patch("apis.views.AUDIO_STREAM_THRESHOLD", 0), \
+                mock.patch("apis.views.AUDIO_CHUNK_SIZE", 4), \
+                mock.patch("apis.views.process_audio_stream", process_audio_stream):
+            response = self.post(b"abcdefghij")
+            self.assertEqual(next(iter(response.streaming_content)), b"ABCD")
+            response.close()
+        message = ChatMessage.objects.get()
+        self.assertEqual((message.sender, message.receiver), ("a", "b"))
+        self.assertEqual(message.translated_message, "audio-10-bytes")
+
+    def test_failure_partway_stores_the_message_and_aborts(self):
+        def process_audio_stream(chunks):
+            yield b"ABCD"
+            raise StatusError(grpc.StatusCode.UNAVAILABLE)
+
+        with mock.patch("apis.views.AUDIO_STREAM_THRESHOLD", 0), \
+                mock.patch("apis.views.process_audio_stream", process_audio_stream):
+            response = self.post(b"abcdefghij")
+            content = iter(response.streaming_content)
+            self.assertEqual(next(content), b"ABCD")
+            with self.assertRaises(grpc.RpcError):
+                next(content)
+        self.assertEqual(ChatMessage.objects.get().translated_message, "audio-4-bytes")
+
+    def test_failure_before_the_first_chunk_is_an_error_response(self):
+        def process_audio_stream(chunks):
+            raise RuntimeError("unavailable")
+            yield
+
+        with mock.patch("apis.views.AUDIO_STREAM_THRESHOLD", 0), \
+                mock.patch("apis.views.process_audio_stream", process_audio_stream):
+            response = self.post(b"abcdefghij")
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response["Content-Type"], "application/json")
+
+
+class TranslationCacheTests(SimpleTestCase):
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = TranslationCache(max_entries=2, max_bytes=1 << 20, ttl=60)
+        cache.set(("a", "fr"), "A")
+        cache.set(("b", "fr"), "B")
+        cache.get(("a", "fr"))
+        cache.set(("c", "fr"), "C")
+        self.assertEqual(cache.get(("a", "fr")), "A")
+        self.assertIsNone(cache.get(("b", "fr")))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_byte_bound_evicts(self):
+        cache = TranslationCache(max_entries=100, max_bytes=1000, ttl=60)
+        for n in range(10):
+            cache.set((f"text {n}", "fr"), "x" * 100)
+        self.assertLessEqual(cache.stats()["bytes"], 1000)
+        self.assertIsNone(cache.get(("text 0", "fr")))
+        self.assertEqual(cache.get(("text 9", "fr")), "x" * 100)
+
+    def test_entries_expire(self):
+        cache = TranslationCache(max_entries=10, max_bytes=1 << 20, ttl=0.05)
+        cache.set(("a", "fr"), "A")
+        time.sleep(0.1)
+        self.assertIsNone(cache.get(("a", "fr")))
+        self.assertEqual(cache.stats()["expirations"], 1)
+
+
+class SharedCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "cache.sqlite3")
+
+    def cache(self, path=None, ttl=60):
+        return TranslationCache(max_entries=10, max_bytes=1 << 20, ttl=ttl,
+                                backend=SQLiteCacheBackend(path or self.path))
+
+    def test_other_workers_hit_the_shared_tier(self):
+        self.cache().set(("a", "fr"), "A")
+        other = self.cache()
+        self.assertEqual(other.get(("a", "fr")), "A")
+        self.assertEqual(other.stats()["shared_hits"], 1)
+
+    def test_shared_hit_keeps_its_expiry(self):
+        self.cache(ttl=0.2).set(("a", "fr"), "A")
+        time.sleep(0.1)
+        other = self.cache(ttl=60)
+        self.assertEqual(other.get(("a", "fr")), "A")
+        time.sleep(0.15)
+        self.assertIsNone(other.get(("a", "fr")))
+
+    def test_sqlite_errors_are_misses(self):
+        cache = self.cache(path=os.path.join(self.path, "missing", "cache.sqlite3"))
+        with self.assertLogs("apis.grpc_client.cache", "WARNING"):
+            cache.set(("a", "fr"), "A")
+            self.assertIsNone(cache.get(("b", "fr")))
+        self.assertEqual(cache.get(("a", "fr")), "A")
+        self.assertEqual(cache.stats()["shared_errors"], 2)
+
+
+class SingleFlightTests(SimpleTestCase):
+
+    def setUp(self):
+        self.flight = SingleFlight()
+        self.release = threading.Event()
+        self.calls = 0
+
+    def slow(self, value):
+        self.calls += 1
+        self.release.wait(2)
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    def run_threads(self, count, value):
+        results = []
+
+        def call():
+            try:
+                results.append(self.flight.do("key", self.slow, value))
+            except Exception as e:
+                results.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        # Everyone is waiting on the leader's call
+        while self.flight.executed + self.flight.coalesced < count:
+            time.sleep(0.001)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_callers_share_one_call(self):
+        results = self.run_threads(8, "done")
+        self.assertEqual(results, ["done"] * 8)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.flight.stats(), {"in_flight": 0, "executed": 1, "coalesced": 7})
+
+    def test_errors_are_shared_and_not_kept(self):
+        error = ValueError("failed")
+        results = self.run_threads(4, error)
+        self.assertEqual(results, [error] * 4)
+        self.assertEqual(self.flight.do("key", str.upper, "again"), "AGAIN")
+        self.assertEqual(self.calls, 1)
+
+    def test_async_callers_share_one_call(self):
+        async def slow():
+            self.calls += 1
+            await asyncio.sleep(0.05)
+            return "done"
+
+        async def main():
+            first = asyncio.ensure_future(self.flight.do_async("key", slow))
+            await asyncio.sleep(0)
+            # A cancelled caller does not cancel the shared call
+            second = asyncio.ensure_future(self.flight.do_async("key", slow))
+            await asyncio.sleep(0)
+            second.cancel()
+            rest = await asyncio.gather(*(self.flight.do_async("key", slow) for _ in range(3)))
+            return [await first] + rest
+
+        self.assertEqual(asyncio.run(main()), ["done"] * 4)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.flight.stats()["in_flight"], 0)
+
+
+class HistoryPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        ChatMessage.objects.bulk_create(
+            ChatMessage(sender="alice" if n % 2 else "bob", receiver="carol",
+                        message_type="text", original_message=str(n))
+            for n in range(10)
+        )
+        # Rows 0-5 share one timestamp: only the id orders them
+        stamp = timezone.now()
+        ids = sorted(ChatMessage.objects.values_list("id", flat=True))
+        ChatMessage.objects.filter(id__in=ids[:6]).update(timestamp=stamp)
+        for offset, pk in enumerate(ids[6:], 1):
+            ChatMessage.objects.filter(id=pk).update(timestamp=stamp + timedelta(seconds=offset))
+
+    def pages(self, url, limit):
+        ids, cursor = [], None
+        while True:
+            query = f"{url}?limit={limit}" + (f"&cursor={cursor}" if cursor else "")
+            body = self.client.get(query).json()
+            ids.extend(message["id"] for message in body["results"])
+            cursor = body["next_cursor"]
+            if cursor is None:
+                return ids
+
+    def test_cursor_round_trips(self):
+        message = ChatMessage.objects.first()
+        self.assertEqual(decode_cursor(encode_cursor(message)), (message.timestamp, message.pk))
+
+    def test_malformed_cursor_is_rejected(self):
+        with self.assertRaises(ValueError):
+            decode_cursor("not a cursor")
+        response = self.client.get("/api/history/?cursor=bm9wZQ==")
+        self.assertEqual(response.status_code, 400)
+
+    def test_pages_cover_timestamp_ties_once_in_order(self):
+        expected = list(ChatMessage.objects.order_by("-timestamp", "-id").values_list("id", flat=True))
+        for limit in (1, 3, 4, 10):
+            with self.subTest(limit=limit):
+                self.assertEqual(self.pages("/api/history/", limit), expected)
+
+    def test_async_view_pages_the_same(self):
+        self.assertEqual(self.pages("/api/history-async/", 4), self.pages("/api/history/", 4))
+
+    def test_filters_apply_across_pages(self):
+        body = self.client.get("/api/history/?sender=alice&limit=2").json()
+        self.assertTrue(all(message["sender"] == "alice" for message in body["results"]))
+        more = self.client.get(f"/api/history/?sender=alice&limit=10&cursor={body['next_cursor']}").json()
+        self.assertEqual(len(body["results"]) + len(more["results"]), 5)
+
+
+class WriteBehindTests(TransactionTestCase):
+
+    def message(self, n):
+        return ChatMessage(sender="alice", receiver="bob", message_type="text",
+                           original_message=str(n))
+
+    def stalled_queue(self, **options):
+        """A queue whose flusher never starts: flush() is called by hand."""
+        patcher = mock.patch.object(WriteBehindQueue, "_ensure_started")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return WriteBehindQueue(**options)
+
+    def test_flusher_writes_queued_rows(self):
+        write_queue = WriteBehindQueue(batch_size=3, flush_interval=0.01)
+        self.addCleanup(write_queue.stop)
+        for n in range(7):
+            self.assertTrue(write_queue.put(self.message(n)))
+        deadline = time.monotonic() + 2
+        while write_queue.stats()["flushed"] < 7 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(ChatMessage.objects.count(), 7)
+        self.assertGreaterEqual(write_queue.stats()["batches"], 3)
+
+    def test_full_queue_hands_the_row_back(self):
+        write_queue = self.stalled_queue(max_queue=1, put_timeout=0.01)
+        self.assertTrue(write_queue.put(self.message(0)))
+        self.assertFalse(write_queue.put(self.message(1)))
+        self.assertFalse(write_queue.put(self.message(2), block=False))
+        self.assertEqual(write_queue.stats()["overflow_writes"], 2)
+
+    def test_failed_batch_is_written_row_by_row(self):
+        write_queue = self.stalled_queue()
+        for n in range(3):
+            write_queue.put(self.message(n))
+        with mock.patch.object(ChatMessage.objects, "bulk_create", side_effect=OperationalError("locked")), \
+                self.assertLogs("apis.persistence", "ERROR"):
+            write_queue.flush()
+        self.assertEqual(ChatMessage.objects.count(), 3)
+        self.assertEqual(write_queue.stats()["failed"], 0)
+
+    def test_failed_rows_are_kept_and_retried(self):
+        write_queue = self.stalled_queue(retry_backoff=0.01)
+        for n in range(3):
+            write_queue.put(self.message(n))
+        with mock.patch.object(ChatMessage.objects, "bulk_create", side_effect=OperationalError("locked")), \
+                mock.patch.object(ChatMessage, "save", side_effect=OperationalError("locked")), \
+                self.assertLogs("apis.persistence", "ERROR"):
+            write_queue.flush()
+        self.assertEqual(ChatMessage.objects.count(), 0)
+        self.assertEqual(write_queue.stats()["retry_pending"], 3)
+
+        write_queue.flush()
+        self.assertEqual(ChatMessage.objects.count(), 3)
+        stats = write_queue.stats()
+        self.assertEqual((stats["retry_pending"], stats["failed"], stats["flushed"]), (0, 3, 3))
+
+    def test_rows_are_published_once_written(self):
+        write_queue = self.stalled_queue()
+        with mock.patch("apis.persistence.publish_messages") as publish:
+            write_queue.put(self.message(0))
+            publish.assert_not_called()
+            write_queue.flush()
+        (published,), _ = publish.call_args
+        self.assertEqual(len(published), 1)
+        self.assertIsNotNone(published[0].pk)
+        self.assertIsNotNone(published[0].timestamp)
+
+
+def wav(samples, rate=16000, channels=1, bits=16, fmt_size=16):
+    """A PCM WAV file holding int16 samples, with any header values."""
+    data = np.asarray(samples, dtype="<i2").tobytes()
+    fmt = struct.pack("<HHIIHH", 1, channels, rate, rate * 2 * channels, 2 * channels, bits)
+    fmt = fmt[:fmt_size] + b"\x00" * (fmt_size - len(fmt))
+    body = b"WAVE" + b"fmt " + struct.pack("<I", fmt_size) + fmt + b"data" + struct.pack("<I", len(data)) + data
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+class AudioPipelineTests(SimpleTestCase):
+
+    def test_stereo_8k_becomes_mono_16k(self):
+        tone = (np.sin(np.arange(800) / 5) * 8000).astype(np.int16)
+        output = audio_pipeline.process(wav(np.repeat(tone, 2), rate=8000, channels=2))
+        samples, rate = audio_pipeline.decode(output)
+        self.assertEqual((rate, samples.shape), (16000, (1600, 1)))
+        self.assertGreater(int(np.abs(samples).max()), 8000)
+
+    def test_raw_pcm_is_accepted(self):
+        samples, rate = audio_pipeline.decode(b"\x01\x00" * 10 + b"\x02")
+        self.assertEqual(samples.shape, (10, 1))
+
+    def test_out_of_range_headers_are_format_errors(self):
+        cases = {
+            "zero rate": wav([1] * 10, rate=0),
+            "tiny rate": wav([1] * 4, rate=1),
+            "huge rate": wav([1] * 4, rate=10_000_000),
+            "no channels": wav([1] * 4, channels=0),
+            "too many channels": wav([1] * 64, channels=64),
+            "8-bit": wav([1] * 4, bits=8),
+            "short fmt chunk": wav([1] * 4, fmt_size=8),
+            "truncated fmt chunk": wav([1] * 4)[:30],
+            "data before fmt": b"RIFF\x10\x00\x00\x00WAVEdata\x04\x00\x00\x00\x01\x00\x01\x00",
+        }
+        for name, data in cases.items():
+            with self.subTest(name), self.assertRaises(AudioFormatError):
+                audio_pipeline.process(data)
+
+    def test_upsampling_is_capped(self):
+        with self.assertRaises(AudioFormatError):
+            audio_pipeline.resample(np.zeros(4, dtype=np.float32), 100, 16000)
+
+    def test_service_reports_invalid_argument(self):
+        context = mock.Mock()
+        context.abort.side_effect = grpc.RpcError()
+        with self.assertRaises(grpc.RpcError):
+            AudioService().ProcessAudio(audio_pb2.AudioRequest(audio=wav([1] * 4, rate=1)), context)
+        self.assertEqual(context.abort.call_args.args[0], grpc.StatusCode.INVALID_ARGUMENT)
+
+
+class TranslationEngineTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        with open(os.path.join(directory.name, "fr.tsv"), "wb") as f:
+            f.write(
+                b"# comment\thas a tab\n"
+                b"good\tbon\n"
+                b"good morning\tbonjour\r\n"
+                b"world\tterre\n"
+                b"world\tmonde\n"
+                b"thank you\tmerci"
+            )
+        self.engine = TranslationEngine(directory.name)
+
+    def test_longest_phrase_wins_and_spacing_is_kept(self):
+        self.assertEqual(self.engine.translate("Good morning,  world!", "fr"), "Bonjour,  monde!")
+        self.assertEqual(self.engine.translate("good day", "fr"), "bon day")
+
+    def test_table_format(self):
+        table = self.engine.table("fr")
+        self.assertEqual(len(table), 4)
+        self.assertIsNone(table.get("# comment"))
+        self.assertEqual(table.get("good morning"), "bonjour")
+        self.assertEqual(table.get("thank you"), "merci")
+
+    def test_unknown_languages_are_not_kept(self):
+        for n in range(1000):
+            self.assertEqual(self.engine.translate("good", f"xx{n}"), "good")
+        self.assertEqual(self.engine.translate("good", "../fr"), "good")
+        self.engine.translate("good", "fr")
+        self.assertEqual(list(self.engine._tables), ["fr"])
+
+
+class PushHubTests(SimpleTestCase):
+
+    def test_fan_out_to_every_subscription(self):
+        async def scenario():
+            hub = InMemoryHub(queue_size=10)
+            first, second, other = hub.subscribe("bob"), hub.subscribe("bob"), hub.subscribe("eve")
+            self.assertFalse(hub.subscribed("carol"))
+            hub.publish("bob", "hello")
+            self.assertEqual(await first.get(), ["hello"])
+            self.assertEqual(await second.get(), ["hello"])
+            self.assertEqual(await other.get(0.01), [])
+            hub.unsubscribe(first)
+            return hub.stats()
+
+        stats = asyncio.run(scenario())
+        self.assertEqual((stats["published"], stats["delivered"], stats["overflows"]), (1, 2, 0))
+        self.assertEqual((stats["connections"], stats["receivers"]), (2, 2))
+
+    def test_delivery_from_another_thread(self):
+        async def scenario():
+            hub = InMemoryHub()
+            subscription = hub.subscribe("bob")
+            publisher = threading.Thread(target=hub.publish, args=("bob", "hello"))
+            publisher.start()
+            items = await subscription.get(2)
+            publisher.join()
+            return items, hub.stats()["delivered"]
+
+        self.assertEqual(asyncio.run(scenario()), (["hello"], 1))
+
+    def test_overflow_closes_the_slow_subscription(self):
+        async def scenario():
+            hub = InMemoryHub(queue_size=2)
+            slow, fast = hub.subscribe("bob"), hub.subscribe("bob")
+            for n in range(3):
+                hub.publish("bob", str(n))
+                await fast.get()
+            self.assertTrue(slow.closed and slow.overflowed)
+            self.assertEqual(await slow.get(), [])
+            hub.publish("bob", "3")
+            self.assertEqual(await fast.get(), ["3"])
+            return hub.stats()
+
+        stats = asyncio.run(scenario())
+        self.assertEqual((stats["published"], stats["delivered"], stats["overflows"]), (4, 6, 1))
+
+    def test_sse_stream(self):
+        hub = InMemoryHub(queue_size=1, heartbeat=60)
+        application = PushApplication(None)
+
+        async def scenario():
+            disconnect = asyncio.Event()
+            sent = []
+
+            async def receive():
+                await disconnect.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                sent.append(message)
+
+            scope = {"type": "http", "method": "GET", "path": "/api/stream/bob/"}
+            stream = asyncio.ensure_future(application(scope, receive, send))
+            while not hub.subscribed("bob"):
+                await asyncio.sleep(0)
+            hub.publish("bob", '{"id": 1}')
+            while len(sent) < 3:
+                await asyncio.sleep(0)
+            hub.publish("bob", '{"id": 2}')
+            hub.publish("bob", '{"id": 3}')
+            await asyncio.wait_for(stream, 2)
+            return sent
+
+        with mock.patch("apis.push.hub", hub):
+            sent = asyncio.run(scenario())
+        self.assertEqual(sent[0]["status"], 200)
+        self.assertIn((b"content-type", b"text/event-stream"), sent[0]["headers"])
+        bodies = [message["body"] for message in sent[1:]]
+        self.assertEqual(bodies, [b"retry: 3000\n\n", b'data: {"id": 1}\n\n',
+                                  b"event: overflow\ndata: {}\n\n", b""])
+        self.assertEqual(hub.stats()["connections"], 0)
+
+    def test_websocket_stream(self):
+        hub = InMemoryHub(queue_size=1)
+        application = PushApplication(None)
+
+        async def scenario():
+            incoming = asyncio.Queue()
+            incoming.put_nowait({"type": "websocket.connect"})
+            sent = []
+
+            async def send(message):
+                sent.append(message)
+
+            scope = {"type": "websocket", "path": "/api/stream/bob/"}
+            stream = asyncio.ensure_future(application(scope, incoming.get, send))
+            while not hub.subscribed("bob"):
+                await asyncio.sleep(0)
+            hub.publish("bob", '{"id": 1}')
+            while len(sent) < 2:
+                await asyncio.sleep(0)
+            # Two at once overflow a queue of one before the stream can send
+            hub.publish("bob", '{"id": 2}')
+            hub.publish("bob", '{"id": 3}')
+            await asyncio.wait_for(stream, 2)
+            return sent
+
+        with mock.patch("apis.push.hub", hub):
+            sent = asyncio.run(scenario())
+        self.assertEqual(sent, [
+            {"type": "websocket.accept"},
+            {"type": "websocket.send", "text": '{"id": 1}'},
+            {"type": "websocket.close", "code": 1013},
+        ])
+        stats = hub.stats()
+        self.assertEqual((stats["connections"], stats["delivered"], stats["overflows"]), (0, 2, 1))
+
+    def test_hub_backends_must_implement_publish(self):
+        class NoPublish(PushHub):
+            pass
+
+        with self.assertRaises(TypeError):
+            NoPublish()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class LauncherTests(SimpleTestCase):
+
+    def test_rolling_restart_replaces_workers_while_serving(self):
+        port = free_port()
+        launcher = subprocess.Popen(
+            [sys.executable, "-m", "apis.grpc_client.launcher", "translation",
+             "--workers", "2", "--port", str(port), "--metrics-port", "0", "--mode", "sync"],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+        )
+        # Never hang the suite on a launcher that does not come up
+        watchdog = threading.Timer(60, launcher.kill)
+        watchdog.start()
+        self.addCleanup(watchdog.cancel)
+        self.addCleanup(launcher.wait)
+        self.addCleanup(launcher.terminate)
+        self.assertIn("running on port", launcher.stdout.readline())
+
+        channel = grpc.insecure_channel(f"127.0.0.1:{port}")
+        self.addCleanup(channel.close)
+        stub = translation_pb2_grpc.TranslationServiceStub(channel)
+        request = translation_pb2.TextRequest(text="hello", language="en")
+        stop, calls, errors = threading.Event(), [], []
+
+        def call(retry_cancelled=True):
+            try:
+                stub.TranslateText(request, timeout=5, wait_for_ready=True)
+            except grpc.RpcError as error:
+                # A call the old worker accepted but had not dispatched
+                # when it stopped (see the launcher docstring)
+                if retry_cancelled and error.code() == grpc.StatusCode.CANCELLED:
+                    return call(retry_cancelled=False)
+                raise
+
+        def call_in_a_loop():
+            while not stop.is_set():
+                try:
+                    call()
+                    calls.append(time.monotonic())
+                except grpc.RpcError as error:
+                    errors.append(error.code())
+
+        stub.TranslateText(request, timeout=10, wait_for_ready=True)
+        caller = threading.Thread(target=call_in_a_loop)
+        caller.start()
+        try:
+            launcher.send_signal(signal.SIGHUP)
+            lines = [launcher.stdout.readline() for _ in range(3)]
+        finally:
+            stop.set()
+            caller.join()
+        self.assertEqual(lines[0].strip(), "Rolling restart...")
+        replaced = [re.search(r"worker (\d+) replaced by (\d+)", line).groups() for line in lines[1:]]
+        old = {int(pid) for pid, _ in replaced}
+        new = {int(pid) for _, pid in replaced}
+        self.assertEqual(len(old | new), 4)
+        for pid in new:
+            os.kill(pid, 0)     # Alive
+        self.assertEqual(errors, [])
+        self.assertGreater(len(calls), 0)
+        stub.TranslateText(request, timeout=5)
+
+        launcher.terminate()
+        self.assertEqual(launcher.wait(30), 0)
+        for pid in new:
+            with self.assertRaises(ProcessLookupError):
+                os.kill(pid, 0)
+
+    def launcher(self):
+        return Launcher("translation", workers=2, port=0, threads=1, max_rpcs=None, grace=0)
+
+    def test_failed_replacement_aborts_the_rolling_restart(self):
+        launcher = self.launcher()
+        old = [mock.Mock(pid=1), mock.Mock(pid=2)]
+        launcher._procs = list(old)
+        with mock.patch.object(launcher, "_spawn", side_effect=RuntimeError("no start")), \
+                mock.patch.object(launcher, "_retire") as retire, \
+                mock.patch("builtins.print"):
+            launcher.rolling_restart()
+        retire.assert_not_called()
+        self.assertEqual(launcher._procs, old)
+
+    def test_failed_respawn_is_retried_with_backoff(self):
+        launcher = self.launcher()
+        dead, alive, new = mock.Mock(pid=1), mock.Mock(pid=2), mock.Mock(pid=3)
+        dead.is_alive.return_value = False
+        launcher._procs = [dead, alive]
+        with mock.patch.object(launcher, "_spawn", side_effect=[RuntimeError("no start"), new]) as spawn, \
+                mock.patch("builtins.print"):
+            launcher._respawn_dead(backoff=0.05)
+            launcher._respawn_dead(backoff=0.05)
+            self.assertEqual(spawn.call_count, 1)
+            time.sleep(0.06)
+            launcher._respawn_dead(backoff=0.05)
+        self.assertEqual(launcher._procs, [new, alive])
+        self.assertEqual(launcher._respawn_at, {})
+
+
+class MetricsTests(SimpleTestCase):
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0.0
+
+    def requests(self, route, status, method="GET"):
+        return self.sample("chat_http_request_duration_seconds_count",
+                           route=route, method=method, status=status)
+
+    def test_requests_are_labelled_by_route_pattern(self):
+        before = self.requests("api/cache-stats/", "200"), self.requests("<unmatched>", "404")
+        self.client.get("/api/cache-stats/")
+        self.assertEqual(self.client.get("/api/no-such-view/").status_code, 404)
+        body = self.client.get("/api/metrics/").content.decode()
+        self.assertIn('chat_http_request_duration_seconds_count{method="GET",route="api/cache-stats/",status="200"}',
+                      body)
+        self.assertIn('route="<unmatched>"', body)
+        after = self.requests("api/cache-stats/", "200"), self.requests("<unmatched>", "404")
+        self.assertEqual((after[0] - before[0], after[1] - before[1]), (1, 1))
+
+    def test_errors_count_4xx_and_5xx_only(self):
+        def errors(route, status, method="GET"):
+            return self.sample("chat_http_request_errors_total", route=route, method=method, status=status)
+
+        before = (errors("api/cache-stats/", "200"), errors("<unmatched>", "404"),
+                  errors("api/send-text-async/", "400", "POST"))
+        self.client.get("/api/cache-stats/")
+        self.client.get("/api/no-such-view/")
+        self.client.post("/api/send-text-async/", "not json", content_type="application/json")
+        after = (errors("api/cache-stats/", "200"), errors("<unmatched>", "404"),
+                 errors("api/send-text-async/", "400", "POST"))
+        self.assertEqual([b - a for a, b in zip(before, after)], [0, 1, 1])
+
+    def test_in_flight_returns_to_zero(self):
+        def in_flight(route):
+            return self.sample("chat_http_requests_in_flight", route=route)
+
+        self.client.get("/api/cache-stats/")
+        self.assertEqual(in_flight("api/cache-stats/"), 0)
+
+        async def post():
+            return await AsyncClient().post("/api/send-text-async/", "not json",
+                                             content_type="application/json")
+
+        before = self.requests("api/send-text-async/", "400", "POST")
+        self.assertEqual(asyncio.run(post()).status_code, 400)
+        self.assertEqual(self.requests("api/send-text-async/", "400", "POST") - before, 1)
+        self.assertEqual(in_flight("api/send-text-async/"), 0)
+
+    def test_grpc_timer_labels_the_status_name(self):
+        def calls(code):
+            return self.sample("chat_grpc_client_duration_seconds_count",
+                               method="TimerTest", code=code, replica="a:1")
+
+        before = calls("OK"), calls("UNAVAILABLE"), calls("UNKNOWN")
+        with grpc_timer("TimerTest", "a:1"):
+            pass
+        with self.assertRaises(grpc.RpcError), grpc_timer("TimerTest", "a:1"):
+            raise StatusError(grpc.StatusCode.UNAVAILABLE)
+        with self.assertRaises(ValueError), grpc_timer("TimerTest", "a:1"):
+            raise ValueError("not an RPC error")
+        after = calls("OK"), calls("UNAVAILABLE"), calls("UNKNOWN")
+        self.assertEqual([b - a for a, b in zip(before, after)], [1, 1, 1])
+
+
+class ServerTimingTests(TestCase):
+
+    def set_language(self):
+        return self.client.post("/api/set-language/", {"username": "alice", "language": "fr"},
+                                content_type="application/json")
+
+    def test_header_reports_the_view_phases(self):
+        response = self.set_language()
+        self.assertEqual(response.status_code, 200)
+        entries = dict(entry.split(";dur=") for entry in response["Server-Timing"].split(", "))
+        self.assertEqual(list(entries), ["parse", "validate", "db", "render", "total"])
+        self.assertGreaterEqual(float(entries["total"]), sum(float(ms) for ms in list(entries.values())[:-1]))
+
+    @override_settings(CHAT_SERVER_TIMING={"ENABLED": False})
+    def test_disabled_leaves_the_header_out(self):
+        self.assertNotIn("Server-Timing", self.set_language())
+
+    @override_settings(CHAT_SERVER_TIMING={"ENABLED": True, "LOG": True})
+    def test_log_writes_one_json_line(self):
+        with self.assertLogs("apis.timing", "INFO") as logs:
+            self.set_language()
+        self.assertEqual(len(logs.records), 1)
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual((line["method"], line["path"], line["status"]), ("POST", "/api/set-language/", 200))
+        self.assertEqual(list(line["phases_ms"]), ["parse", "validate", "db", "render"])
+
+    def test_repeated_phase_adds_up(self):
+        # Seconds: timer start, then enter/exit of grpc, db, grpc
+        clock = [0.0, 0.001, 0.0025, 0.003, 0.00325, 0.004, 0.006]
+        with mock.patch("apis.timing.time.perf_counter", side_effect=clock):
+            timer, token = timing.start()
+            try:
+                for name in ("grpc", "db", "grpc"):
+                    with timing.phase(name):
+                        pass
+            finally:
+                timing.finish(token)
+        self.assertIsNone(timing.current())
+        self.assertEqual(timer.header(5.0), "grpc;dur=3.500, db;dur=0.250, total;dur=5.000")
+
+
+class CompressionTests(SimpleTestCase):
+
+    def context(self, *metadata):
+        context = mock.Mock()
+        context.invocation_metadata.return_value = metadata
+        return context
+
+    def tone(self, samples=40000):
+        """500 Hz at 16 kHz: a period of exactly 32 samples."""
+        return wav((np.sin(2 * np.pi * np.arange(samples) / 32) * 8000).astype(np.int16))
+
+    def test_small_payloads_are_not_compressed(self):
+        self.assertEqual(compression.choose(bytes(1000), "gzip", min_bytes=4096), grpc.Compression.NoCompression)
+        self.assertEqual(compression.choose(bytes(4096), "gzip", min_bytes=4096), grpc.Compression.Gzip)
+
+    def test_noise_is_not_compressed(self):
+        noise = np.random.default_rng(0).bytes(200_000)
+        self.assertGreater(compression.sample_ratio(noise), 0.9)
+        self.assertEqual(compression.choose(noise, "gzip", min_bytes=0), grpc.Compression.NoCompression)
+
+    def test_tone_and_silence_are_compressed(self):
+        for name, clip in (("tone", self.tone()), ("silence", wav(np.zeros(40000)))):
+            with self.subTest(name):
+                self.assertLess(compression.sample_ratio(clip), 0.5)
+                self.assertEqual(compression.choose(clip, "gzip", min_bytes=0), grpc.Compression.Gzip)
+        self.assertEqual(compression.choose(self.tone(), "deflate", min_bytes=0), grpc.Compression.Deflate)
+        self.assertEqual(compression.choose(self.tone(), "none", min_bytes=0), grpc.Compression.NoCompression)
+
+    def test_unknown_algorithm_is_an_error(self):
+        with self.assertRaises(ValueError):
+            compression.choose(b"data", "brotli")
+
+    def test_accepted_ignores_unknown_values(self):
+        key = compression.COMPRESSION_METADATA_KEY
+        self.assertEqual(compression.accepted(self.context((key, "deflate"))), "deflate")
+        self.assertEqual(compression.accepted(self.context((key, "brotli"))), "none")
+        self.assertEqual(compression.accepted(self.context(("other", "gzip"))), "none")
+        self.assertEqual(compression.accepted(self.context()), "none")
+
+    def test_service_compresses_as_the_caller_asks(self):
+        request = audio_pb2.AudioRequest(audio=self.tone(100_000))
+        for algorithm, expected in (("gzip", grpc.Compression.Gzip), ("none", grpc.Compression.NoCompression),
+                                    ("brotli", grpc.Compression.NoCompression)):
+            with self.subTest(algorithm):
+                context = self.context(*compression.request_metadata(algorithm))
+                AudioService().ProcessAudio(request, context)
+                context.set_compression.assert_called_once_with(expected)
+
+
+class ChannelManagerTests(SimpleTestCase):
+
+    def test_a_forked_child_opens_its_own_channels(self):
+        manager = channels.ChannelManager()
+        parent_channel = manager.get_channel("127.0.0.1:1")
+        parent_stub = manager.get_stub("127.0.0.1:1", translation_pb2_grpc.TranslationServiceStub)
+        with mock.patch.object(parent_channel, "close") as close, \
+                mock.patch("apis.grpc_client.channels.os.getpid", return_value=os.getpid() + 1):
+            child_channel = manager.get_channel("127.0.0.1:1")
+            child_stub = manager.get_stub("127.0.0.1:1", translation_pb2_grpc.TranslationServiceStub)
+            self.assertIs(manager.get_channel("127.0.0.1:1"), child_channel)
+        self.assertIsNot(child_channel, parent_channel)
+        self.assertIsNot(child_stub, parent_stub)
+        # The parent's connections are left alone
+        close.assert_not_called()
+        child_channel.close()
+        parent_channel.close()
+
+    def test_fork_hook_resets_the_pool_in_the_child(self):
+        if not hasattr(os, "register_at_fork"):
+            self.skipTest("needs os.fork")
+        # In a fresh interpreter: this one runs gRPC threads, and forking
+        # those is not safe. The child only inspects the pool.
+        script = (
+            "import os\n"
+            "from apis.grpc_client import channels\n"
+            "channels.get_channel('127.0.0.1:1')\n"
+            "pid = os.fork()\n"
+            "if pid == 0:\n"
+            "    manager = channels._manager\n"
+            "    os._exit(0 if manager._channels == {} and manager._pid == os.getpid() else 1)\n"
+            "child = os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1])\n"
+            "raise SystemExit(10 + child if channels._manager._channels else 2)\n"
+        )
+        result = subprocess.run([sys.executable, "-c", script], timeout=60,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        # 10: the parent kept its channel and the child started empty
+        self.assertEqual(result.returncode, 10)
+
+    def test_shutdown_closes_and_forgets_the_channels(self):
+        manager = channels.ChannelManager()
+        stub = manager.get_stub("127.0.0.1:1", translation_pb2_grpc.TranslationServiceStub)
+        with mock.patch.object(channels, "_manager", manager):
+            channels.shutdown()
+        self.assertEqual((manager._channels, manager._stubs), ({}, {}))
+        with self.assertRaises(ValueError):     # Cannot invoke RPC on closed channel
+            stub.TranslateText(translation_pb2.TextRequest(text="x"), timeout=1)
+        reopened = manager.get_stub("127.0.0.1:1", translation_pb2_grpc.TranslationServiceStub)
+        self.assertIsNot(reopened, stub)
+        manager.close()
+
+    def test_closed_loops_do_not_keep_their_aio_channels(self):
+        manager = channels.AioChannelManager()
+        dropped = []
+
+        async def use_a_channel():
+            dropped.append(weakref.ref(manager.get_channel("127.0.0.1:1")))
+            stub = manager.get_stub("127.0.0.1:1", translation_pb2_grpc.TranslationServiceStub)
+            self.assertIs(stub, manager.get_stub("127.0.0.1:1", translation_pb2_grpc.TranslationServiceStub))
+
+        for _ in range(5):
+            asyncio.run(use_a_channel())
+        # Only the last loop's pool is left until another loop needs one
+        self.assertEqual(len(manager._pools), 1)
+        self.assertEqual([ref() is None for ref in dropped], [True] * 4 + [False])
+
+
+class AsyncViewTests(TestCase):
+    """send-text-async and send-audio-async over grpc.aio against in-process servers."""
+
+    def setUp(self):
+        self.service = FakeTranslationService()
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+        translation_pb2_grpc.add_TranslationServiceServicer_to_server(self.service, server)
+        audio_pb2_grpc.add_AudioServiceServicer_to_server(AudioService(), server)
+        port = server.add_insecure_port("127.0.0.1:0")
+        server.start()
+        self.addCleanup(server.stop, None)
+        address = f"127.0.0.1:{port}"
+        for name, stub_class in (("translation", translation_pb2_grpc.TranslationServiceStub),
+                                 ("audio", audio_pb2_grpc.AudioServiceStub)):
+            client = resilience.ResilientClient(name, Balancer(name, address), stub_class, max_retries=0)
+            patcher = mock.patch.object(resilience, name, client)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(router.router, "policy", REMOTE)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_send_text_async(self):
+        response = await self.async_client.post(
+            "/api/send-text-async/",
+            {"sender": "alice", "receiver": "bob", "text": "async hello", "target_language": "fr"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body["translated_text"], body["route"]), ("ASYNC HELLO", REMOTE))
+        self.assertEqual(self.service.calls, 1)
+        message = await ChatMessage.objects.aget()
+        self.assertEqual((message.receiver, message.translated_message), ("bob", "ASYNC HELLO"))
+
+    async def test_send_audio_async(self):
+        tone = (np.sin(np.arange(1600) / 5) * 8000).astype(np.int16)
+        clip = wav(np.repeat(tone, 2), rate=8000, channels=2)
+        response = await self.async_client.post(
+            "/api/send-audio-async/",
+            {"sender": "alice", "receiver": "bob", "audio": base64.b64encode(clip).decode()},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body["route"], REMOTE)
+        self.assertEqual(base64.b64decode(body["processed_audio"]), audio_pipeline.process(clip))
+        message = await ChatMessage.objects.aget()
+        self.assertEqual(message.translated_message, f"audio-{body['processed_size_bytes']}-bytes")
+
+    async def test_malformed_clip_is_an_error_response(self):
+        response = await self.async_client.post(
+            "/api/send-audio-async/",
+            {"sender": "alice", "receiver": "bob", "audio": base64.b64encode(wav([1] * 4, rate=1)).decode()},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 500)
+        self.assertIn("error", response.json())
+        self.assertFalse(await ChatMessage.objects.aexists())
+
+
+class AioServerTests(SimpleTestCase):
+    """The grpc.aio servicers answer like the sync ones."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.pool = audio_server.create_process_pool(workers=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.shutdown()
+        super().tearDownClass()
+
+    def serve(self, module, stub_class, calls, **options):
+        """Run calls(stub) against module's aio server on its own event loop."""
+        async def scenario():
+            port = free_port()
+            server = module.create_aio_server(port=port, **options)
+            await server.start()
+            try:
+                async with grpc.aio.insecure_channel(f"127.0.0.1:{port}") as channel:
+                    return await calls(stub_class(channel))
+            finally:
+                await server.stop(None)
+
+        return asyncio.run(scenario())
+
+    def test_translation(self):
+        text = translation_pb2.TextRequest(text="good morning", language="fr")
+        batch = translation_pb2.BatchRequest(items=[text, translation_pb2.TextRequest(text="thank you", language="es")])
+
+        async def calls(stub):
+            return await stub.TranslateText(text), await stub.TranslateBatch(batch)
+
+        answer, batch_answer = self.serve(translation_server, translation_pb2_grpc.TranslationServiceStub, calls)
+        sync = translation_server.TranslationService()
+        self.assertEqual(answer, sync.TranslateText(text, None))
+        self.assertEqual(batch_answer, sync.TranslateBatch(batch, None))
+
+    def test_audio_inline_and_in_the_process_pool(self):
+        small = wav((np.sin(np.arange(1600) / 5) * 8000).astype(np.int16), rate=8000)
+        large = wav((np.sin(np.arange(200_000) / 7) * 8000).astype(np.int16))
+        self.assertLess(len(small), audio_server.AUDIO_OFFLOAD_THRESHOLD)
+        self.assertGreaterEqual(len(large), audio_server.AUDIO_OFFLOAD_THRESHOLD)
+        requests = [audio_pb2.AudioRequest(audio=clip) for clip in (small, large)]
+
+        async def calls(stub):
+            unary = [await stub.ProcessAudio(request) for request in requests]
+            chunks = [audio_pb2.AudioChunk(data=large[i:i + 50_000]) for i in range(0, len(large), 50_000)]
+            streamed = b"".join([chunk.data async for chunk in stub.ProcessAudioStream(iter(chunks))])
+            return unary, streamed
+
+        with mock.patch.object(self.pool, "submit", wraps=self.pool.submit) as submit:
+            (small_answer, large_answer), streamed = self.serve(
+                audio_server, audio_pb2_grpc.AudioServiceStub, calls, executor=self.pool)
+        # Only the large clip (unary and streamed) went to the pool
+        self.assertEqual(submit.call_count, 2)
+        sync, context = AudioService(), mock.Mock(**{"invocation_metadata.return_value": ()})
+        for request, answer in zip(requests, (small_answer, large_answer)):
+            self.assertEqual(answer.audio, sync.ProcessAudio(request, context).audio)
+        self.assertEqual(streamed, large_answer.audio)
+
+    def test_malformed_clip_is_invalid_argument(self):
+        bad = wav([1] * 4, rate=1)
+        padded = wav([1] * 200_000, rate=1)
+
+        async def calls(stub):
+            codes = []
+            for clip in (bad, padded):
+                try:
+                    await stub.ProcessAudio(audio_pb2.AudioRequest(audio=clip))
+                except grpc.aio.AioRpcError as error:
+                    codes.append(error.code())
+            return codes
+
+        codes = self.serve(audio_server, audio_pb2_grpc.AudioServiceStub, calls, executor=self.pool)
+        self.assertEqual(codes, [grpc.StatusCode.INVALID_ARGUMENT] * 2)
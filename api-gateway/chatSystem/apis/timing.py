@@ -0,0 +1,103 @@
+"""
+Per-request phase timing, reported in a Server-Timing header.
+
+ServerTimingMiddleware (apis/middleware.py) starts a PhaseTimer for every
+request and keeps it in a context variable, so code below the views (the
+gRPC clients, the router, persistence) can time its steps with
+`with phase("grpc"):` without the request being passed down. The
+response then carries, for example
+
+    Server-Timing: parse;dur=0.210, validate;dur=0.045,
+        b64decode;dur=1.302, grpc;dur=10.871, b64encode;dur=1.950,
+        db;dur=0.804, render;dur=2.513, total;dur=18.112
+
+in milliseconds. The phases are
+    parse       request body parsing (DRF parsers / json.loads)
+    validate    serializer validation
+    b64decode   base64 decode of an audio clip
+    grpc        gRPC calls (not made on a cache hit)
+    local       in-process engine work, when the router picks that path
+    b64encode   base64 encode of the processed clip
+    db          ChatMessage / UserProfile writes and history queries
+    render      response rendering (DRF renderers, JsonResponse)
+    total       from the middleware to a rendered response
+A phase entered more than once adds up. Time not covered by a phase is
+framework overhead (middleware, routing, content negotiation, cache
+lookups).
+
+The cost is two perf_counter() calls and a dict update per phase, so it
+can stay on in production. With CHAT_SERVER_TIMING['LOG'] every request
+also writes one JSON line to the "apis.timing" logger.
+"""
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar
+
+
+_current = ContextVar("phase_timer", default=None)
+_NO_TIMER = nullcontext()
+
+
+class _Phase:
+    __slots__ = ("timer", "name", "start")
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.timer.add(self.name, (time.perf_counter() - self.start) * 1000)
+        return False
+
+
+class PhaseTimer:
+
+    __slots__ = ("start", "durations")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.durations = {}      # phase -> ms, in first-seen order
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    def add(self, name, ms):
+        self.durations[name] = self.durations.get(name, 0.0) + ms
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.start) * 1000
+
+    def header(self, total_ms):
+        parts = [f"{name};dur={ms:.3f}" for name, ms in self.durations.items()]
+        parts.append(f"total;dur={total_ms:.3f}")
+        return ", ".join(parts)
+
+
+def start():
+    """
+    Start timing the current request.
+
+    Returns:
+        (timer, token for finish())
+    """
+    timer = PhaseTimer()
+    return timer, _current.set(timer)
+
+
+def finish(token):
+    _current.reset(token)
+
+
+def current():
+    """The current request's PhaseTimer, or None."""
+    return _current.get()
+
+
+def phase(name):
+    """Context manager timing one phase; a no-op outside a timed request."""
+    timer = _current.get()
+    return _NO_TIMER if timer is None else timer.phase(name)
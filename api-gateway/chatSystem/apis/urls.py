@@ -4,8 +4,19 @@ from . import views
 urlpatterns = [
     path('set-language/', views.set_language),
     path('send-text/', views.send_text),
+    path('send-text-batch/', views.send_text_batch),
     path('send-audio/', views.send_audio),
     path('history/', views.chat_history),
+    path('cache-stats/', views.cache_stats),
+    path('write-behind-stats/', views.write_behind_stats),
+    path('routing-stats/', views.routing_stats),
+    path('balancer-stats/', views.balancer_stats),
+    path('resilience-stats/', views.resilience_stats),
+    path('push-stats/', views.push_stats),
+    path('metrics/', views.metrics),
     path('send-text-rest/', views.send_text_rest_only),
     path('send-audio-rest/', views.send_audio_rest_only),
+    path('send-text-async/', views.send_text_async),
+    path('send-audio-async/', views.send_audio_async),
+    path('history-async/', views.chat_history_async),
 ]
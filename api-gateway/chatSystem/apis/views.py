@@ -1,29 +1,83 @@
+import re
 import time
+import json
 import base64
-from rest_framework.decorators import api_view
+import itertools
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.decorators import api_view, parser_classes, renderer_classes
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework import status
 
 from .models import UserProfile, ChatMessage
 from .serializers import (
     UserProfileSerializer,
     SendTextSerializer,
+    MAX_TEXT_BATCH,
     SendAudioSerializer,
-    ChatMessageSerializer
+    SendAudioUploadSerializer,
+    ChatMessageSerializer,
+    ChatHistoryQuerySerializer
 )
-from .grpc_client.translate_client import translate_text
-from .grpc_client.audio_client import process_audio
+from . import metrics as gateway_metrics
+from . import push
+from .timing import phase
+from .pagination import filter_history, page_queryset, build_page
+from .persistence import (
+    write_behind,
+    save_chat_message,
+    save_chat_messages,
+    asave_chat_message
+)
+from .parsers import OctetStreamParser
+from .renderers import OctetStreamRenderer
+from .grpc_client.audio_client import process_audio_stream
+from .grpc_client.router import (
+    router,
+    translate,
+    translate_many,
+    translate_async,
+    process_audio,
+    process_audio_async
+)
+from .grpc_client.cache import translation_cache
+from .grpc_client import balancer, resilience
+from .grpc_client.config import AUDIO_CHUNK_SIZE, AUDIO_STREAM_THRESHOLD
+
+
+_BASE64_RE = re.compile(r"[A-Za-z0-9+/]*={0,2}")
+
+
+# Phase timing helpers (apis/timing.py)
+
+def _parse(request):
+    """request.data, timed: DRF parses the body on first access."""
+    with phase("parse"):
+        return request.data
+
+
+def _is_valid(serializer):
+    with phase("validate"):
+        return serializer.is_valid()
+
+
+def _render_json(data, **kwargs):
+    with phase("render"):
+        return JsonResponse(data, **kwargs)
 
 
 
 @api_view(['POST'])
 def set_language(request):
-    serializer = UserProfileSerializer(data=request.data)
-    if serializer.is_valid():
-        user, _ = UserProfile.objects.update_or_create(
-            username=serializer.validated_data['username'],
-            defaults={'language': serializer.validated_data['language']}
-        )
+    serializer = UserProfileSerializer(data=_parse(request))
+    if _is_valid(serializer):
+        with phase("db"):
+            user, _ = UserProfile.objects.update_or_create(
+                username=serializer.validated_data['username'],
+                defaults={'language': serializer.validated_data['language']}
+            )
         return Response(
             {"message": "Language set successfully"},
             status=status.HTTP_200_OK
@@ -34,20 +88,20 @@ def set_language(request):
 
 @api_view(['POST'])
 def send_text(request):
-    serializer = SendTextSerializer(data=request.data)
-    if not serializer.is_valid():
+    serializer = SendTextSerializer(data=_parse(request))
+    if not _is_valid(serializer):
         return Response(serializer.errors, status=400)
 
     start_time = time.perf_counter()
 
-    translated = translate_text(
+    translated, route = translate(
         serializer.validated_data['text'],
         serializer.validated_data['target_language']
     )
 
     end_time = time.perf_counter()
 
-    chat = ChatMessage.objects.create(
+    save_chat_message(
         sender=serializer.validated_data['sender'],
         receiver=serializer.validated_data['receiver'],
         message_type="text",
@@ -58,33 +112,149 @@ def send_text(request):
     return Response({
         "translated_text": translated,
         "response_time_ms": (end_time - start_time) * 1000,
-        "payload_size_bytes": len(translated.encode())
+        "payload_size_bytes": len(translated.encode()),
+        "route": route
+    })
+
+
+@api_view(['POST'])
+def send_text_batch(request):
+    """
+    Translate and store a list of up to MAX_TEXT_BATCH text messages with
+    one gRPC call and a single bulk insert.
+    """
+    serializer = SendTextSerializer(data=_parse(request), many=True, max_length=MAX_TEXT_BATCH)
+    if not _is_valid(serializer):
+        return Response(serializer.errors, status=400)
+
+    messages = serializer.validated_data
+    if not messages:
+        return Response({
+            "translated_texts": [],
+            "count": 0,
+            "response_time_ms": 0.0,
+            "payload_size_bytes": 0,
+            "route": None
+        })
+
+    start_time = time.perf_counter()
+
+    translations, route = translate_many(
+        [(m['text'], m['target_language']) for m in messages]
+    )
+
+    end_time = time.perf_counter()
+
+    save_chat_messages([
+        ChatMessage(
+            sender=m['sender'],
+            receiver=m['receiver'],
+            message_type="text",
+            original_message=m['text'],
+            translated_message=translated
+        )
+        for m, translated in zip(messages, translations)
+    ])
+
+    return Response({
+        "translated_texts": translations,
+        "count": len(translations),
+        "response_time_ms": (end_time - start_time) * 1000,
+        "payload_size_bytes": sum(len(t.encode()) for t in translations),
+        "route": route
     })
 
 
 @api_view(['POST'])
+@parser_classes(api_settings.DEFAULT_PARSER_CLASSES + [OctetStreamParser])
+@renderer_classes(api_settings.DEFAULT_RENDERER_CLASSES + [OctetStreamRenderer])
 def send_audio(request):
-    serializer = SendAudioSerializer(data=request.data)
-    if not serializer.is_valid():
+    """
+    Process an audio clip through the Audio gRPC service.
+
+    The clip can be sent as base64 inside JSON, or as binary: a raw
+    application/octet-stream body or a multipart "audio" file, with
+    sender/receiver in X-Sender/X-Receiver headers or form fields.
+    With "Accept: application/octet-stream" the processed audio is
+    returned as the raw response body and the metadata as X- headers;
+    a streamed clip is sent as it arrives, without Content-Length or
+    X-Processed-Size-Bytes, and stored once the service has returned all
+    of it, even if the client goes away first. A service failure after
+    the first chunk aborts the response, so the client sees a truncated
+    body rather than a complete one. Errors are always JSON.
+
+    Clips above AUDIO_STREAM_THRESHOLD go through ProcessAudioStream, so
+    the gateway never holds a decoded base64 clip or a full-size protobuf
+    message. A binary upload with a binary response holds a few chunks
+    at a time. A JSON request still holds its whole body, and a JSON
+    response its whole base64 result: about 4/3 of the input and of the
+    output clip. The audio service buffers each streamed clip whole,
+    since the gain and the WAV header depend on all of it.
+    """
+    binary_upload = _is_binary_upload(request)
+    if binary_upload:
+        serializer = SendAudioUploadSerializer(data=_audio_upload_fields(request))
+    else:
+        serializer = SendAudioSerializer(data=_parse(request))
+    if not _is_valid(serializer):
         return Response(serializer.errors, status=400)
+    if binary_upload:
+        error = _audio_upload_error(request)
+        if error:
+            return Response({"audio": [error]}, status=400)
+
+    binary_response = isinstance(request.accepted_renderer, OctetStreamRenderer)
 
     start_time = time.perf_counter()
 
-    # Convert base64 audio string to bytes
+    # Clips large enough to stream always go to the Audio service
+    route = "remote"
     try:
-        audio_data = serializer.validated_data['audio']
-        # If it's base64 encoded, decode it; otherwise use as is
-        try:
-            audio_bytes = base64.b64decode(audio_data)
-        except:
-            audio_bytes = audio_data.encode()
-        
-        # Process audio through gRPC service
-        processed_audio_bytes = process_audio(audio_bytes)
-        
-        # Convert back to base64 for response
-        processed_audio_b64 = base64.b64encode(processed_audio_bytes).decode()
-        
+        if binary_upload:
+            # Raw bytes: no base64 at all, read the body in chunks
+            original_size, audio_chunks = _audio_upload_chunks(request)
+            if original_size > AUDIO_STREAM_THRESHOLD:
+                processed_chunks = process_audio_stream(audio_chunks)
+            else:
+                processed_audio, route = process_audio(b"".join(audio_chunks))
+                processed_chunks = [processed_audio]
+        else:
+            # Convert base64 audio string to bytes
+            audio_data = serializer.validated_data['audio']
+
+            if _should_stream_audio(audio_data):
+                # Large clip: decode and process chunk by chunk over the
+                # streaming RPC so the whole decoded clip is never buffered
+                original_size = _base64_decoded_size(audio_data)
+                processed_chunks = process_audio_stream(_b64decode_chunks(audio_data))
+            else:
+                # If it's base64 encoded, decode it; otherwise use as is
+                try:
+                    with phase("b64decode"):
+                        audio_bytes = base64.b64decode(audio_data)
+                except:
+                    audio_bytes = audio_data.encode()
+
+                # Process audio in-process or through the gRPC service
+                original_size = len(audio_bytes)
+                processed_audio, route = process_audio(audio_bytes)
+                processed_chunks = [processed_audio]
+
+        if binary_response:
+            if isinstance(processed_chunks, list):
+                processed_size = sum(len(chunk) for chunk in processed_chunks)
+            else:
+                # Streamed clip: its size is known once it has been sent.
+                # The first chunk is awaited here so a failed call still
+                # gets an error response.
+                processed_chunks = _peek(processed_chunks)
+                processed_size = None
+        else:
+            # Convert back to base64 for response (a streamed clip is
+            # encoded as chunks arrive, so this overlaps the grpc phase)
+            with phase("b64encode"):
+                processed_audio_b64, processed_size = _b64encode_chunks(processed_chunks)
+
     except Exception as e:
         return Response(
             {"error": f"Audio processing failed: {str(e)}"}, 
@@ -93,29 +263,235 @@ def send_audio(request):
 
     end_time = time.perf_counter()
 
-    ChatMessage.objects.create(
-        sender=serializer.validated_data['sender'],
-        receiver=serializer.validated_data['receiver'],
-        message_type="audio",
-        original_message=f"audio-{len(audio_bytes)}-bytes",
-        translated_message=f"audio-{len(processed_audio_bytes)}-bytes"
-    )
+    def save(processed_size):
+        save_chat_message(
+            sender=serializer.validated_data['sender'],
+            receiver=serializer.validated_data['receiver'],
+            message_type="audio",
+            original_message=f"audio-{original_size}-bytes",
+            translated_message=f"audio-{processed_size}-bytes"
+        )
+
+    if binary_response:
+        if processed_size is None:
+            # No Content-Length: the body is sent as it is processed
+            response = StreamingHttpResponse(
+                _stream_then_save(processed_chunks, save),
+                content_type=OctetStreamRenderer.media_type
+            )
+        else:
+            save(processed_size)
+            response = StreamingHttpResponse(
+                processed_chunks, content_type=OctetStreamRenderer.media_type
+            )
+            response["Content-Length"] = processed_size
+            response["X-Processed-Size-Bytes"] = processed_size
+        response["X-Response-Time-Ms"] = f"{(end_time - start_time) * 1000:.3f}"
+        response["X-Original-Size-Bytes"] = original_size
+        response["X-Route"] = route
+        return response
+
+    save(processed_size)
 
     return Response({
         "message": "Audio processed successfully",
         "processed_audio": processed_audio_b64,
         "response_time_ms": (end_time - start_time) * 1000,
-        "original_size_bytes": len(audio_bytes),
-        "processed_size_bytes": len(processed_audio_bytes)
+        "original_size_bytes": original_size,
+        "processed_size_bytes": processed_size,
+        "route": route
     })
 
 
+def _is_binary_upload(request):
+    media_type = request.content_type.split(";")[0].strip()
+    return media_type in (OctetStreamParser.media_type, "multipart/form-data")
+
+
+def _audio_upload_error(request):
+    """Why a binary upload carries no audio, or None."""
+    if request.content_type.startswith("multipart/"):
+        if "audio" not in request.data:
+            return "No audio file was submitted."
+        size = request.data["audio"].size
+    else:
+        size = int(request.META.get("CONTENT_LENGTH") or 0)
+    return None if size else "The submitted file is empty."
+
+
+def _audio_upload_fields(request):
+    """sender/receiver for binary uploads: form fields first, then headers."""
+    form = request.data if request.content_type.startswith("multipart/") else {}
+    fields = {
+        "sender": form.get("sender") or request.headers.get("X-Sender"),
+        "receiver": form.get("receiver") or request.headers.get("X-Receiver"),
+    }
+    return {name: value for name, value in fields.items() if value is not None}
+
+
+def _audio_upload_chunks(request):
+    """
+    Chunked reader for a binary upload.
+
+    Returns:
+        (size in bytes, iterator of byte chunks)
+    """
+    if request.content_type.startswith("multipart/"):
+        upload = request.data["audio"]
+        return upload.size, upload.chunks(AUDIO_CHUNK_SIZE)
+
+    # Django only exposes CONTENT_LENGTH bytes of the body, so the size is
+    # always known up front; an empty body is never handed to the parser.
+    length = int(request.META.get("CONTENT_LENGTH") or 0)
+    if not length:
+        return 0, iter(())
+    stream = request.data
+    return length, iter(lambda: stream.read(AUDIO_CHUNK_SIZE), b"")
+
+
+def _peek(chunks):
+    """Fetch the first chunk now (raising any error) and chain the rest."""
+    chunks = iter(chunks)
+    first = next(chunks, None)
+    if first is None:
+        return iter(())
+    return itertools.chain((first,), chunks)
+
+
+def _stream_then_save(chunks, save):
+    """
+    Yield chunks, then save(total bytes) once the last one has arrived.
+
+    The save does not depend on the client: when it disconnects the rest
+    of the (already processed) clip is still read to be counted, and when
+    the service fails partway what arrived is saved and the error is
+    raised on, which makes the server abort the response.
+    """
+    chunks = iter(chunks)
+    total = 0
+    try:
+        for chunk in chunks:
+            total += len(chunk)
+            yield chunk
+    except GeneratorExit:
+        try:
+            for chunk in chunks:
+                total += len(chunk)
+        except Exception:
+            pass    # Save what arrived
+        raise
+    finally:
+        save(total)
+
+
+def _should_stream_audio(audio_data):
+    """Large, well-formed base64 payloads go through ProcessAudioStream."""
+    return (
+        len(audio_data) // 4 * 3 > AUDIO_STREAM_THRESHOLD
+        and len(audio_data) % 4 == 0
+        and _BASE64_RE.fullmatch(audio_data) is not None
+    )
+
+
+def _base64_decoded_size(audio_data):
+    return len(audio_data) // 4 * 3 - audio_data[-2:].count("=")
+
+
+def _b64decode_chunks(audio_data, chunk_size=AUDIO_CHUNK_SIZE):
+    """Decode a base64 string slice by slice into chunk_size byte chunks."""
+    # Slices must be whole 4-character groups to decode on their own
+    step = max(4, chunk_size // 3 * 4)
+    for i in range(0, len(audio_data), step):
+        yield base64.b64decode(audio_data[i:i + step])
+
+
+def _b64encode_chunks(chunks):
+    """
+    Base64 encode a stream of byte chunks of any size.
+
+    Returns:
+        (encoded string, total number of input bytes)
+    """
+    parts = []
+    total = 0
+    carry = b""
+    for chunk in chunks:
+        total += len(chunk)
+        data = carry + chunk
+        cut = len(data) - len(data) % 3
+        parts.append(base64.b64encode(data[:cut]).decode())
+        carry = data[cut:]
+    parts.append(base64.b64encode(carry).decode())
+    return "".join(parts), total
+
+
+@api_view(['GET'])
+def cache_stats(request):
+    """Hit/miss/eviction counters of the gateway translation cache."""
+    if translation_cache is None:
+        return Response({"enabled": False})
+    return Response({"enabled": True, **translation_cache.stats()})
+
+
+@api_view(['GET'])
+def write_behind_stats(request):
+    """Queue depth and flush latency of the write-behind persistence queue."""
+    if write_behind is None:
+        return Response({"enabled": False})
+    return Response({"enabled": True, **write_behind.stats()})
+
+
+@api_view(['GET'])
+def routing_stats(request):
+    """Local vs remote routing decisions and the latency of each path."""
+    return Response(router.stats())
+
+
+@api_view(['GET'])
+def balancer_stats(request):
+    """Health, calls in flight and latency of every service replica."""
+    return Response(balancer.stats())
+
+
+@api_view(['GET'])
+def push_stats(request):
+    """Open push connections and messages published to them."""
+    return Response(push.stats())
+
+
+@api_view(['GET'])
+def resilience_stats(request):
+    """Circuit breaker state, retries and hedges of each gRPC service."""
+    return Response(resilience.stats())
+
+
+@require_GET
+def metrics(request):
+    """Prometheus text exposition of the gateway metrics (apis/metrics.py)."""
+    body, content_type = gateway_metrics.exposition()
+    return HttpResponse(body, content_type=content_type)
+
 
 @api_view(['GET'])
 def chat_history(request):
-    messages = ChatMessage.objects.all().order_by('-timestamp')
+    """
+    One page of chat history, newest first.
+
+    Query params: limit (default 50, max 200), cursor (the next_cursor of
+    the previous page), and optional sender, receiver, message_type and
+    conversation ("alice,bob", messages in either direction) filters.
+    """
+    query = ChatHistoryQuerySerializer(data=request.query_params)
+    if not _is_valid(query):
+        return Response(query.errors, status=400)
+    params = query.validated_data
+
+    queryset = filter_history(ChatMessage.objects.all(), params)
+    with phase("db"):
+        rows = list(page_queryset(queryset, params))
+    messages, next_cursor = build_page(rows, params['limit'])
     serializer = ChatMessageSerializer(messages, many=True)
-    return Response(serializer.data)
+    return Response({"results": serializer.data, "next_cursor": next_cursor})
 
 
 # ============================================
@@ -128,8 +504,8 @@ def send_text_rest_only(request):
     REST-only text translation endpoint (no gRPC).
     Translation logic performed directly in REST API for performance comparison.
     """
-    serializer = SendTextSerializer(data=request.data)
-    if not serializer.is_valid():
+    serializer = SendTextSerializer(data=_parse(request))
+    if not _is_valid(serializer):
         return Response(serializer.errors, status=400)
 
     start_time = time.perf_counter()
@@ -138,17 +514,12 @@ def send_text_rest_only(request):
     text = serializer.validated_data['text']
     target_language = serializer.validated_data['target_language']
     
-    # Same translation mapping as gRPC service
-    translation_mapping = {
-        "ur": "ہیلو",
-        "fr": "Bonjour",
-        "es": "Hola"
-    }
-    translated = translation_mapping.get(target_language, text)
+    # Same engine as the gRPC service, forced onto the in-process path
+    translated, _ = translate(text, target_language, policy="local")
 
     end_time = time.perf_counter()
 
-    ChatMessage.objects.create(
+    save_chat_message(
         sender=serializer.validated_data['sender'],
         receiver=serializer.validated_data['receiver'],
         message_type="text",
@@ -170,8 +541,8 @@ def send_audio_rest_only(request):
     REST-only audio processing endpoint (no gRPC).
     Audio processing logic performed directly in REST API for performance comparison.
     """
-    serializer = SendAudioSerializer(data=request.data)
-    if not serializer.is_valid():
+    serializer = SendAudioSerializer(data=_parse(request))
+    if not _is_valid(serializer):
         return Response(serializer.errors, status=400)
 
     start_time = time.perf_counter()
@@ -181,16 +552,18 @@ def send_audio_rest_only(request):
         
         # Convert base64 audio string to bytes
         try:
-            audio_bytes = base64.b64decode(audio_data)
+            with phase("b64decode"):
+                audio_bytes = base64.b64decode(audio_data)
         except:
             audio_bytes = audio_data.encode()
         
-        # Audio processing logic done in REST (no gRPC call)
-        # Same processing as gRPC service: byte reversal
-        processed_audio_bytes = audio_bytes[::-1]
+        # Audio processing done in REST (no gRPC call): same engine as
+        # the gRPC service, forced onto the in-process path
+        processed_audio_bytes, _ = process_audio(audio_bytes, policy="local")
         
         # Convert back to base64 for response
-        processed_audio_b64 = base64.b64encode(processed_audio_bytes).decode()
+        with phase("b64encode"):
+            processed_audio_b64 = base64.b64encode(processed_audio_bytes).decode()
         
     except Exception as e:
         return Response(
@@ -200,7 +573,7 @@ def send_audio_rest_only(request):
 
     end_time = time.perf_counter()
 
-    ChatMessage.objects.create(
+    save_chat_message(
         sender=serializer.validated_data['sender'],
         receiver=serializer.validated_data['receiver'],
         message_type="audio",
@@ -216,3 +589,122 @@ def send_audio_rest_only(request):
         "processed_size_bytes": len(processed_audio_bytes),
         "method": "REST-only (no gRPC)"
     })
+
+
+# ============================================
+# ASYNC ENDPOINTS (ASGI - grpc.aio + async ORM)
+# ============================================
+# DRF's @api_view is synchronous, so these are plain Django async views.
+# Under ASGI (e.g. `uvicorn chatSystem.asgi:application`) they never block a
+# worker thread: the gRPC call and the ORM write are awaited on the event
+# loop, so one process can hold many in-flight requests.
+
+def _json_body(request):
+    try:
+        with phase("parse"):
+            return json.loads(request.body or b"{}")
+    except ValueError:
+        return None
+
+
+@csrf_exempt
+@require_POST
+async def send_text_async(request):
+    data = _json_body(request)
+    if data is None:
+        return JsonResponse({"detail": "JSON parse error"}, status=400)
+
+    serializer = SendTextSerializer(data=data)
+    if not _is_valid(serializer):
+        return JsonResponse(serializer.errors, status=400)
+
+    start_time = time.perf_counter()
+
+    translated, route = await translate_async(
+        serializer.validated_data['text'],
+        serializer.validated_data['target_language']
+    )
+
+    end_time = time.perf_counter()
+
+    await asave_chat_message(
+        sender=serializer.validated_data['sender'],
+        receiver=serializer.validated_data['receiver'],
+        message_type="text",
+        original_message=serializer.validated_data['text'],
+        translated_message=translated
+    )
+
+    return _render_json({
+        "translated_text": translated,
+        "response_time_ms": (end_time - start_time) * 1000,
+        "payload_size_bytes": len(translated.encode()),
+        "route": route
+    })
+
+
+@csrf_exempt
+@require_POST
+async def send_audio_async(request):
+    data = _json_body(request)
+    if data is None:
+        return JsonResponse({"detail": "JSON parse error"}, status=400)
+
+    serializer = SendAudioSerializer(data=data)
+    if not _is_valid(serializer):
+        return JsonResponse(serializer.errors, status=400)
+
+    start_time = time.perf_counter()
+
+    try:
+        audio_data = serializer.validated_data['audio']
+        try:
+            with phase("b64decode"):
+                audio_bytes = base64.b64decode(audio_data)
+        except:
+            audio_bytes = audio_data.encode()
+
+        processed_audio_bytes, route = await process_audio_async(audio_bytes)
+
+        with phase("b64encode"):
+            processed_audio_b64 = base64.b64encode(processed_audio_bytes).decode()
+
+    except Exception as e:
+        return JsonResponse(
+            {"error": f"Audio processing failed: {str(e)}"},
+            status=500
+        )
+
+    end_time = time.perf_counter()
+
+    await asave_chat_message(
+        sender=serializer.validated_data['sender'],
+        receiver=serializer.validated_data['receiver'],
+        message_type="audio",
+        original_message=f"audio-{len(audio_bytes)}-bytes",
+        translated_message=f"audio-{len(processed_audio_bytes)}-bytes"
+    )
+
+    return _render_json({
+        "message": "Audio processed successfully",
+        "processed_audio": processed_audio_b64,
+        "response_time_ms": (end_time - start_time) * 1000,
+        "original_size_bytes": len(audio_bytes),
+        "processed_size_bytes": len(processed_audio_bytes),
+        "route": route
+    })
+
+
+@require_GET
+async def chat_history_async(request):
+    query = ChatHistoryQuerySerializer(data=request.GET)
+    if not _is_valid(query):
+        return JsonResponse(query.errors, status=400)
+    params = query.validated_data
+
+    queryset = filter_history(ChatMessage.objects.all(), params)
+    with phase("db"):
+        rows = [message async for message in page_queryset(queryset, params)]
+    messages, next_cursor = build_page(rows, params['limit'])
+    serializer = ChatMessageSerializer(messages, many=True)
+    return _render_json({"results": serializer.data, "next_cursor": next_cursor})
@@ -3,14 +3,46 @@ ASGI config for chatSystem project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with an ASGI server to run the async endpoints (send-text-async,
+send-audio-async, history-async) on the event loop, e.g.:
+
+    uvicorn chatSystem.asgi:application
+
+The push endpoint /api/stream/<receiver>/ (server-sent events or
+WebSocket, apis/push.py) is served here in front of Django. Its default
+hub (InMemoryHub) delivers within one process: with several workers, a
+message only reaches receivers connected to the worker that stored it.
+So keep the single worker above while push is enabled, or switch
+CHAT_PUSH['BACKEND'] to a cross-process hub (or set CHAT_PUSH=0) before
+scaling out:
+
+    WEB_CONCURRENCY=4 uvicorn chatSystem.asgi:application
+
+Set the worker count through WEB_CONCURRENCY (uvicorn and gunicorn both
+read it) so that this module can log a warning at startup when it is
+combined with the in-memory hub.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
 
+import logging
 import os
 
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'chatSystem.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from apis import push  # noqa: E402  (needs the app registry)
+
+if isinstance(push.hub, push.InMemoryHub) and int(os.environ.get('WEB_CONCURRENCY') or 1) > 1:
+    logging.getLogger(__name__).warning(
+        "CHAT_PUSH uses InMemoryHub with WEB_CONCURRENCY=%s workers: pushed "
+        "messages only reach receivers connected to the worker that stored "
+        "them. Run a single worker or a cross-process hub backend.",
+        os.environ['WEB_CONCURRENCY'],
+    )
+
+application = push.PushApplication(django_application)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,6 +43,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'apis.middleware.MetricsMiddleware',
+    'apis.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -81,6 +84,90 @@ DATABASES = {
     }
 }
 
+# Select with CHAT_DB_PROFILE=production. The default profile is Django's
+# stock SQLite setup; "production" tunes every new connection for
+# concurrent readers and writers and keeps connections open between
+# requests instead of reconnecting each time:
+#   - WAL: readers no longer block the writer (and vice versa)
+#   - synchronous=NORMAL: fsync on checkpoint, not on every commit (safe in WAL)
+#   - busy_timeout: wait for the write lock instead of failing with
+#     "database is locked"; IMMEDIATE transactions take the lock up front
+#     so two writers can't deadlock upgrading from a read lock
+#   - mmap_size / cache_size: serve hot pages from memory
+DB_PROFILE = os.environ.get('CHAT_DB_PROFILE', 'default')
+
+SQLITE_PRODUCTION_PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA busy_timeout=5000',
+    'PRAGMA mmap_size=268435456',   # 256 MiB
+    'PRAGMA cache_size=-65536',     # 64 MiB
+    'PRAGMA temp_store=MEMORY',
+]
+
+if DB_PROFILE == 'production':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': 5,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': '; '.join(SQLITE_PRODUCTION_PRAGMAS),
+        },
+    })
+
+
+# Audio clips arrive base64 encoded inside JSON, so allow request bodies well
+# beyond Django's 2.5 MB default. Large clips are streamed to the audio service.
+DATA_UPLOAD_MAX_MEMORY_SIZE = 64 * 1024 * 1024
+
+
+# Write-behind persistence of ChatMessage rows (apis/persistence.py).
+# When enabled, views enqueue rows and a background thread commits them with
+# bulk_create every BATCH_SIZE rows or FLUSH_INTERVAL seconds. A full queue
+# blocks the request for up to PUT_TIMEOUT seconds, then writes synchronously.
+# Rows that fail to write are retried after RETRY_BACKOFF seconds, doubling
+# up to RETRY_BACKOFF_MAX.
+CHAT_WRITE_BEHIND = {
+    'ENABLED': os.environ.get('CHAT_WRITE_BEHIND', '0') == '1',
+    'BATCH_SIZE': 500,
+    'FLUSH_INTERVAL': 0.05,
+    'MAX_QUEUE': 10000,
+    'PUT_TIMEOUT': 1.0,
+    'RETRY_BACKOFF': 0.1,
+    'RETRY_BACKOFF_MAX': 5.0,
+}
+
+
+# Server-Timing phase breakdown on every response (apis/timing.py); with
+# LOG, also one JSON line per request on the "apis.timing" logger.
+CHAT_SERVER_TIMING = {
+    'ENABLED': os.environ.get('CHAT_SERVER_TIMING', '1') == '1',
+    'LOG': os.environ.get('CHAT_SERVER_TIMING_LOG', '0') == '1',
+}
+
+# Push delivery of new messages to /api/stream/<receiver>/ (apis/push.py).
+# BACKEND is the hub class: InMemoryHub reaches the connections of one
+# process. Each connection queues at most QUEUE_SIZE messages before it
+# is dropped as too slow; SSE streams get a keep-alive every HEARTBEAT s.
+CHAT_PUSH = {
+    'ENABLED': os.environ.get('CHAT_PUSH', '1') == '1',
+    'BACKEND': 'apis.push.InMemoryHub',
+    'QUEUE_SIZE': 100,
+    'HEARTBEAT': 15.0,
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'apis.timing': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -0,0 +1,235 @@
+"""
+Asyncio Load Generator for Chat Users
+Simulates thousands of concurrent chat users in one process: every user
+is a coroutine, all of them share one aiohttp session with a bounded pool
+of keep-alive connections. The mix of requests (text, audio clips of
+several lengths, history polling) comes from a JSON scenario file, see
+benchmarks/scenarios/chat_mix.json.
+
+Each user follows its own schedule: the next request is due an
+exponentially distributed think time after the previous one was *due*,
+not after it completed. A slow response therefore does not thin out the
+load; latency is measured from the due time, so waiting for a
+connection or for the server counts (no coordinated omission).
+
+Event-loop lag is sampled throughout the run. If it is high, the
+generator itself is saturated and the numbers describe the client, not
+the server.
+
+Usage:
+    python benchmarks/async_load_generator.py [scenario.json] [--users N]
+        [--duration S] [--out results.json]
+
+The JSON output uses the same layout as latency_harness.py, so two runs
+can be diffed with `python benchmarks/latency_harness.py compare`.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+from datetime import datetime
+
+import aiohttp
+
+from latency_harness import Histogram, make_wav_b64, git_revision, PERCENTILES
+
+
+DEFAULT_SCENARIO = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "scenarios", "chat_mix.json")
+
+
+def fill(template, values):
+    """Substitute {user}, {peer}, {n}, {audio} in every string of a JSON value"""
+    if isinstance(template, str):
+        if template == "{audio}":
+            return values["audio"]
+        return template.format_map(values)
+    if isinstance(template, dict):
+        return {key: fill(value, values) for key, value in template.items()}
+    if isinstance(template, list):
+        return [fill(value, values) for value in template]
+    return template
+
+
+class LoadGenerator:
+
+    def __init__(self, config):
+        self.config = config
+        self.base_url = config["base_url"].rstrip("/")
+        self.users = config["users"]
+        self.scenarios = config["scenarios"]
+        self.weights = [scenario["weight"] for scenario in self.scenarios]
+        self.histograms = {scenario["name"]: Histogram() for scenario in self.scenarios}
+        self.errors = {scenario["name"]: {} for scenario in self.scenarios}
+        self.audio = {
+            seconds: make_wav_b64(seconds)
+            for seconds in {s["audio_seconds"] for s in self.scenarios if "audio_seconds" in s}
+        }
+        self.sequence = itertools.count()
+        self.loop_lag = Histogram()
+
+    def _request(self, scenario, user, peer):
+        values = {
+            "user": user,
+            "peer": peer,
+            "n": next(self.sequence),
+            "audio": self.audio.get(scenario.get("audio_seconds")),
+        }
+        request = {"method": scenario["method"], "url": self.base_url + scenario["path"]}
+        if "json" in scenario:
+            request["json"] = fill(scenario["json"], values)
+        if "params" in scenario:
+            request["params"] = fill(scenario["params"], values)
+        return request
+
+    async def user(self, session, user_id, start, measure_from, end):
+        loop = asyncio.get_running_loop()
+        rng = random.Random(user_id)
+        think = self.config["think_time_seconds"]
+        # Users join evenly over the ramp-up, each at a random phase
+        due = start + self.config["ramp_up_seconds"] * user_id / self.users + rng.uniform(0, think)
+        while due < end:
+            delay = due - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            scenario = rng.choices(self.scenarios, self.weights)[0]
+            peer = rng.randrange(self.users)
+            error = None
+            try:
+                async with session.request(**self._request(scenario, user_id, peer)) as response:
+                    await response.read()
+                    if response.status != 200:
+                        error = f"HTTP {response.status}"
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = type(e).__name__
+            if due >= measure_from:
+                if error is None:
+                    self.histograms[scenario["name"]].record((loop.time() - due) * 1e6)
+                else:
+                    errors = self.errors[scenario["name"]]
+                    errors[error] = errors.get(error, 0) + 1
+            due += rng.expovariate(1.0 / think)
+
+    async def monitor_lag(self, end, interval=0.05):
+        loop = asyncio.get_running_loop()
+        while loop.time() < end:
+            expected = loop.time() + interval
+            await asyncio.sleep(interval)
+            self.loop_lag.record((loop.time() - expected) * 1e6)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        connector = aiohttp.TCPConnector(limit=self.config["connections"], keepalive_timeout=60)
+        timeout = aiohttp.ClientTimeout(total=self.config["request_timeout_seconds"])
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            start = loop.time() + 0.5
+            measure_from = start + self.config["ramp_up_seconds"] + self.config["warmup_seconds"]
+            end = measure_from + self.config["duration_seconds"]
+            tasks = [
+                asyncio.create_task(self.user(session, user_id, start, measure_from, end))
+                for user_id in range(self.users)
+            ]
+            tasks.append(asyncio.create_task(self.monitor_lag(end)))
+            await asyncio.gather(*tasks)
+            return loop.time() - measure_from
+
+
+def raise_fd_limit():
+    """Allow as many sockets as the hard limit permits"""
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ImportError, ValueError, OSError):
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Asyncio chat load generator")
+    parser.add_argument("scenario", nargs="?", default=DEFAULT_SCENARIO)
+    parser.add_argument("--users", type=int)
+    parser.add_argument("--duration", type=float)
+    parser.add_argument("--think", type=float, help="mean think time in seconds")
+    parser.add_argument("--base-url")
+    parser.add_argument("--out", default="load_results.json")
+    args = parser.parse_args(argv)
+
+    with open(args.scenario) as f:
+        config = json.load(f)
+    for key, value in (("users", args.users), ("duration_seconds", args.duration),
+                       ("think_time_seconds", args.think), ("base_url", args.base_url)):
+        if value is not None:
+            config[key] = value
+
+    offered_rate = config["users"] / config["think_time_seconds"]
+    print("\n" + "=" * 70)
+    print("ASYNCIO CHAT LOAD GENERATOR")
+    print("=" * 70)
+    print(f"  - Scenario file: {args.scenario}")
+    print(f"  - Users: {config['users']}, think time {config['think_time_seconds']} s"
+          f" (~{offered_rate:.0f} req/s offered)")
+    print(f"  - Connections: {config['connections']}")
+    print(f"  - Ramp-up {config['ramp_up_seconds']} s, warm-up {config['warmup_seconds']} s,"
+          f" measured {config['duration_seconds']} s\n")
+
+    raise_fd_limit()
+    generator = LoadGenerator(config)
+    elapsed = asyncio.run(generator.run())
+
+    results = {}
+    for scenario in config["scenarios"]:
+        name = scenario["name"]
+        histogram = generator.histograms[name]
+        errors = generator.errors[name]
+        completed = histogram.total + sum(errors.values())
+        results[name] = {
+            "endpoint": name,
+            "achieved_rate": histogram.total / elapsed,
+            "requests": completed,
+            "successful": histogram.total,
+            "errors": errors,
+            "error_rate": sum(errors.values()) / completed if completed else 0.0,
+            "latency_ms": histogram.summary_ms(),
+            "histogram_us": histogram.to_json(),
+        }
+        latency = results[name]["latency_ms"]
+        print(f"  {name:<16} {results[name]['achieved_rate']:8.1f} req/s"
+              + "".join(f"  p{pct:g} {latency[f'p{pct:g}']:9.2f}" for pct in PERCENTILES)
+              + f"  errors {sum(errors.values())}")
+
+    lag = generator.loop_lag.summary_ms()
+    print(f"\n  Event-loop lag: p50 {lag['p50']:.2f} ms, p99 {lag['p99']:.2f} ms,"
+          f" max {lag['max']:.2f} ms")
+    if lag["p99"] > 50:
+        print("  ! The generator was saturated; run fewer users per process")
+
+    document = {
+        "meta": {
+            "generated": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+            "tool": "async_load_generator",
+            "scenario_file": args.scenario,
+            "base_url": config["base_url"],
+            "users": config["users"],
+            "rate": offered_rate,
+            "warmup_seconds": config["warmup_seconds"],
+            "duration_seconds": config["duration_seconds"],
+            "max_workers": config["connections"],
+            "event_loop_lag_ms": lag,
+            "host": platform.node(),
+            "cpu_count": os.cpu_count(),
+        },
+        "endpoints": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(document, f, indent=2)
+    print(f"\n✓ Results saved to: {args.out}\n")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
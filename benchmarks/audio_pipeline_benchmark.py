@@ -0,0 +1,98 @@
+"""
+Audio Pipeline Microbenchmark
+Times each stage of the PCM pipeline behind AudioService.ProcessAudio
+(apis/grpc_client/audio_pipeline.py) on synthetic 16-bit stereo WAV clips
+from 1 second to 10 minutes, in-process (no gRPC).
+
+Usage:
+    python benchmarks/audio_pipeline_benchmark.py [input_rate]
+"""
+
+import statistics
+import struct
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+# Configuration
+INPUT_RATE = int(sys.argv[1]) if len(sys.argv) > 1 else 44100
+CHANNELS = 2
+CLIP_SECONDS = [1, 10, 60, 300, 600]
+REPEAT = {1: 50, 10: 20, 60: 5, 300: 3, 600: 3}
+
+CHAT_SYSTEM_DIR = Path(__file__).resolve().parent.parent / "api-gateway" / "chatSystem"
+sys.path.insert(0, str(CHAT_SYSTEM_DIR))
+
+from apis.grpc_client import audio_pipeline
+from apis.grpc_client.config import AUDIO_SAMPLE_RATE
+
+
+def make_wav(seconds, rate=INPUT_RATE, channels=CHANNELS):
+    """Quiet 220 Hz tone with background noise and a silent second every 5 s"""
+    rng = np.random.default_rng(0)
+    t = np.arange(seconds * rate) / rate
+    signal = 0.2 * np.sin(2 * np.pi * 220 * t) * ((t % 5) < 4)
+    signal += rng.normal(0, 0.0005, len(t))
+    pcm = np.repeat((signal * 32767).astype("<i2")[:, None], channels, axis=1)
+    header = struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + pcm.nbytes, b"WAVE",
+        b"fmt ", 16, 1, channels, rate, rate * channels * 2, channels * 2, 16,
+        b"data", pcm.nbytes
+    )
+    return header + pcm.tobytes()
+
+
+def run_stages(data):
+    """One pass through the pipeline, returning per-stage times in ms"""
+    times = {}
+    start = time.perf_counter()
+
+    def lap(name):
+        nonlocal start
+        now = time.perf_counter()
+        times[name] = (now - start) * 1000
+        start = now
+
+    samples, rate = audio_pipeline.decode(data)
+    lap("decode")
+    signal = audio_pipeline.downmix(samples)
+    lap("downmix")
+    signal = audio_pipeline.resample(signal, rate)
+    lap("resample")
+    signal = audio_pipeline.normalize(signal)
+    lap("normalize")
+    signal = audio_pipeline.noise_gate(signal)
+    lap("gate")
+    audio_pipeline.encode(signal)
+    lap("encode")
+    return times
+
+
+def main():
+    print("\n" + "=" * 70)
+    print("AUDIO PIPELINE MICROBENCHMARK")
+    print("=" * 70)
+    print(f"  - Input: {CHANNELS} ch, {INPUT_RATE} Hz, 16-bit WAV")
+    print(f"  - Output: mono, {AUDIO_SAMPLE_RATE} Hz, 16-bit WAV\n")
+
+    stages = ["decode", "downmix", "resample", "normalize", "gate", "encode"]
+    print(f"  {'clip':>6} {'MB':>7} " + " ".join(f"{s:>9}" for s in stages)
+          + f" {'total ms':>9} {'x realtime':>11}")
+
+    for seconds in CLIP_SECONDS:
+        data = make_wav(seconds)
+        runs = [run_stages(data) for _ in range(REPEAT[seconds])]
+        medians = {s: statistics.median(r[s] for r in runs) for s in stages}
+        total = statistics.median(sum(r.values()) for r in runs)
+        print(f"  {seconds:>5}s {len(data) / 1e6:7.1f} "
+              + " ".join(f"{medians[s]:9.2f}" for s in stages)
+              + f" {total:9.2f} {seconds * 1000 / total:11.0f}")
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Audio Service Process Scaling Benchmark
+Starts the audio service through apis.grpc_client.launcher with 1..N worker
+processes and measures ProcessAudio throughput from several client
+processes (each with its own connection, so SO_REUSEPORT can spread them).
+
+Usage:
+    python benchmarks/audio_scaling_benchmark.py [max_workers]
+"""
+
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+
+# Configuration
+PORT = 50062
+MAX_WORKERS = int(sys.argv[1]) if len(sys.argv) > 1 else (os.cpu_count() or 1)
+CLIENT_PROCESSES = max(4, MAX_WORKERS * 2)
+CLIENT_THREADS = 4
+PAYLOAD_BYTES = 1024 * 1024
+DURATION_SECONDS = 10
+
+CHAT_SYSTEM_DIR = Path(__file__).resolve().parent.parent / "api-gateway" / "chatSystem"
+sys.path.insert(0, str(CHAT_SYSTEM_DIR))
+
+
+def client_process(deadline, counter):
+    """Drive ProcessAudio until the deadline on a private connection"""
+    import threading
+    import grpc
+    from apis.grpc_client import audio_pb2, audio_pb2_grpc
+
+    channel = grpc.insecure_channel(
+        f"localhost:{PORT}",
+        options=[
+            ("grpc.use_local_subchannel_pool", 1),
+            ("grpc.max_receive_message_length", 8 * 1024 * 1024),
+        ]
+    )
+    stub = audio_pb2_grpc.AudioServiceStub(channel)
+    request = audio_pb2.AudioRequest(audio=os.urandom(PAYLOAD_BYTES))
+
+    def loop():
+        done = 0
+        while time.time() < deadline:
+            stub.ProcessAudio(request)
+            done += 1
+        with counter.get_lock():
+            counter.value += done
+
+    threads = [threading.Thread(target=loop) for _ in range(CLIENT_THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    channel.close()
+
+
+def run(workers):
+    launcher = subprocess.Popen(
+        [sys.executable, "-m", "apis.grpc_client.launcher", "audio",
+         "--workers", str(workers), "--port", str(PORT)],
+        cwd=CHAT_SYSTEM_DIR,
+        stdout=subprocess.DEVNULL
+    )
+    try:
+        time.sleep(2 + workers * 0.5)
+        counter = multiprocessing.Value("i", 0)
+        deadline = time.time() + DURATION_SECONDS
+        clients = [
+            multiprocessing.Process(target=client_process, args=(deadline, counter))
+            for _ in range(CLIENT_PROCESSES)
+        ]
+        for c in clients:
+            c.start()
+        for c in clients:
+            c.join()
+        return counter.value / DURATION_SECONDS
+    finally:
+        launcher.send_signal(signal.SIGTERM)
+        launcher.wait()
+
+
+def main():
+    print("\n" + "=" * 70)
+    print("AUDIO SERVICE PROCESS SCALING BENCHMARK")
+    print("=" * 70)
+    print(f"  - Cores: {os.cpu_count()}")
+    print(f"  - Payload: {PAYLOAD_BYTES} bytes")
+    print(f"  - Clients: {CLIENT_PROCESSES} processes x {CLIENT_THREADS} threads\n")
+
+    baseline = None
+    workers = 1
+    while workers <= MAX_WORKERS:
+        rate = run(workers)
+        baseline = baseline or rate
+        print(f"  {workers:>3} worker(s): {rate:9.1f} clips/s"
+              f"   {rate * PAYLOAD_BYTES / 1e6:9.1f} MB/s"
+              f"   speedup x{rate / baseline:.2f}")
+        workers *= 2
+    print()
+
+
+if __name__ == "__main__":
+    main()
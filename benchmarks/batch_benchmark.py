@@ -0,0 +1,77 @@
+"""
+Batch Translation Throughput Benchmark
+Compares sending N queued messages one by one through /send-text/
+against sending them in batches through /send-text-batch/
+"""
+
+import requests
+import time
+from datetime import datetime
+
+
+# Configuration
+BASE_URL = "http://localhost:8000/api"
+NUM_MESSAGES = 200
+BATCH_SIZES = [10, 50, 200]
+
+
+def make_message(i):
+    return {
+        "sender": "bench",
+        "receiver": "server",
+        "text": f"Hello World, queued message {i}",
+        "target_language": "fr"
+    }
+
+
+def run_per_message(session, messages):
+    """Send every message with its own HTTP request (and RPC)"""
+    start = time.perf_counter()
+    for message in messages:
+        response = session.post(f"{BASE_URL}/send-text/", json=message, timeout=10)
+        response.raise_for_status()
+    return time.perf_counter() - start
+
+
+def run_batched(session, messages, batch_size):
+    """Send messages in batches of batch_size through /send-text-batch/"""
+    start = time.perf_counter()
+    for i in range(0, len(messages), batch_size):
+        response = session.post(
+            f"{BASE_URL}/send-text-batch/",
+            json=messages[i:i + batch_size],
+            timeout=30
+        )
+        response.raise_for_status()
+    return time.perf_counter() - start
+
+
+def report(label, elapsed, count):
+    print(f"  {label:<22} {elapsed * 1000:10.2f} ms   {count / elapsed:10.2f} msg/s")
+
+
+def main():
+    print("\n" + "=" * 70)
+    print("BATCH TRANSLATION BENCHMARK")
+    print("=" * 70)
+    print(f"Start Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"  - Messages: {NUM_MESSAGES}")
+    print(f"  - Batch sizes: {BATCH_SIZES}")
+    print(f"  - Target Server: {BASE_URL}\n")
+
+    messages = [make_message(i) for i in range(NUM_MESSAGES)]
+
+    with requests.Session() as session:
+        # Warm up connections and the gRPC channel
+        run_per_message(session, messages[:5])
+
+        report("per-message send-text", run_per_message(session, messages), NUM_MESSAGES)
+        for batch_size in BATCH_SIZES:
+            elapsed = run_batched(session, messages, batch_size)
+            report(f"batch of {batch_size}", elapsed, NUM_MESSAGES)
+
+    print()
+
+
+if __name__ == "__main__":
+    main()
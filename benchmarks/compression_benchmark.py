@@ -0,0 +1,315 @@
+"""
+Audio Compression Benchmark
+Measures what gzip/deflate message compression of ProcessAudio costs and
+saves (apis/grpc_client/compression.py): bytes on the wire in each
+direction, latency, and CPU time of the caller and of the audio service,
+across clip sizes and three kinds of content
+    tone      220 Hz tone with pauses and a little noise (a voice memo)
+    sparse    short bursts of tone between long near-silent gaps
+    noise     white noise, practically incompressible
+and four modes
+    none      no compression
+    gzip      always gzip, both directions
+    deflate   always deflate, both directions
+    adaptive  per message, as the gateway does (size threshold and a
+              compressibility sample; AUDIO_COMPRESSION_* settings)
+
+The benchmark starts its own audio servers (sync mode, one forcing
+compression and one with the adaptive policy) and counts bytes with a
+TCP relay in front of each. The break-even column is the link speed
+below which compression makes a call faster: the bytes it saves take
+longer to send than the extra CPU time it costs on both ends (1 core).
+
+Usage:
+    python benchmarks/compression_benchmark.py [--sizes 16384,65536,...]
+        [--kinds tone,sparse,noise] [--out compression_results.json]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import statistics
+import struct
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import grpc
+import numpy as np
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+CHAT_SYSTEM_DIR = REPO_DIR / "api-gateway" / "chatSystem"
+sys.path.insert(0, str(CHAT_SYSTEM_DIR))
+
+from apis.grpc_client import audio_pb2, audio_pb2_grpc, compression
+from apis.grpc_client.config import (
+    AUDIO_COMPRESSION_MAX_RATIO,
+    AUDIO_COMPRESSION_MIN_BYTES,
+    CHANNEL_OPTIONS,
+)
+from latency_harness import git_revision
+
+
+# Configuration
+SIZES = [16 * 1024, 64 * 1024, 256 * 1024, 1024 * 1024, 3 * 1024 * 1024]
+KINDS = ["tone", "sparse", "noise"]
+MODES = ["none", "gzip", "deflate", "adaptive"]
+INPUT_RATE = 44100
+CHANNELS = 2
+# Calls per cell: about 8 MiB of audio, at least 5 calls
+TARGET_BYTES = 8 * 1024 * 1024
+MAX_MESSAGE = 8 * 1024 * 1024
+OPTIONS = CHANNEL_OPTIONS + [
+    ("grpc.max_send_message_length", MAX_MESSAGE),
+    ("grpc.max_receive_message_length", MAX_MESSAGE),
+]
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def make_wav(size, kind):
+    """A 16-bit stereo WAV clip of about size bytes"""
+    rng = np.random.default_rng(0)
+    frames = max(1, (size - 44) // (2 * CHANNELS))
+    t = np.arange(frames) / INPUT_RATE
+    if kind == "noise":
+        signal = rng.normal(0, 0.3, frames).clip(-1, 1)
+    elif kind == "sparse":
+        signal = 0.3 * np.sin(2 * np.pi * 220 * t) * ((t % 3) < 0.5)
+        signal += rng.normal(0, 0.0002, frames)
+    else:
+        signal = 0.2 * np.sin(2 * np.pi * 220 * t) * ((t % 5) < 4)
+        signal += rng.normal(0, 0.0005, frames)
+    pcm = np.repeat((signal * 32767).astype("<i2")[:, None], CHANNELS, axis=1)
+    header = struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + pcm.nbytes, b"WAVE",
+        b"fmt ", 16, 1, CHANNELS, INPUT_RATE, INPUT_RATE * CHANNELS * 2, CHANNELS * 2, 16,
+        b"data", pcm.nbytes
+    )
+    return header + pcm.tobytes()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _pipe(source, sink, counter):
+    try:
+        while True:
+            data = source.recv(256 * 1024)
+            if not data:
+                break
+            with counter.get_lock():
+                counter.value += len(data)
+            sink.sendall(data)
+    except OSError:
+        pass
+    finally:
+        for s in (source, sink):
+            try:
+                s.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+def relay(listen_port, target_port, sent, received):
+    """TCP relay counting bytes to (sent) and from (received) the server"""
+    listener = socket.create_server(("127.0.0.1", listen_port))
+    while True:
+        client, _ = listener.accept()
+        upstream = socket.create_connection(("127.0.0.1", target_port))
+        for s in (client, upstream):
+            s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        threading.Thread(target=_pipe, args=(client, upstream, sent), daemon=True).start()
+        threading.Thread(target=_pipe, args=(upstream, client, received), daemon=True).start()
+
+
+def process_cpu_seconds(pid):
+    """CPU time (user + system) of another process, or None off Linux"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+
+class AudioServer:
+    """audio/server.py in a subprocess, behind a byte-counting relay"""
+
+    def __init__(self, env):
+        self.port = free_port()
+        self.proxy_port = free_port()
+        self.process = subprocess.Popen(
+            [sys.executable, str(REPO_DIR / "audio" / "server.py"), "--mode", "sync",
+             "--port", str(self.port), "--metrics-port", "0"],
+            env={**os.environ, **env, "GRPC_VERBOSITY": "ERROR"},
+            stdout=subprocess.DEVNULL,
+        )
+        context = multiprocessing.get_context("spawn")
+        self.sent = context.Value("q", 0)
+        self.received = context.Value("q", 0)
+        self.relay = context.Process(
+            target=relay, args=(self.proxy_port, self.port, self.sent, self.received),
+            daemon=True,
+        )
+        self.relay.start()
+        self.channel = grpc.insecure_channel(f"127.0.0.1:{self.proxy_port}", options=OPTIONS)
+        self.stub = audio_pb2_grpc.AudioServiceStub(self.channel)
+        deadline = time.monotonic() + 20
+        while True:
+            try:
+                grpc.channel_ready_future(self.channel).result(timeout=1)
+                break
+            except grpc.FutureTimeoutError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError("audio server did not start")
+
+    def counters(self):
+        return self.sent.value, self.received.value, process_cpu_seconds(self.process.pid)
+
+    def close(self):
+        self.channel.close()
+        self.relay.terminate()
+        self.process.terminate()
+        self.process.wait()
+
+
+def run_cell(server, audio, mode, repeat):
+    """`repeat` sequential calls; per-call wire bytes, latency and CPU"""
+    request = audio_pb2.AudioRequest(audio=audio)
+    algorithm = "gzip" if mode == "adaptive" else mode
+    metadata = compression.request_metadata(algorithm)
+
+    def call():
+        if mode == "adaptive":
+            chosen = compression.choose(audio, algorithm)
+        else:
+            chosen = compression.ALGORITHMS[mode]
+        return server.stub.ProcessAudio(request, compression=chosen, metadata=metadata)
+
+    response = call()    # Warm up the connection and both caches
+    sent0, received0, server_cpu0 = server.counters()
+    client_cpu0 = time.process_time()
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        latencies.append((time.perf_counter() - start) * 1000)
+    client_cpu = (time.process_time() - client_cpu0) * 1000 / repeat
+    # The relay may still be forwarding the last response
+    time.sleep(0.05)
+    sent1, received1, server_cpu1 = server.counters()
+    return {
+        "mode": mode,
+        "audio_bytes": len(audio),
+        "response_audio_bytes": len(response.audio),
+        "calls": repeat,
+        "wire_up_bytes": (sent1 - sent0) / repeat,
+        "wire_down_bytes": (received1 - received0) / repeat,
+        "p50_ms": statistics.median(latencies),
+        "client_cpu_ms": client_cpu,
+        "server_cpu_ms": (
+            (server_cpu1 - server_cpu0) * 1000 / repeat if server_cpu0 is not None else None
+        ),
+    }
+
+
+def break_even_mbps(cell, baseline):
+    """Link speed (Mbit/s) below which cell's compression pays off"""
+    saved = (baseline["wire_up_bytes"] + baseline["wire_down_bytes"]
+             - cell["wire_up_bytes"] - cell["wire_down_bytes"])
+    cpu = cell["client_cpu_ms"] + (cell["server_cpu_ms"] or 0)
+    extra = cpu - baseline["client_cpu_ms"] - (baseline["server_cpu_ms"] or 0)
+    if saved <= 0:
+        return 0.0
+    if extra <= 0:
+        return float("inf")
+    return saved * 8 / 1e6 / (extra / 1000)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Audio compression benchmark")
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)))
+    parser.add_argument("--kinds", default=",".join(KINDS))
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--out", default="compression_results.json")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    modes = args.modes.split(",")
+    print("\n" + "=" * 70)
+    print("AUDIO COMPRESSION BENCHMARK")
+    print("=" * 70)
+    print(f"  - ProcessAudio, {CHANNELS} ch {INPUT_RATE} Hz 16-bit WAV, sequential calls")
+    print(f"  - adaptive: compress from {AUDIO_COMPRESSION_MIN_BYTES} B when a sample"
+          f" compresses to <= {AUDIO_COMPRESSION_MAX_RATIO:.0%}\n")
+
+    servers = {
+        # Compresses every response it is asked to
+        "forced": AudioServer({
+            "AUDIO_COMPRESSION_MIN_BYTES": "0", "AUDIO_COMPRESSION_MAX_RATIO": "100",
+        }),
+        "adaptive": AudioServer({}),
+    }
+    results = []
+    try:
+        for kind in args.kinds.split(","):
+            print(f"{kind}")
+            print(f"  {'bytes':>8} {'mode':>9} {'sample':>7} {'up KiB':>8} {'down KiB':>9}"
+                  f" {'wire':>6} {'p50 ms':>8} {'cli CPU':>8} {'srv CPU':>8} {'break-even':>12}")
+            for size in sizes:
+                audio = make_wav(size, kind)
+                repeat = max(5, min(100, TARGET_BYTES // size))
+                baseline = None
+                for mode in modes:
+                    server = servers["adaptive" if mode == "adaptive" else "forced"]
+                    cell = run_cell(server, audio, mode, repeat)
+                    cell["kind"] = kind
+                    cell["sample_ratio"] = compression.sample_ratio(audio)
+                    if mode == "none":
+                        baseline = cell
+                    wire = cell["wire_up_bytes"] + cell["wire_down_bytes"]
+                    if baseline is not None:
+                        cell["wire_ratio"] = wire / (baseline["wire_up_bytes"] + baseline["wire_down_bytes"])
+                        cell["break_even_mbps"] = break_even_mbps(cell, baseline)
+                    results.append(cell)
+                    even = cell.get("break_even_mbps")
+                    even = ("-" if mode == "none" or even is None
+                            else "never" if even == 0 else "always" if even == float("inf")
+                            else f"{even:.0f} Mbit/s")
+                    server_cpu = cell["server_cpu_ms"]
+                    print(f"  {size:>8} {mode:>9} {cell['sample_ratio']:7.2f}"
+                          f" {cell['wire_up_bytes'] / 1024:8.1f} {cell['wire_down_bytes'] / 1024:9.1f}"
+                          f" {cell.get('wire_ratio', 1.0):6.2f} {cell['p50_ms']:8.2f}"
+                          f" {cell['client_cpu_ms']:8.2f}"
+                          f" {server_cpu if server_cpu is not None else float('nan'):8.2f}"
+                          f" {even:>12}")
+            print()
+    finally:
+        for server in servers.values():
+            server.close()
+
+    with open(args.out, "w") as f:
+        json.dump({
+            "meta": {
+                "generated": datetime.now().isoformat(timespec="seconds"),
+                "git_revision": git_revision(),
+                "cpu_count": os.cpu_count(),
+                "min_bytes": AUDIO_COMPRESSION_MIN_BYTES,
+                "max_ratio": AUDIO_COMPRESSION_MAX_RATIO,
+            },
+            "results": results,
+        }, f, indent=2, default=str)
+    print(f"✓ Results saved to: {args.out}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+SQLite Database Profile Benchmark
+Runs concurrent chat_history readers alongside send-text-rest writers
+in-process (Django test client, one thread per virtual user) against a
+scratch copy of the database, once per CHAT_DB_PROFILE, and compares
+throughput, latency and "database is locked" failures.
+
+Usage:
+    python benchmarks/db_profile_benchmark.py
+"""
+
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+
+# Configuration
+PROFILES = ["default", "production"]
+NUM_WRITERS = 8
+NUM_READERS = 8
+DURATION_SECONDS = 10
+SEED_ROWS = 20000
+
+CHAT_SYSTEM_DIR = Path(__file__).resolve().parent.parent / "api-gateway" / "chatSystem"
+SCRATCH_DB = "/tmp/db_profile_benchmark.sqlite3"
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] if values else 0.0
+
+
+def run_profile():
+    """Child process: settings are imported with CHAT_DB_PROFILE already set"""
+    sys.path.insert(0, str(CHAT_SYSTEM_DIR))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "chatSystem.settings")
+
+    import django
+    from django.conf import settings
+
+    settings.DATABASES["default"]["NAME"] = SCRATCH_DB
+    settings.ALLOWED_HOSTS = ["*"]
+    django.setup()
+
+    from django.core.management import call_command
+    from django.test import Client
+    from apis.models import ChatMessage
+
+    call_command("migrate", verbosity=0)
+    if ChatMessage.objects.count() < SEED_ROWS:
+        ChatMessage.objects.bulk_create(
+            ChatMessage(sender=f"user{i % 100}", receiver="server", message_type="text",
+                        original_message="Hello", translated_message="Bonjour")
+            for i in range(SEED_ROWS)
+        )
+
+    results = {"write": [], "read": []}
+    errors = {"write": 0, "read": 0}
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + DURATION_SECONDS
+
+    def worker(kind, user_id):
+        client = Client()
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            try:
+                if kind == "write":
+                    response = client.post("/api/send-text-rest/", {
+                        "sender": f"user{user_id}",
+                        "receiver": "server",
+                        "text": "Hello World",
+                        "target_language": "fr"
+                    }, content_type="application/json")
+                else:
+                    response = client.get("/api/history/", {"limit": 50})
+                ok = response.status_code == 200
+            except Exception:
+                ok = False
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                if ok:
+                    results[kind].append(elapsed)
+                else:
+                    errors[kind] += 1
+
+    threads = [threading.Thread(target=worker, args=("write", i)) for i in range(NUM_WRITERS)]
+    threads += [threading.Thread(target=worker, args=("read", i)) for i in range(NUM_READERS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    profile = os.environ.get("CHAT_DB_PROFILE", "default")
+    for kind, label in (("write", "send-text-rest"), ("read", "history")):
+        times = results[kind]
+        print(f"  {profile:<11} {label:<15} {len(times) / DURATION_SECONDS:9.1f} req/s"
+              f"   p50 {statistics.median(times) if times else 0:8.2f} ms"
+              f"   p99 {percentile(times, 99):8.2f} ms"
+              f"   errors {errors[kind]}")
+
+
+def main():
+    print("\n" + "=" * 70)
+    print("SQLITE DATABASE PROFILE BENCHMARK")
+    print("=" * 70)
+    print(f"  - Writers: {NUM_WRITERS}, Readers: {NUM_READERS}")
+    print(f"  - Duration per profile: {DURATION_SECONDS} s\n")
+
+    for profile in PROFILES:
+        # Each profile starts from the same fresh database file
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(SCRATCH_DB + suffix):
+                os.remove(SCRATCH_DB + suffix)
+        shutil.copy(CHAT_SYSTEM_DIR / "db.sqlite3", SCRATCH_DB)
+        subprocess.run(
+            [sys.executable, __file__, "--child"],
+            env={**os.environ, "CHAT_DB_PROFILE": profile},
+            check=True
+        )
+    print()
+
+
+if __name__ == "__main__":
+    if "--child" in sys.argv:
+        run_profile()
+    else:
+        main()
@@ -0,0 +1,256 @@
+"""
+Direct gRPC Microbenchmark
+Drives TranslationServiceStub.TranslateText and AudioServiceStub.ProcessAudio
+directly, without the Django gateway, and sweeps payload size, concurrency
+and channel handling (one reused channel vs a fresh channel per call).
+
+It then splits the latency of a single call into
+    servicer       engine work, timed in-process
+    serialization  protobuf encode + decode of request and response
+    transport      what remains of the RPC latency (HTTP/2, gRPC, loopback)
+    gateway        HTTP endpoint latency minus RPC latency (with --gateway-url)
+
+Start the services first (python -m apis.grpc_client.server, audio/server.py).
+
+Usage:
+    python benchmarks/grpc_microbenchmark.py [--seconds 2]
+        [--concurrency 1,4,16,64] [--gateway-url http://localhost:8000/api]
+        [--out grpc_results.json]
+"""
+
+import argparse
+import base64
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import grpc
+
+CHAT_SYSTEM_DIR = Path(__file__).resolve().parent.parent / "api-gateway" / "chatSystem"
+sys.path.insert(0, str(CHAT_SYSTEM_DIR))
+
+from apis.grpc_client import audio_pb2, audio_pb2_grpc, balancer, engine
+from apis.grpc_client import translation_pb2, translation_pb2_grpc
+from apis.grpc_client.config import CHANNEL_OPTIONS
+from latency_harness import Histogram, git_revision
+
+
+# Configuration
+# One server per service: the first replica of each configured target
+TRANSLATION_TARGET = balancer.translation.replicas()[0].address
+AUDIO_TARGET = balancer.audio.replicas()[0].address
+TEXT_SIZES = [16, 1024, 16 * 1024]
+AUDIO_SIZES = [1024, 64 * 1024, 1024 * 1024]
+CONCURRENCY = [1, 4, 16, 64]
+CHANNEL_MODES = ["reuse", "fresh"]
+MAX_MESSAGE = 8 * 1024 * 1024
+OPTIONS = CHANNEL_OPTIONS + [
+    ("grpc.max_send_message_length", MAX_MESSAGE),
+    ("grpc.max_receive_message_length", MAX_MESSAGE),
+]
+
+
+def text_payload(size):
+    words = ("hello world thank you very much good morning " * (size // 8 + 1))
+    return words[:size]
+
+
+def audio_payload(size):
+    # Raw 16-bit PCM (no WAV header) of a deterministic pattern
+    return bytes((i * 37) & 0xFF for i in range(size))
+
+
+METHODS = {
+    "TranslateText": {
+        "target": TRANSLATION_TARGET,
+        "stub": translation_pb2_grpc.TranslationServiceStub,
+        "call": lambda stub, payload: stub.TranslateText(payload),
+        "sizes": TEXT_SIZES,
+        "request": lambda size: translation_pb2.TextRequest(text=text_payload(size), language="fr"),
+        "response": lambda request: translation_pb2.TextResponse(
+            translated_text=engine.translate(request.text, request.language)),
+        "servicer": lambda request: engine.translate(request.text, request.language),
+    },
+    "ProcessAudio": {
+        "target": AUDIO_TARGET,
+        "stub": audio_pb2_grpc.AudioServiceStub,
+        "call": lambda stub, payload: stub.ProcessAudio(payload),
+        "sizes": AUDIO_SIZES,
+        "request": lambda size: audio_pb2.AudioRequest(audio=audio_payload(size)),
+        "response": lambda request: audio_pb2.AudioResponse(audio=engine.process_audio(request.audio)),
+        "servicer": lambda request: engine.process_audio(request.audio),
+    },
+}
+
+
+def median_us(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1e6)
+    return statistics.median(times)
+
+
+def run_cell(method, request, concurrency, channel_mode, seconds):
+    """Closed loop: `concurrency` threads call back to back for `seconds`"""
+    spec = METHODS[method]
+    histogram = Histogram()
+    errors = 0
+    lock = threading.Lock()
+    shared = grpc.insecure_channel(spec["target"], options=OPTIONS)
+    shared_stub = spec["stub"](shared)
+    # Connect before timing
+    grpc.channel_ready_future(shared).result(timeout=10)
+    stop_at = time.perf_counter() + seconds
+
+    def worker():
+        nonlocal errors
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            try:
+                if channel_mode == "reuse":
+                    spec["call"](shared_stub, request)
+                else:
+                    with grpc.insecure_channel(spec["target"], options=OPTIONS) as channel:
+                        spec["call"](spec["stub"](channel), request)
+            except grpc.RpcError:
+                with lock:
+                    errors += 1
+                continue
+            elapsed = (time.perf_counter() - start) * 1e6
+            with lock:
+                histogram.record(elapsed)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    shared.close()
+
+    summary = histogram.summary_ms()
+    return {
+        "method": method,
+        "payload_bytes": request.ByteSize(),
+        "concurrency": concurrency,
+        "channel": channel_mode,
+        "calls": histogram.total,
+        "errors": errors,
+        "throughput_rps": histogram.total / seconds,
+        "throughput_mb_s": histogram.total * request.ByteSize() / seconds / 1e6,
+        "latency_ms": summary,
+    }
+
+
+def attribute(method, request, rpc_p50_ms, gateway_url=None):
+    """Split one call's p50 latency into servicer / serialization / transport"""
+    spec = METHODS[method]
+    repeat = 200 if request.ByteSize() < 100_000 else 20
+    response = spec["response"](request)
+    servicer_us = median_us(lambda: spec["servicer"](request), repeat)
+    request_type, response_type = type(request), type(response)
+    serialization_us = median_us(lambda: (
+        request_type.FromString(request.SerializeToString()),
+        response_type.FromString(response.SerializeToString()),
+    ), repeat)
+    result = {
+        "rpc_ms": rpc_p50_ms,
+        "servicer_ms": servicer_us / 1000,
+        "serialization_ms": serialization_us / 1000,
+        "transport_ms": max(0.0, rpc_p50_ms - (servicer_us + serialization_us) / 1000),
+    }
+    if gateway_url:
+        result["gateway_total_ms"], result["gateway_ms"] = gateway_overhead(
+            method, request, rpc_p50_ms, gateway_url, repeat=min(repeat, 50))
+    return result
+
+
+def gateway_overhead(method, request, rpc_p50_ms, gateway_url, repeat):
+    import requests
+
+    if method == "TranslateText":
+        url = f"{gateway_url}/send-text/"
+        body = {"sender": "bench", "receiver": "bench", "text": request.text,
+                "target_language": request.language}
+    else:
+        url = f"{gateway_url}/send-audio/"
+        body = {"sender": "bench", "receiver": "bench",
+                "audio": base64.b64encode(request.audio).decode()}
+    # A new connection per request: on a reused keep-alive connection the
+    # development server's separate header/body writes hit Nagle plus
+    # delayed ACK and add ~40 ms that no real deployment would see
+    total_us = median_us(lambda: requests.post(url, json=body, timeout=30).raise_for_status(), repeat)
+    return total_us / 1000, max(0.0, total_us / 1000 - rpc_p50_ms)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Direct gRPC microbenchmark")
+    parser.add_argument("--seconds", type=float, default=2.0, help="per sweep cell")
+    parser.add_argument("--concurrency", default=",".join(map(str, CONCURRENCY)))
+    parser.add_argument("--methods", default=",".join(METHODS))
+    parser.add_argument("--channels", default=",".join(CHANNEL_MODES))
+    parser.add_argument("--gateway-url", help="also time the Django endpoint, e.g. "
+                                              "http://localhost:8000/api")
+    parser.add_argument("--out", default="grpc_results.json")
+    args = parser.parse_args(argv)
+
+    concurrency = [int(c) for c in args.concurrency.split(",")]
+    print("\n" + "=" * 70)
+    print("DIRECT gRPC MICROBENCHMARK")
+    print("=" * 70)
+    print(f"  - Translation: {TRANSLATION_TARGET}, Audio: {AUDIO_TARGET}")
+    print(f"  - {args.seconds} s per cell, concurrency {concurrency}\n")
+
+    sweep, attribution = [], []
+    for method in args.methods.split(","):
+        spec = METHODS[method]
+        print(f"{method}")
+        print(f"  {'bytes':>8} {'chan':>6} {'conc':>5} {'calls/s':>9} {'MB/s':>8}"
+              f" {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for size in spec["sizes"]:
+            request = spec["request"](size)
+            for channel_mode in args.channels.split(","):
+                for c in concurrency:
+                    cell = run_cell(method, request, c, channel_mode, args.seconds)
+                    sweep.append(cell)
+                    print(f"  {cell['payload_bytes']:>8} {channel_mode:>6} {c:>5}"
+                          f" {cell['throughput_rps']:9.1f} {cell['throughput_mb_s']:8.2f}"
+                          f" {cell['latency_ms']['p50']:8.3f} {cell['latency_ms']['p99']:8.3f}"
+                          f" {cell['errors']:>7}")
+            # Attribution from the uncontended, reused-channel cell
+            single = run_cell(method, request, 1, "reuse", args.seconds)
+            split = attribute(method, request, single["latency_ms"]["p50"], args.gateway_url)
+            attribution.append({"method": method, "payload_bytes": request.ByteSize(), **split})
+        print()
+
+    print("Latency attribution (p50, 1 caller, reused channel; ms)")
+    print(f"  {'method':<14} {'bytes':>8} {'servicer':>9} {'serialize':>10} {'transport':>10}"
+          f" {'rpc':>8}" + (f" {'gateway':>8} {'http':>8}" if args.gateway_url else ""))
+    for row in attribution:
+        print(f"  {row['method']:<14} {row['payload_bytes']:>8} {row['servicer_ms']:9.3f}"
+              f" {row['serialization_ms']:10.3f} {row['transport_ms']:10.3f} {row['rpc_ms']:8.3f}"
+              + (f" {row['gateway_ms']:8.3f} {row['gateway_total_ms']:8.3f}"
+                 if args.gateway_url else ""))
+
+    with open(args.out, "w") as f:
+        json.dump({
+            "meta": {
+                "generated": datetime.now().isoformat(timespec="seconds"),
+                "git_revision": git_revision(),
+                "seconds_per_cell": args.seconds,
+                "cpu_count": os.cpu_count(),
+            },
+            "sweep": sweep,
+            "attribution": attribution,
+        }, f, indent=2)
+    print(f"\n✓ Results saved to: {args.out}\n")
+
+
+if __name__ == "__main__":
+    main()
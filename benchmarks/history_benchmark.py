@@ -0,0 +1,161 @@
+"""
+Chat History Pagination Benchmark
+Seeds a scratch SQLite database with millions of ChatMessage rows and
+times keyset-paginated history pages against the old full-table query.
+
+The first run seeds the rows, which takes a while (the five composite
+indexes make random inserts expensive); later runs reuse the file.
+
+Usage:
+    python benchmarks/history_benchmark.py [num_rows] [db_path]
+"""
+
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+
+# Configuration
+NUM_ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+DB_PATH = sys.argv[2] if len(sys.argv) > 2 else "/tmp/history_benchmark.sqlite3"
+NUM_USERS = 1000
+PAGE_SIZE = 50
+REPEAT = 50
+
+CHAT_SYSTEM_DIR = Path(__file__).resolve().parent.parent / "api-gateway" / "chatSystem"
+sys.path.insert(0, str(CHAT_SYSTEM_DIR))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "chatSystem.settings")
+
+import django
+from django.conf import settings
+
+# Never touch the project database: point Django at the scratch file
+settings.DATABASES["default"]["NAME"] = DB_PATH
+settings.ALLOWED_HOSTS = ["*"]
+django.setup()
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+
+from apis.models import ChatMessage
+from apis.pagination import encode_cursor
+
+
+def seed():
+    """Bulk insert NUM_ROWS messages with raw executemany (ORM is too slow here)"""
+    existing = ChatMessage.objects.count()
+    if existing >= NUM_ROWS:
+        print(f"Reusing {existing} existing rows in {DB_PATH}")
+        return
+
+    print(f"Seeding {NUM_ROWS - existing} rows into {DB_PATH} ...")
+    rng = random.Random(42)
+    start_ts = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    batch = []
+    started = time.perf_counter()
+    with connection.cursor() as cursor:
+        for i in range(existing, NUM_ROWS):
+            ts = start_ts + timedelta(milliseconds=i * 10)
+            batch.append((
+                f"user{rng.randrange(NUM_USERS)}",
+                f"user{rng.randrange(NUM_USERS)}",
+                "audio" if i % 10 == 0 else "text",
+                "Hello World",
+                "Bonjour",
+                ts.strftime("%Y-%m-%d %H:%M:%S.%f"),
+            ))
+            if len(batch) == 50_000:
+                cursor.executemany(
+                    "INSERT INTO apis_chatmessage (sender, receiver, message_type,"
+                    " original_message, translated_message, timestamp)"
+                    " VALUES (%s, %s, %s, %s, %s, %s)",
+                    batch
+                )
+                batch.clear()
+        if batch:
+            cursor.executemany(
+                "INSERT INTO apis_chatmessage (sender, receiver, message_type,"
+                " original_message, translated_message, timestamp)"
+                " VALUES (%s, %s, %s, %s, %s, %s)",
+                batch
+            )
+        cursor.execute("ANALYZE")
+    print(f"Seeded in {time.perf_counter() - started:.1f} s")
+
+
+def timed(label, fn, repeat=REPEAT):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    print(f"  {label:<38} median {statistics.median(times):9.3f} ms"
+          f"   p95 {times[int(len(times) * 0.95) - 1]:9.3f} ms")
+
+
+def explain(label, queryset):
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        plan = " / ".join(row[-1] for row in cursor.fetchall())
+    print(f"  {label:<20} {plan}")
+
+
+def main():
+    print("\n" + "=" * 70)
+    print("CHAT HISTORY PAGINATION BENCHMARK")
+    print("=" * 70)
+
+    call_command("migrate", verbosity=0)
+    seed()
+    total = ChatMessage.objects.count()
+    print(f"Rows: {total}\n")
+
+    client = Client()
+
+    def page(params):
+        response = client.get("/api/history/", {"limit": PAGE_SIZE, **params})
+        assert response.status_code == 200, response.content
+        return response.json()
+
+    # A cursor deep in the table (~90% of the way down)
+    deep = ChatMessage.objects.order_by("-timestamp", "-id")[int(total * 0.9)]
+    deep_cursor = encode_cursor(deep)
+
+    print("Keyset-paginated /api/history/ (includes DRF rendering):")
+    timed("first page", lambda: page({}))
+    timed("page at 90% depth", lambda: page({"cursor": deep_cursor}))
+    timed("sender filter", lambda: page({"sender": "user7"}))
+    timed("receiver filter", lambda: page({"receiver": "user7"}))
+    timed("conversation filter", lambda: page({"conversation": "user7,user8"}))
+    timed("message_type=audio", lambda: page({"message_type": "audio"}))
+
+    def walk(pages=20):
+        cursor = None
+        for _ in range(pages):
+            data = page({"cursor": cursor} if cursor else {})
+            cursor = data["next_cursor"]
+    timed("walk 20 consecutive pages", walk, repeat=10)
+
+    print("\nOld behaviour (whole table, ordered, no serialization):")
+    timed(
+        "order_by('-timestamp') full fetch",
+        lambda: list(ChatMessage.objects.order_by("-timestamp").values_list("id", flat=True)),
+        repeat=3
+    )
+
+    print("\nQuery plans:")
+    explain("first page", ChatMessage.objects.order_by("-timestamp", "-id")[:PAGE_SIZE])
+    explain("sender", ChatMessage.objects.filter(sender="user7").order_by("-timestamp", "-id")[:PAGE_SIZE])
+    explain("conversation", ChatMessage.objects.filter(sender="user7", receiver="user8").order_by("-timestamp", "-id")[:PAGE_SIZE])
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+"""
+Open-Loop Latency Benchmark Harness
+Drives each API endpoint at a constant arrival rate (open loop: requests
+are sent on schedule whether or not earlier ones have finished), with a
+warm-up phase that is discarded and a measurement phase recorded in an
+HDR-style histogram. Latency is measured from each request's scheduled
+send time, so a server stall shows up as queueing delay instead of
+silently lowering the request rate (coordinated omission).
+
+Usage:
+    python benchmarks/latency_harness.py run [--rate 50] [--duration 30]
+        [--warmup 5] [--endpoints send-text,history] [--out results.json]
+    python benchmarks/latency_harness.py compare base.json new.json
+        [--threshold 0.10] [--min-delta-ms 1.0]
+
+`run` writes one JSON document with per-endpoint results; `compare`
+prints the percentile deltas between two of them and exits with status 1
+if any endpoint regressed.
+"""
+
+import argparse
+import array
+import base64
+import concurrent.futures
+import json
+import math
+import os
+import platform
+import struct
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+import requests
+
+
+# Configuration
+BASE_URL = "http://localhost:8000/api"
+DEFAULT_RATE = 50            # requests per second, per endpoint
+DEFAULT_WARMUP = 5           # seconds, discarded
+DEFAULT_DURATION = 30        # seconds, measured
+DEFAULT_MAX_WORKERS = 64     # concurrent requests in flight at most
+REQUEST_TIMEOUT = 30
+PERCENTILES = [50, 90, 99, 99.9]
+ENDPOINTS = ["send-text", "send-text-rest", "send-audio", "send-audio-rest", "history"]
+
+
+class Histogram:
+    """
+    HDR-style histogram of integer microsecond values.
+
+    Values below 2**significant_bits are counted exactly; above that each
+    power of two is split into 2**(significant_bits - 1) equal buckets, so
+    the relative error is at most 2**(1 - significant_bits) (0.2% for the
+    default 10 bits) at any magnitude, in a few KB of memory.
+    """
+
+    def __init__(self, significant_bits=10):
+        self.bits = significant_bits
+        self.counts = {}
+        self.total = 0
+        self.min = None
+        self.max = None
+        self.sum = 0
+
+    def _key(self, value):
+        shift = max(0, value.bit_length() - self.bits)
+        return (shift << self.bits) | (value >> shift)
+
+    def _highest_equivalent(self, key):
+        shift, top = key >> self.bits, key & ((1 << self.bits) - 1)
+        return ((top + 1) << shift) - 1
+
+    def record(self, value_us):
+        value = max(0, int(value_us))
+        key = self._key(value)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        self.total += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other):
+        for key, count in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
+        self.total += other.total
+        self.sum += other.sum
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, pct):
+        """Value (us) at or below which pct percent of the samples fall."""
+        if not self.total:
+            return 0
+        rank = max(1, math.ceil(self.total * pct / 100))
+        seen = 0
+        for key in sorted(self.counts):
+            seen += self.counts[key]
+            if seen >= rank:
+                return min(self._highest_equivalent(key), self.max)
+        return self.max
+
+    def summary_ms(self):
+        summary = {
+            "min": (self.min or 0) / 1000,
+            "mean": self.sum / self.total / 1000 if self.total else 0.0,
+            "max": (self.max or 0) / 1000,
+        }
+        for pct in PERCENTILES:
+            summary[f"p{pct:g}"] = self.percentile(pct) / 1000
+        return summary
+
+    def to_json(self):
+        """[[highest equivalent value in us, count], ...] in value order."""
+        return [[self._highest_equivalent(key), self.counts[key]] for key in sorted(self.counts)]
+
+
+def make_wav_b64(seconds=1.0, rate=16000):
+    """A short 16-bit mono tone as base64 WAV, without needing NumPy"""
+    samples = array.array("h", (
+        int(8000 * math.sin(2 * math.pi * 440 * i / rate)) for i in range(int(seconds * rate))
+    ))
+    if sys.byteorder == "big":
+        samples.byteswap()
+    data = samples.tobytes()
+    header = struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + len(data), b"WAVE",
+        b"fmt ", 16, 1, 1, rate, rate * 2, 2, 16,
+        b"data", len(data)
+    )
+    return base64.b64encode(header + data).decode()
+
+
+def build_requests(base_url):
+    """Endpoint name -> function(sequence number) returning request kwargs"""
+    audio = make_wav_b64()
+
+    def text(path):
+        return lambda n: {"method": "POST", "url": f"{base_url}/{path}/", "json": {
+            "sender": f"user{n % 100}",
+            "receiver": "server",
+            "text": f"Hello World from user {n % 100}, request {n}",
+            "target_language": "fr"
+        }}
+
+    def audio_request(path):
+        return lambda n: {"method": "POST", "url": f"{base_url}/{path}/", "json": {
+            "sender": f"user{n % 100}",
+            "receiver": "server",
+            "audio": audio
+        }}
+
+    return {
+        "send-text": text("send-text"),
+        "send-text-rest": text("send-text-rest"),
+        "send-audio": audio_request("send-audio"),
+        "send-audio-rest": audio_request("send-audio-rest"),
+        "history": lambda n: {"method": "GET", "url": f"{base_url}/history/",
+                              "params": {"limit": 50}},
+    }
+
+
+def run_endpoint(name, make_request, rate, warmup, duration, max_workers):
+    """Open-loop schedule at `rate` req/s; returns the endpoint's result dict"""
+    histogram = Histogram()
+    errors = {}
+    lock = threading.Lock()
+    local = threading.local()
+    interval = 1.0 / rate
+    total = int((warmup + duration) * rate)
+    measured_from = int(warmup * rate)
+    late_sends = 0
+
+    def send(n, intended):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        try:
+            response = session.request(timeout=REQUEST_TIMEOUT, **make_request(n))
+            error = None if response.status_code == 200 else f"HTTP {response.status_code}"
+        except requests.RequestException as e:
+            error = type(e).__name__
+        latency_us = (time.perf_counter() - intended) * 1e6
+        if n < measured_from:
+            return
+        with lock:
+            if error is None:
+                histogram.record(latency_us)
+            else:
+                errors[error] = errors.get(error, 0) + 1
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+        start = time.perf_counter() + 0.1
+        for n in range(total):
+            intended = start + n * interval
+            delay = intended - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -0.01 and n >= measured_from:
+                # The generator itself fell behind; latency still counts
+                # from `intended`, but the run may not be trustworthy
+                late_sends += 1
+            pool.submit(send, n, intended)
+        scheduled_end = start + total * interval
+    elapsed = time.perf_counter() - (start + warmup)
+    drain_s = max(0.0, time.perf_counter() - scheduled_end)
+
+    completed = histogram.total + sum(errors.values())
+    return {
+        "endpoint": name,
+        "target_rate": rate,
+        "achieved_rate": histogram.total / elapsed if elapsed > 0 else 0.0,
+        "requests": completed,
+        "successful": histogram.total,
+        "errors": errors,
+        "error_rate": sum(errors.values()) / completed if completed else 0.0,
+        "late_sends": late_sends,
+        "drain_seconds": drain_s,
+        "latency_ms": histogram.summary_ms(),
+        "histogram_us": histogram.to_json(),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def print_result(result):
+    latency = result["latency_ms"]
+    print(f"  {result['endpoint']:<16} {result['achieved_rate']:7.1f} req/s"
+          + "".join(f"  p{pct:g} {latency[f'p{pct:g}']:8.2f}" for pct in PERCENTILES)
+          + f"  max {latency['max']:8.2f} ms"
+          + f"  errors {sum(result['errors'].values())}")
+
+
+def run(args):
+    print("\n" + "=" * 70)
+    print("OPEN-LOOP LATENCY BENCHMARK")
+    print("=" * 70)
+    print(f"  - Target: {args.base_url}")
+    print(f"  - Rate: {args.rate} req/s per endpoint, warm-up {args.warmup} s,"
+          f" measured {args.duration} s\n")
+
+    try:
+        requests.get(f"{args.base_url}/history/", timeout=5)
+    except requests.RequestException:
+        print(f"✗ ERROR: Cannot connect to {args.base_url}")
+        return 2
+
+    builders = build_requests(args.base_url)
+    endpoints = args.endpoints.split(",") if args.endpoints else ENDPOINTS
+    results = {}
+    for name in endpoints:
+        if name not in builders:
+            print(f"✗ Unknown endpoint {name!r}; choose from {', '.join(builders)}")
+            return 2
+        results[name] = run_endpoint(
+            name, builders[name], args.rate, args.warmup, args.duration, args.max_workers
+        )
+        print_result(results[name])
+
+    document = {
+        "meta": {
+            "generated": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+            "base_url": args.base_url,
+            "rate": args.rate,
+            "warmup_seconds": args.warmup,
+            "duration_seconds": args.duration,
+            "max_workers": args.max_workers,
+            "host": platform.node(),
+            "cpu_count": os.cpu_count(),
+        },
+        "endpoints": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(document, f, indent=2)
+    print(f"\n✓ Results saved to: {args.out}\n")
+    return 0
+
+
+def compare(args):
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    print("\n" + "=" * 70)
+    print(f"COMPARISON: {args.base} ({base['meta'].get('git_revision')})"
+          f" -> {args.new} ({new['meta'].get('git_revision')})")
+    print("=" * 70)
+    print(f"  Regression: slower by more than {args.threshold:.0%}"
+          f" and {args.min_delta_ms} ms, or error rate up by more than 1 point\n")
+
+    for key in ("rate", "warmup_seconds", "duration_seconds", "max_workers"):
+        if base["meta"].get(key) != new["meta"].get(key):
+            print(f"  ! {key} differs ({base['meta'].get(key)} vs {new['meta'].get(key)}):"
+                  f" the runs are not directly comparable")
+
+    regressions = []
+    for name in sorted(set(base["endpoints"]) & set(new["endpoints"])):
+        old_result, new_result = base["endpoints"][name], new["endpoints"][name]
+        print(f"  {name}")
+        for metric in [f"p{pct:g}" for pct in PERCENTILES] + ["mean"]:
+            old_ms = old_result["latency_ms"][metric]
+            new_ms = new_result["latency_ms"][metric]
+            change = (new_ms - old_ms) / old_ms if old_ms else 0.0
+            marker = ""
+            if abs(new_ms - old_ms) >= args.min_delta_ms and abs(change) > args.threshold:
+                marker = "REGRESSION" if change > 0 else "improved"
+                if change > 0:
+                    regressions.append(f"{name} {metric}")
+            print(f"    {metric:<6} {old_ms:9.2f} -> {new_ms:9.2f} ms  {change:+7.1%}  {marker}")
+        error_delta = new_result["error_rate"] - old_result["error_rate"]
+        marker = "REGRESSION" if error_delta > 0.01 else ""
+        if marker:
+            regressions.append(f"{name} error rate")
+        print(f"    errors {old_result['error_rate']:9.2%} -> {new_result['error_rate']:9.2%}"
+              f"     {error_delta * 100:+6.1f}pt  {marker}")
+
+    missing = sorted(set(base["endpoints"]) ^ set(new["endpoints"]))
+    if missing:
+        print(f"\n  Not in both runs: {', '.join(missing)}")
+
+    if regressions:
+        print(f"\n✗ {len(regressions)} regression(s): {', '.join(regressions)}\n")
+        return 1
+    print("\n✓ No regressions\n")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Open-loop latency benchmark harness")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="benchmark the endpoints")
+    run_parser.add_argument("--base-url", default=BASE_URL)
+    run_parser.add_argument("--rate", type=float, default=DEFAULT_RATE)
+    run_parser.add_argument("--warmup", type=float, default=DEFAULT_WARMUP)
+    run_parser.add_argument("--duration", type=float, default=DEFAULT_DURATION)
+    run_parser.add_argument("--max-workers", type=int, default=DEFAULT_MAX_WORKERS)
+    run_parser.add_argument("--endpoints", help=f"comma separated, default: {','.join(ENDPOINTS)}")
+    run_parser.add_argument("--out", default="latency_results.json")
+
+    compare_parser = commands.add_parser("compare", help="diff two result files")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=0.10,
+                                help="relative slowdown that counts as a regression")
+    compare_parser.add_argument("--min-delta-ms", type=float, default=1.0,
+                                help="ignore changes smaller than this")
+
+    args = parser.parse_args(argv)
+    return run(args) if args.command == "run" else compare(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
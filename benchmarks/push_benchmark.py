@@ -0,0 +1,173 @@
+"""
+Push Channel Benchmark
+Opens many idle server-sent-event connections to /api/stream/<receiver>/
+(apis/push.py) and measures
+    memory      server RSS per idle connection (needs --server-pid, Linux)
+    delivery    POST /api/send-text-async/ -> event received by every
+                subscriber of the receiver, with the idle connections open
+    overflow    a subscriber that never reads is sent 64 KiB messages
+                until its queue is full and it is disconnected
+
+Serve the gateway with one ASGI worker, e.g.
+    uvicorn chatSystem.asgi:application --port 8001
+with the translation service running. Each connection uses a file
+descriptor on both ends: raise `ulimit -n` accordingly.
+
+Usage:
+    python benchmarks/push_benchmark.py [--url http://localhost:8001/api]
+        [--connections 10000] [--server-pid PID] [--messages 200]
+"""
+
+import argparse
+import asyncio
+import json
+import resource
+import statistics
+import time
+from urllib.parse import urlsplit
+
+import aiohttp
+
+
+FANOUT_RECEIVER = "push-fanout"
+FANOUT_SUBSCRIBERS = 10
+STALLED_RECEIVER = "push-stalled"
+# Large enough to fill the socket buffers of a reader that never reads
+STALLED_TEXT = "hello world " * (64 * 1024 // 12)
+STALLED_MESSAGES = 400
+
+
+def rss_kib(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+
+
+async def open_stream(host, port, path):
+    """Raw SSE connection: returns (reader, writer) once the headers are in"""
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept: text/event-stream\r\n\r\n".encode())
+    await writer.drain()
+    status = await reader.readline()
+    if b" 200 " not in status:
+        raise RuntimeError(f"{path}: {status!r}")
+    while (await reader.readline()) not in (b"\r\n", b""):
+        pass
+    return reader, writer
+
+
+async def next_event(reader):
+    """The data of the next SSE event (chunked transfer framing skipped)"""
+    while True:
+        line = await reader.readline()
+        if not line:
+            return None
+        if line.startswith(b"data: "):
+            return line[6:].strip()
+
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description="Push channel benchmark")
+    parser.add_argument("--url", default="http://localhost:8001/api")
+    parser.add_argument("--connections", type=int, default=10000)
+    parser.add_argument("--receivers", type=int, default=1000,
+                        help="idle connections are spread over this many receivers")
+    parser.add_argument("--server-pid", type=int)
+    parser.add_argument("--messages", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    url = urlsplit(args.url)
+    host, port, base = url.hostname, url.port or 80, url.path.rstrip("/")
+
+    print("\n" + "=" * 70)
+    print("PUSH CHANNEL BENCHMARK")
+    print("=" * 70)
+    print(f"  - {args.url}, {args.connections} idle SSE connections over"
+          f" {args.receivers} receivers (fd limit {hard})\n")
+
+    # Idle connections
+    rss_before = rss_kib(args.server_pid) if args.server_pid else None
+    start = time.perf_counter()
+    idle = []
+    for batch in range(0, args.connections, 500):
+        idle += await asyncio.gather(*(
+            open_stream(host, port, f"{base}/stream/push-idle-{i % args.receivers}/")
+            for i in range(batch, min(batch + 500, args.connections))
+        ))
+    elapsed = time.perf_counter() - start
+    print(f"Idle connections: {len(idle)} opened in {elapsed:.1f} s"
+          f" ({len(idle) / elapsed:.0f}/s)")
+    if rss_before is not None:
+        await asyncio.sleep(1)
+        rss_after = rss_kib(args.server_pid)
+        per_connection = (rss_after - rss_before) / len(idle)
+        print(f"  server RSS {rss_before / 1024:.0f} -> {rss_after / 1024:.0f} MiB,"
+              f" {per_connection:.1f} KiB per connection,"
+              f" ~{per_connection * 50000 / 1024 / 1024:.2f} GiB for 50k")
+
+    # Delivery latency to every subscriber of one receiver
+    subscribers = [await open_stream(host, port, f"{base}/stream/{FANOUT_RECEIVER}/")
+                   for _ in range(FANOUT_SUBSCRIBERS)]
+    latencies = []
+    async with aiohttp.ClientSession() as session:
+        for n in range(args.messages):
+            body = {"sender": "push-bench", "receiver": FANOUT_RECEIVER,
+                    "text": f"hello {n}", "target_language": "fr"}
+            sent = time.perf_counter()
+            async with session.post(f"{args.url}/send-text-async/", json=body) as response:
+                response.raise_for_status()
+            for reader, _ in subscribers:
+                event = json.loads(await next_event(reader))
+                assert event["original_message"] == f"hello {n}"
+                latencies.append((time.perf_counter() - sent) * 1000)
+
+        # A subscriber that never reads
+        stalled = await open_stream(host, port, f"{base}/stream/{STALLED_RECEIVER}/")
+        sent = 0
+        for sent in range(1, STALLED_MESSAGES + 1):
+            body = {"sender": "push-bench", "receiver": STALLED_RECEIVER,
+                    "text": STALLED_TEXT, "target_language": "fr"}
+            async with session.post(f"{args.url}/send-text-async/", json=body) as response:
+                response.raise_for_status()
+            async with session.get(f"{args.url}/push-stats/") as response:
+                stats = await response.json()
+            if stats["overflows"]:
+                break
+
+    latencies.sort()
+    print(f"\nDelivery: {args.messages} messages x {FANOUT_SUBSCRIBERS} subscribers"
+          f" (POST start -> event read)")
+    print(f"  p50 {statistics.median(latencies):.2f} ms,"
+          f" p99 {latencies[int(len(latencies) * 0.99) - 1]:.2f} ms,"
+          f" max {latencies[-1]:.2f} ms")
+
+    # Read what the stalled subscriber was sent before it was dropped
+    events, tail = 0, b""
+    try:
+        while True:
+            chunk = await asyncio.wait_for(stalled[0].read(1 << 20), timeout=2)
+            if not chunk:
+                break
+            events += chunk.count(b"data: {")
+            tail = (tail + chunk)[-4096:]
+    except asyncio.TimeoutError:
+        pass
+    outcome = ("disconnected after an overflow event" if b"event: overflow" in tail
+               else "still open")
+    print(f"\nStalled subscriber: {outcome} after {sent} messages"
+          f" ({events} delivered before it)")
+    print(f"Server: {stats}")
+
+    for _, writer in idle + subscribers + [stalled]:
+        writer.close()
+    print()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
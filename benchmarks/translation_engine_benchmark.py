@@ -0,0 +1,89 @@
+"""
+Phrase-Table Translation Engine Benchmark
+Generates synthetic phrase tables of increasing size (1-4 word phrases)
+and measures index build time, index memory and per-call translate()
+latency of apis/grpc_client/translation_engine.py, in-process.
+
+Usage:
+    python benchmarks/translation_engine_benchmark.py [max_entries]
+"""
+
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+
+# Configuration
+MAX_ENTRIES = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+TABLE_SIZES = [size for size in (1_000, 10_000, 100_000, 500_000) if size <= MAX_ENTRIES]
+VOCABULARY = 20_000
+REPEAT = 20000
+SENTENCE = "Hello World from user 42, how are you today? Thank you very much"
+
+CHAT_SYSTEM_DIR = Path(__file__).resolve().parent.parent / "api-gateway" / "chatSystem"
+sys.path.insert(0, str(CHAT_SYSTEM_DIR))
+
+from apis.grpc_client.translation_engine import TranslationEngine
+
+
+def write_table(path, entries):
+    """Random 1-4 word phrases over a synthetic vocabulary, plus real greetings"""
+    rng = random.Random(entries)
+    words = [f"w{i}" for i in range(VOCABULARY)]
+    seen = set()
+    with open(path, "w", encoding="utf-8") as f:
+        for source, target in (("hello world", "bonjour le monde"), ("thank you very much", "merci beaucoup"),
+                               ("how are you", "comment allez-vous"), ("today", "aujourd'hui")):
+            f.write(f"{source}\t{target}\n")
+        while len(seen) < entries:
+            source = " ".join(rng.choices(words, k=rng.randint(1, 4)))
+            if source not in seen:
+                seen.add(source)
+                f.write(f"{source}\t{source.upper()}\n")
+
+
+def main():
+    print("\n" + "=" * 70)
+    print("PHRASE-TABLE TRANSLATION ENGINE BENCHMARK")
+    print("=" * 70)
+    print(f"  - Sentence: {SENTENCE!r}")
+    print(f"  - translate() calls per table: {REPEAT}\n")
+
+    with tempfile.TemporaryDirectory() as table_dir:
+        for size in TABLE_SIZES:
+            path = os.path.join(table_dir, "fr.tsv")
+            write_table(path, size)
+            engine = TranslationEngine(table_dir)
+            start = time.perf_counter()
+            engine.warm()
+            build_ms = (time.perf_counter() - start) * 1000
+
+            # Memory is measured on a second build: tracemalloc slows it down
+            tracemalloc.start()
+            measured = TranslationEngine(table_dir)
+            measured.warm()
+            index_mb = tracemalloc.get_traced_memory()[0] / 1e6
+            tracemalloc.stop()
+            del measured
+
+            times = []
+            for _ in range(REPEAT):
+                start = time.perf_counter()
+                engine.translate(SENTENCE, "fr")
+                times.append((time.perf_counter() - start) * 1e6)
+            times.sort()
+            print(f"  {size:>8} entries  file {os.path.getsize(path) / 1e6:6.1f} MB"
+                  f"   build {build_ms:8.1f} ms   index {index_mb:6.1f} MB"
+                  f"   translate p50 {statistics.median(times):6.1f} us"
+                  f"   p99 {times[int(len(times) * 0.99)]:6.1f} us")
+
+        print(f"\n  Output: {engine.translate(SENTENCE, 'fr')!r}\n")
+
+
+if __name__ == "__main__":
+    main()